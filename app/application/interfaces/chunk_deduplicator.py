@@ -0,0 +1,50 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.domain.entities.embedding import Embedding
+
+
+class DuplicateChunk(NamedTuple):
+    """A chunk found to be a near-duplicate of an already embedded one"""
+    canonical_id: str
+    # The canonical chunk's stored embedding - None when the canonical
+    # chunk is earlier in the same batch and not embedded yet
+    embedding: Optional[Embedding]
+
+
+class IChunkDeduplicator(ABC):
+    """Per-tenant near-duplicate detection for chunks at ingestion"""
+
+    @abstractmethod
+    async def resolve_duplicates(self,
+                                 user_id: str,
+                                 document_id: str,
+                                 chunks: List[Tuple[str, str]]) -> Dict[str, DuplicateChunk]:
+        """Check (vector_id, text) chunks against the tenant's index - read only
+        Returns the near-duplicates; the caller may reuse their canonical
+        embedding instead of embedding them, but still stores every chunk
+        under its own vector_id. Register the batch once it is stored."""
+        pass
+
+    @abstractmethod
+    async def register_chunks(self,
+                              user_id: str,
+                              document_id: str,
+                              chunks: List[Tuple[str, str]],
+                              duplicates: Dict[str, str],
+                              embeddings: Dict[str, Embedding]) -> None:
+        """Record a batch once its vectors are stored
+        `duplicates` maps the chunks whose embedding was reused to their
+        canonical vector_id; the chunks in `embeddings` were embedded and
+        become canonical, so only call this after the upsert succeeded"""
+        pass
+
+    @abstractmethod
+    async def forget_document(self, user_id: str, document_id: str) -> None:
+        """Drop a failed or deleted document's entries"""
+        pass
+
+    @abstractmethod
+    async def stats(self, user_id: str) -> Dict:
+        """Chunks seen, duplicates found and characters not re-embedded"""
+        pass
@@ -0,0 +1,46 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from app.domain.entities.chat_message import ChatMessage
+from app.domain.entities.conversation import Conversation
+
+
+class IConversationStore(ABC):
+    """Persistence for conversations - messages are append-only"""
+
+    @abstractmethod
+    async def save(self, conversation: Conversation) -> None:
+        """Create or update conversation header (title, metadata)"""
+        pass
+
+    @abstractmethod
+    async def append(self, conversation_id: str, message: ChatMessage) -> None:
+        """Append one message to the conversation log"""
+        pass
+
+    @abstractmethod
+    async def load(self,
+                   conversation_id: str,
+                   last_n: int = 20,
+                   max_tokens: Optional[int] = None) -> Optional[Conversation]:
+        """Load a conversation with only its most recent messages
+        (at most last_n, and at most max_tokens if given - the newest
+        message is always included, even when it alone is over budget)"""
+        pass
+
+    @abstractmethod
+    async def load_range(self,
+                         conversation_id: str,
+                         start: int,
+                         stop: int) -> List[ChatMessage]:
+        """Load messages [start, stop) by position"""
+        pass
+
+    @abstractmethod
+    async def set_summary(self, conversation_id: str, summary: str, upto: int) -> None:
+        """Store a summary covering messages [0, upto)"""
+        pass
+
+    @abstractmethod
+    async def delete(self, conversation_id: str) -> None:
+        """Delete conversation and all its messages"""
+        pass
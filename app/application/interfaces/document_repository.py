@@ -1,5 +1,5 @@
 from abc import ABC , abstractmethod
-from typing import List , Optional
+from typing import List , Optional, Tuple
 from app.domain.entities.document import Document
 
 
@@ -34,6 +34,28 @@ class IDocumentRepositroy(ABC):
         """List documents for a user"""
         pass
 
+    @abstractmethod
+    async def list_by_user_after(self,
+                                 user_id:str,
+                                 cursor:Optional[str] = None,
+                                 limit:int = 50) -> Tuple[List[Document], Optional[str]]:
+        """Keyset-paginated listing, newest first
+        Returns a page and the opaque cursor for the next one (None on the last page)"""
+        pass
+
+    @abstractmethod
+    async def list_all_after(self,
+                             cursor:Optional[str] = None,
+                             limit:int = 100) -> Tuple[List[Document], Optional[str]]:
+        """Every user's documents in insertion order, keyset-paginated
+        Documents added while a scan runs show up on its later pages"""
+        pass
+
+    @abstractmethod
+    async def count_all(self) -> int:
+        """Count documents across all users"""
+        pass
+
     @abstractmethod
     async def delete(self , document_id) -> None:
         """Delete a document"""
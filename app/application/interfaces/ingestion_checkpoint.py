@@ -0,0 +1,16 @@
+from abc import ABC, abstractmethod
+from typing import Set
+
+
+class IIngestionCheckpoint(ABC):
+    """Progress record for one ingestion - lets an interrupted run skip finished steps"""
+
+    @abstractmethod
+    async def completed_steps(self) -> Set[str]:
+        """Names of steps already done"""
+        pass
+
+    @abstractmethod
+    async def mark_done(self, step: str) -> None:
+        """Record a step as done"""
+        pass
@@ -1,5 +1,5 @@
 from abc import ABC ,abstractmethod
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 class IStorageService(ABC):
     """Interface for file storage operations - Raw PDF bytes"""
@@ -28,3 +28,16 @@ class IStorageService(ABC):
     async def get_url(self, key: str, expires_in: int = 3600) -> str:
         """Get presigned URL for file"""
         pass
+
+    async def upload_stream(self, key: str, chunks: AsyncIterator[bytes]) -> str:
+        """Upload from an async byte stream and return URL
+        Default buffers the whole stream - providers should override"""
+        content = b"".join([chunk async for chunk in chunks])
+        return await self.upload(key, content)
+
+    async def download_stream(self, key: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        """Download file content in chunks
+        Default downloads the whole file - providers should override"""
+        content = await self.download(key)
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from app.domain.entities.embedding import Embedding
 
 class IvectorStore(ABC):
@@ -13,6 +13,15 @@ class IvectorStore(ABC):
     ) ->None:
         pass
 
+    async def upsert_batch(
+        self,
+        items:List[Tuple[str, Embedding, Dict]]
+    ) -> None:
+        """Upsert many (id, embedding, metadata) at once
+        Default loops over upsert - providers should override"""
+        for id, embedding, metadata in items:
+            await self.upsert(id=id, embedding=embedding, metadata=metadata)
+
     @abstractmethod
     async def search(
         self , query_embedding:Embedding,
@@ -23,4 +32,4 @@ class IvectorStore(ABC):
 
     @abstractmethod
     async def delete(self , id:str) -> None:
-        pass
\ No newline at end of file
+        pass
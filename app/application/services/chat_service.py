@@ -1,7 +1,10 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from app.application.interfaces.llm_services import ILLMService
 from app.application.interfaces.embedding_service import IEmbeddingService
 from app.application.interfaces.vector_store import IvectorStore
+from app.core.metrics import PipelineMetrics, get_metrics
+from app.core.profiling import profiled
+from app.core.request_context import Priority, request_scope
 from app.domain.entities.chat_message import ChatMessage, MessageRole
 
 
@@ -14,39 +17,56 @@ class ChatService:
         self,
         llm_service: ILLMService,
         embedding_service: IEmbeddingService,
-        vector_store: IvectorStore
+        vector_store: IvectorStore,
+        metrics: Optional[PipelineMetrics] = None,
+        request_timeout: Optional[float] = None
                                     ):
+        """request_timeout: deadline for one answer - upstream retries never run past it"""
         self.llm_serve = llm_service
         self.embedding_service = embedding_service
         self.vector_store = vector_store
+        self.metrics = metrics or get_metrics()
+        self.request_timeout = request_timeout
 
 
+    @profiled("chat")
     async def ask_question(self, question:str , user_id:str,
-                conversation_history: List[ChatMessage] = []) ->str:
+                conversation_history: List[ChatMessage] = [],
+                document_ids: Optional[List[str]] = None) ->str:
         """
         RAG Pipeline:
         1. Create question embedding
-        2. Search vector store
+        2. Search vector store (only `document_ids`, if given)
         3. Build context
         4. Generate reponse with LLM
         """
-        # 1. Embed the question
-        question_embeddings = await self.embedding_service.create_embedding(question)
+        search_filter: Dict = {"user_id": user_id}
+        if document_ids:
+            search_filter["document_id"] = {"$in": list(document_ids)}
 
-        # 2. search vector store
-        search_results = await self.vector_store.search(query_embedding=question_embeddings,
-                                                        top_k=5,
-                                                        filter={"user_id":user_id})
-        # 3. build context form results
-        context = self._build_context(search_results)
+        with request_scope(user_id=user_id, priority=Priority.INTERACTIVE, timeout=self.request_timeout), \
+                self.metrics.stage("chat", "total"):
+            # 1. Embed the question
+            with self.metrics.stage("chat", "embed"):
+                question_embeddings = await self.embedding_service.create_embedding(question)
 
+            # 2. search vector store
+            with self.metrics.stage("chat", "search"):
+                search_results = await self.vector_store.search(query_embedding=question_embeddings,
+                                                                top_k=5,
+                                                                filter=search_filter)
+            self.metrics.observe_batch("chat", "search_results", len(search_results))
 
-        # 4. prepare messages
-        messages = conversation_history or []
-        messages.append(ChatMessage(role=MessageRole.USER , content=question))
+            # 3. build context form results
+            context = self._build_context(search_results)
 
-        # 5. Generate response
-        response = await self.llm_serve.generate_response(messages ,context=context)
+            # 4. prepare messages
+            messages = conversation_history or []
+            messages.append(ChatMessage(role=MessageRole.USER , content=question))
+
+            # 5. Generate response
+            with self.metrics.stage("chat", "generate"):
+                response = await self.llm_serve.generate_response(messages ,context=context)
 
         return response
 
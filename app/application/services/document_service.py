@@ -1,5 +1,11 @@
-from typing import List , Optional
+from typing import AsyncIterator, List , Optional, Set, Tuple, Union
+import asyncio
+import itertools
+import logging
+import os
 import uuid 
+from concurrent.futures import Executor
+from dataclasses import replace
 from datetime import datetime
 import PyPDF2
 import io
@@ -8,85 +14,316 @@ from app.application.interfaces.document_repository import IDocumentRepositroy
 from app.application.interfaces.embedding_service import IEmbeddingService
 from app.application.interfaces.vector_store import IvectorStore
 from app.application.interfaces.storage_service import IStorageService
+from app.application.interfaces.ingestion_checkpoint import IIngestionCheckpoint
+from app.application.interfaces.chunk_deduplicator import DuplicateChunk, IChunkDeduplicator
+from app.application.services.upload_spool import SpooledUpload
+from app.core.metrics import PipelineMetrics, get_metrics
+from app.core.profiling import profiled
+from app.core.request_context import Priority, request_scope
 from app.domain.entities.document import Document
+from app.domain.entities.embedding import Embedding
 from app.domain.exceptions import InvalidDocumentFormatError , DocumentNotFoundError
 
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 1000
+
 class DocumentService:
     def __init__(self  ,document_repo : IDocumentRepositroy,
                  embedding_service:IEmbeddingService,
                  vector_store : IvectorStore,
-                 storage_service:IStorageService):
+                 storage_service:IStorageService,
+                 metrics:Optional[PipelineMetrics] = None,
+                 embedding_batch_size:int = 64,
+                 parser_executor:Optional[Executor] = None,
+                 deduplicator:Optional[IChunkDeduplicator] = None,
+                 max_file_size:Optional[int] = None,
+                 spool_threshold:int = 1024 * 1024,
+                 spool_dir:Optional[str] = None):
+        """
+        parser_executor: where PDF / DOCX parsing runs - a ProcessPoolExecutor
+        parallelises parsing across cores; None uses the default thread pool
+        deduplicator: near-duplicate chunks (boilerplate, repeated paragraphs)
+        reuse an existing vector instead of being embedded again
+        max_file_size: uploads above this many bytes raise FileTooLargeError
+        spool_threshold: streamed uploads above this size go to a temp file
+        in spool_dir instead of memory
+        """
         self.document_repo = document_repo
         self.embedding_service = embedding_service
         self.vector_store = vector_store
         self.storage_service = storage_service
+        self.metrics = metrics or get_metrics()
+        self.embedding_batch_size = embedding_batch_size
+        self.parser_executor = parser_executor
+        self.deduplicator = deduplicator
+        self.max_file_size = max_file_size
+        self.spool_threshold = spool_threshold
+        self.spool_dir = spool_dir
+        # Model of the embeddings this service produces - learned from the first batch
+        # when the (possibly wrapped) embedding service doesn't say
+        self._embedding_model = getattr(embedding_service , "model_name" , None)
 
     async def process_document(
             self,
             filename:str,
             content:bytes,
-            user_id : str
+            user_id : str,
+            document_id:Optional[str] = None,
+            checkpoint:Optional[IIngestionCheckpoint] = None
+    ) -> Document:
+        """Process a file already in memory - prefer process_upload for large files"""
+        upload = SpooledUpload.from_bytes(content , self.max_file_size)
+        return await self._process(filename , upload , user_id , document_id , checkpoint)
+
+    async def process_upload(
+            self,
+            filename:str,
+            source:Union[AsyncIterator[bytes] , str , os.PathLike],
+            user_id : str,
+            document_id:Optional[str] = None,
+            checkpoint:Optional[IIngestionCheckpoint] = None
+    ) -> Document:
+        """
+        Streaming entry point - source is an async byte stream or a file path
+        The size limit is enforced as bytes arrive, and large uploads are
+        spooled to disk where parsers and storage read them directly.
+        """
+        if isinstance(source , (str , os.PathLike)):
+            upload = SpooledUpload.from_path(source , self.max_file_size)
+        else:
+            upload = await SpooledUpload.from_stream(
+                source , self.max_file_size , self.spool_threshold , self.spool_dir
+            )
+        try:
+            return await self._process(filename , upload , user_id , document_id , checkpoint)
+        finally:
+            upload.close()
+
+    @profiled("ingest")
+    async def _process(
+            self,
+            filename:str,
+            upload:SpooledUpload,
+            user_id : str,
+            document_id:Optional[str],
+            checkpoint:Optional[IIngestionCheckpoint]
     ) -> Document:
         """
         Complete document processing pipeline:
         1. Extract text
         2. Create document entity
         3. Chunk text
-        4. Generate embeddings
+        4. Generate embeddings (in batches, skipping near-duplicate chunks)
         5. Store in vector database
         6. Store original file
         7. Save metadata to database
-        """
-        
-        # 1. Extract text
-        text_content = await self._extract_text(content,filename)
 
-        if not text_content.strip():
-            raise InvalidDocumentFormatError("Document is empty or could not be read")
+        With a checkpoint (and a stable document_id) every finished batch
+        and step is recorded, and a re-run skips them. Vector ids are
+        deterministic, so redoing a half-finished batch is harmless.
+        """
+        completed = await checkpoint.completed_steps() if checkpoint else set()
         
-        # 2. Create document entity
-        document = Document(
-            id = str(uuid.uuid4()),
-            filename=filename,
-            content = text_content,
-            created_at=datetime.utcnow(),
-            user_id=user_id
-        )
-
-        # 3. split into chunks (business logic in entity) - Need more optimization later
-        chunks = document.split_into_chunks(chunk_size=1000)
+        # Ingestion is bulk traffic - chat requests are admitted first upstream
+        with request_scope(user_id=user_id, priority=Priority.BULK), \
+                self.metrics.stage("ingest", "total"):
+            # 1. Extract text
+            with self.metrics.stage("ingest", "extract"):
+                text_content = await self._extract_text(upload,filename)
+
+            if not text_content.strip():
+                raise InvalidDocumentFormatError("Document is empty or could not be read")
+
+            # 2. Create document entity
+            document = Document(
+                id = document_id or str(uuid.uuid4()),
+                filename=filename,
+                content = text_content,
+                created_at=datetime.utcnow(),
+                user_id=user_id
+            )
 
-        # 4. create embeddings for all chunks
-        embeddings = await self.embedding_service.create_embeddings_batch(chunks)
+            # 3 + 4 + 5. Chunk, embed and store batch by batch
+            await self._embed_and_store(document , "ingest" , completed , checkpoint)
+
+            # 6. Store original file in object storage
+            storage_key = _storage_key(document)
+            if "upload" not in completed:
+                with self.metrics.stage("ingest", "upload"):
+                    if upload.in_memory:
+                        await self.storage_service.upload(
+                            key = storage_key,
+                            content=upload.content
+                        )
+                    else:
+                        await self.storage_service.upload_stream(storage_key , upload.iter_chunks())
+                if checkpoint:
+                    await checkpoint.mark_done("upload")
+
+            # 7. Save document metadata to database
+            with self.metrics.stage("ingest", "save"):
+                await self.document_repo.save(document)
 
-        # 5. Store chunks with embeddings in vector database
-        for i , (chunk , embedding) in enumerate(zip(chunks , embeddings)):
-            await self.vector_store.upsert(
-                id=f"{document.id}_chunk_{i}",
-                embedding=embedding,
-                metadata={
-                    "document_id":document.id,
-                    "chunk_index" : i ,
-                    "text" : chunk,
-                    "user_id" :user_id,
-                    "filename":filename
+        return document
 
+    async def reindex_document(
+            self,
+            document:Document,
+            checkpoint:Optional[IIngestionCheckpoint] = None
+    ) -> int:
+        """
+        Re-chunk and re-embed an existing document into this service's vector store
+        Text is re-extracted from the original file in storage (streamed, and
+        spooled like an upload); documents whose original is gone fall back
+        to the stored text. Returns the number of chunks.
+        """
+        completed = await checkpoint.completed_steps() if checkpoint else set()
+        with request_scope(user_id=document.user_id, priority=Priority.BULK), \
+                self.metrics.stage("reindex", "total"):
+            storage_key = _storage_key(document)
+            if await self.storage_service.exists(storage_key):
+                upload = await SpooledUpload.from_stream(
+                    self.storage_service.download_stream(storage_key),
+                    spool_threshold=self.spool_threshold,
+                    spool_dir=self.spool_dir
+                )
+                try:
+                    with self.metrics.stage("reindex", "extract"):
+                        text_content = await self._extract_text(upload , document.filename)
+                finally:
+                    upload.close()
+                document = replace(document , content=text_content)
+
+            return await self._embed_and_store(document , "reindex" , completed , checkpoint)
+
+    async def _embed_and_store(
+            self,
+            document:Document,
+            pipeline:str,
+            completed:Set[str],
+            checkpoint:Optional[IIngestionCheckpoint]
+    ) -> int:
+        """Chunk lazily - one batch alive at a time - then dedup, embed and upsert each batch"""
+        try:
+            return await self._embed_batches(document , pipeline , completed , checkpoint)
+        except BaseException:
+            # Without a checkpoint nothing resumes this document - don't leave dedup entries for it
+            if self.deduplicator and checkpoint is None:
+                await asyncio.shield(self.deduplicator.forget_document(document.user_id , document.id))
+            raise
+
+    async def _embed_batches(
+            self,
+            document:Document,
+            pipeline:str,
+            completed:Set[str],
+            checkpoint:Optional[IIngestionCheckpoint]
+    ) -> int:
+        chunk_iter = document.iter_chunks(chunk_size=_CHUNK_SIZE)
+        chunk_count = 0
+        # Chunking is interleaved with the batches - record it once per document
+        chunking = self.metrics.accumulated_stage(pipeline, "chunk")
+
+        for batch_number in itertools.count():
+            with chunking:
+                batch_chunks = list(itertools.islice(chunk_iter , self.embedding_batch_size))
+            if not batch_chunks:
+                chunking.observe()
+                break
+            chunk_count += len(batch_chunks)
+            step = f"embed_batch_{batch_number}"
+            if step in completed:
+                continue
+            start = batch_number * self.embedding_batch_size
+            batch = [
+                (i , f"{document.id}_chunk_{i}" , chunk)
+                for i , chunk in enumerate(batch_chunks , start=start)
+            ]
+
+            # Near-duplicates reuse the canonical chunk's embedding - they are still
+            # stored as this document's own vectors, only the embedding call is skipped
+            duplicates = {}
+            if self.deduplicator:
+                dedup_chunks = [(vector_id , chunk) for _ , vector_id , chunk in batch]
+                with self.metrics.stage(pipeline, "dedup"):
+                    duplicates = await self.deduplicator.resolve_duplicates(
+                        document.user_id , document.id , dedup_chunks
+                    )
+                duplicates = {
+                    vector_id: duplicate for vector_id , duplicate in duplicates.items()
+                    # An embedding from another model (or of unknown model) is never mixed in
+                    if duplicate.embedding is None or duplicate.embedding.model == self._embedding_model
                 }
 
-            )
+            embeddings = {}
+            to_embed = [item for item in batch if item[1] not in duplicates]
+            if to_embed:
+                self.metrics.observe_batch(pipeline, "embed", len(to_embed))
+                with self.metrics.stage(pipeline, "embed"):
+                    created = await self.embedding_service.create_embeddings_batch(
+                        [chunk for _ , _ , chunk in to_embed]
+                    )
+                embeddings = {vector_id: embedding for (_ , vector_id , _) , embedding in zip(to_embed , created)}
+                self._embedding_model = created[0].model
+            vectors = {
+                vector_id: embeddings.get(vector_id) or _reused(duplicates[vector_id] , embeddings , chunk)
+                for _ , vector_id , chunk in batch
+            }
+
+            with self.metrics.stage(pipeline, "upsert"):
+                await self.vector_store.upsert_batch([
+                    (
+                        vector_id,
+                        vectors[vector_id],
+                        {
+                            "document_id":document.id,
+                            "chunk_index" : i ,
+                            "text" : chunk,
+                            "user_id" :document.user_id,
+                            "filename":document.filename
+                        }
+                    )
+                    for i , vector_id , chunk in batch
+                ])
+            # Recorded right after the upsert: the finished steps tell which vectors exist
+            if checkpoint:
+                await checkpoint.mark_done(step)
+            # Only now are the vectors stored - later chunks may resolve to the embedded ones
+            if self.deduplicator:
+                await self.deduplicator.register_chunks(
+                    document.user_id , document.id , dedup_chunks,
+                    {vector_id: duplicate.canonical_id for vector_id , duplicate in duplicates.items()},
+                    embeddings
+                )
+
+        return chunk_count
+    
 
-        # 6. Store original file in object storage
-        storage_key = f"documents/{user_id}/{document.id}/{filename}"
-        await self.storage_service.upload(
-            key = storage_key,
-            content=content
-        )
+    async def discard_ingestion(
+            self,
+            document_id:str,
+            user_id:str,
+            filename:str,
+            checkpoint:IIngestionCheckpoint
+    ) -> None:
+        """
+        Remove what a checkpointed ingestion that will not be resumed left behind:
+        the vectors of its finished batches, its dedup entries and the stored original
+        """
+        completed = await checkpoint.completed_steps()
+        batches = [int(step.rsplit("_" , 1)[1]) for step in completed if step.startswith("embed_batch_")]
+        with request_scope(user_id=user_id , priority=Priority.BULK):
+            for batch_number in batches:
+                start = batch_number * self.embedding_batch_size
+                for i in range(start , start + self.embedding_batch_size):
+                    await self.vector_store.delete(f"{document_id}_chunk_{i}")
 
-        # 7. Save document metadata to database
-        await self.document_repo.save(document)
+        if self.deduplicator:
+            await self.deduplicator.forget_document(user_id , document_id)
 
-        return document
-    
+        if "upload" in completed:
+            await self.storage_service.delete(key=_storage_key_for(user_id , document_id , filename))
 
     async def get_document(self,document_id :str , user_id:str) -> Document:
         """Get a document by ID"""
@@ -109,6 +346,16 @@ class DocumentService:
             offset=offset
         )
     
+    async def list_documents_page(
+            self, user_id:str , cursor:Optional[str] = None , limit:int = 50
+    ) -> Tuple[List[Document], Optional[str]]:
+        """List user's documents with a keyset cursor - returns (page, next_cursor)"""
+        return await self.document_repo.list_by_user_after(
+            user_id=user_id,
+            cursor=cursor,
+            limit=limit
+        )
+
     async def search_documents(
             self, user_id:str , query:str , limit:int = 10
     ) -> List[Document]:
@@ -128,72 +375,109 @@ class DocumentService:
 
         document = await self.get_document(document_id , user_id)
 
-        # 1. Delete from vector store
+        # 1. Delete from vector store - vector ids follow from the chunking
         try:
-            # Delete vector embeddings
-            pass
+            chunk_count = sum(1 for _ in document.iter_chunks(chunk_size=_CHUNK_SIZE))
+            # Scoped to the owner, so a partitioned store looks in one partition only
+            with request_scope(user_id=document.user_id , priority=Priority.BULK):
+                for i in range(chunk_count):
+                    await self.vector_store.delete(f"{document.id}_chunk_{i}")
         except Exception as e:
-            print(f"Waring: Could not delete vectors for {document_id}: {e}")
+            logger.warning("Could not delete vectors for %s: %s" , document_id , e)
+
+        if self.deduplicator:
+            try:
+                await self.deduplicator.forget_document(document.user_id , document_id)
+            except Exception as e:
+                logger.warning("Could not drop dedup entries for %s: %s" , document_id , e)
 
         # 2. Delete from object storage
-        storage_key = f"documents/{user_id}/{document_id}/{document.filename}"
+        storage_key = _storage_key(document)
         try:
             await self.storage_service.delete(key=storage_key)
         except Exception as e :
-            print("Warning : could not delete file from storage")
+            logger.warning("Could not delete %s from storage: %s" , storage_key , e)
 
         # 3. Delete from database
         await self.document_repo.delete(document_id)
 
+    async def get_dedup_stats(self , user_id:str) -> dict:
+        """How many of the user's chunks were near-duplicates (and not re-embedded)"""
+        if not self.deduplicator:
+            return {}
+        return await self.deduplicator.stats(user_id)
+
     async def get_document_count(self , user_id :str) -> int:
         """Get total document count for user"""
         return await self.document_repo.count_by_user(user_id)
     
 
-    async def _extract_text(self , content:bytes , filename:str) ->str:
+    async def _extract_text(self , upload:SpooledUpload , filename:str) ->str:
         
         """Extract text from different file format"""
         file_extention = filename.split('.')[-1].lower()
 
         if file_extention == "pdf":
-            return await self._extract_pdf_text(content)
+            return await self._extract_pdf_text(upload.parser_input())
         elif file_extention == "docx":
-            return await self._extract_docx_text(content)
+            return await self._extract_docx_text(upload.parser_input())
         elif file_extention in ["txt" , "md"] :
-            return content.decode('utf-8')
+            return await upload.read_text('utf-8')
         else:
             raise InvalidDocumentFormatError(
                 f"Unsupported file format:{file_extention}"
             )
 
-    async def _extract_pdf_text(self , content:bytes) ->str:
-        """Extract text from pdf"""
+    async def _extract_pdf_text(self , source:Union[bytes , str]) ->str:
+        """Extract text from pdf (bytes or file path)"""
         try:
-            pdf_file = io.BytesIO(content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-
-            return text
+            return await self._run_parser(_parse_pdf , source)
         except Exception as e :
             raise InvalidDocumentFormatError(f"Could not read PDF: {str(e)}")
 
-    async def _extract_docx_text(self, content: bytes) -> str:
-        """Extract text from DOCX"""
+    async def _extract_docx_text(self, source: Union[bytes , str]) -> str:
+        """Extract text from DOCX (bytes or file path)"""
         try:
-            docx_file = io.BytesIO(content)
-            doc = docx.Document(docx_file)
-
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-
-            return text
+            return await self._run_parser(_parse_docx , source)
         except Exception as e:
             raise InvalidDocumentFormatError(f"Could not read DOCX: {str(e)}")
 
+    async def _run_parser(self , parser , source:Union[bytes , str]) -> str:
+        """Parsing is CPU bound - keep it off the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.parser_executor , parser , source)
+
+
+def _storage_key(document:Document) -> str:
+    return _storage_key_for(document.user_id , document.id , document.filename)
+
+
+def _storage_key_for(user_id:str , document_id:str , filename:str) -> str:
+    return f"documents/{user_id}/{document_id}/{filename}"
+
+
+def _reused(duplicate:DuplicateChunk , embeddings:dict , text:str) -> Embedding:
+    """The canonical chunk's embedding, for a near-duplicate chunk's own vector"""
+    embedding = duplicate.embedding or embeddings[duplicate.canonical_id]
+    return Embedding(vector=embedding.vector , model=embedding.model , text=text)
+
+
+# Module level so they can be sent to a process pool
+# A path is opened by the parser itself, so spooled files never cross the process boundary
+
+def _as_file(source:Union[bytes , str]):
+    return io.BytesIO(source) if isinstance(source , bytes) else source
+
+
+def _parse_pdf(source:Union[bytes , str]) -> str:
+    pdf_reader = PyPDF2.PdfReader(_as_file(source))
+    return "".join(page.extract_text() + "\n" for page in pdf_reader.pages)
+
+
+def _parse_docx(source:Union[bytes , str]) -> str:
+    doc = docx.Document(_as_file(source))
+    return "".join(paragraph.text + "\n" for paragraph in doc.paragraphs)
+
 
 
         
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import tempfile
+from typing import AsyncIterator, Optional, Union
+
+from app.domain.exceptions import FileTooLargeError
+
+
+def _too_large(max_size: int) -> FileTooLargeError:
+    return FileTooLargeError(f"File exceeds the maximum size of {max_size} bytes")
+
+
+async def limit_stream(chunks: AsyncIterator[bytes], max_size: Optional[int]) -> AsyncIterator[bytes]:
+    """Pass a byte stream through, failing as soon as it grows past max_size"""
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise _too_large(max_size)
+        yield chunk
+
+
+class SpooledUpload:
+    """
+    An uploaded file, held in memory while small and spooled to a temp file
+    once it passes `spool_threshold`
+
+    Parsers and storage read the spooled file directly, so a large upload is
+    never held in worker memory as one bytes object.
+    """
+
+    def __init__(self, content: Optional[bytes] = None, path: Optional[str] = None,
+                 size: int = 0, owned: bool = False):
+        self.content = content
+        self.path = path
+        self.size = size
+        self._owned = owned
+
+    @classmethod
+    def from_bytes(cls, content: bytes, max_size: Optional[int] = None) -> "SpooledUpload":
+        if max_size is not None and len(content) > max_size:
+            raise _too_large(max_size)
+        return cls(content=content, size=len(content))
+
+    @classmethod
+    def from_path(cls, path: Union[str, os.PathLike], max_size: Optional[int] = None) -> "SpooledUpload":
+        """Use an existing file in place - it is not deleted on close"""
+        size = os.stat(path).st_size
+        if max_size is not None and size > max_size:
+            raise _too_large(max_size)
+        return cls(path=os.fspath(path), size=size)
+
+    @classmethod
+    async def from_stream(cls, chunks: AsyncIterator[bytes], max_size: Optional[int] = None,
+                          spool_threshold: int = 1024 * 1024,
+                          spool_dir: Optional[str] = None) -> "SpooledUpload":
+        """Receive a byte stream, enforcing max_size as bytes arrive"""
+        buffer = bytearray()
+        spool = None
+        path = None
+        size = 0
+        try:
+            async for chunk in limit_stream(chunks, max_size):
+                size += len(chunk)
+                if spool is None:
+                    buffer += chunk
+                    if len(buffer) <= spool_threshold:
+                        continue
+                    # Too big for memory - move what we have to disk and keep writing there
+                    fd, path = tempfile.mkstemp(dir=spool_dir, prefix="upload-")
+                    spool = os.fdopen(fd, "wb")
+                    chunk = bytes(buffer)
+                    buffer = bytearray()
+                await asyncio.to_thread(spool.write, chunk)
+            if spool is not None:
+                spool.close()
+        except BaseException:
+            if spool is not None:
+                spool.close()
+                os.unlink(path)
+            raise
+
+        if path is None:
+            return cls(content=bytes(buffer), size=size)
+        return cls(path=path, size=size, owned=True)
+
+    @property
+    def in_memory(self) -> bool:
+        return self.path is None
+
+    def parser_input(self) -> Union[bytes, str]:
+        """What parsers get - the bytes, or a path they open themselves (picklable either way)"""
+        return self.content if self.in_memory else self.path
+
+    async def read_text(self, encoding: str = "utf-8") -> str:
+        if self.in_memory:
+            return self.content.decode(encoding)
+        with open(self.path, "rb") as file:
+            data = await asyncio.to_thread(file.read)
+        return data.decode(encoding)
+
+    async def iter_chunks(self, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        if self.in_memory:
+            for start in range(0, self.size, chunk_size):
+                yield self.content[start:start + chunk_size]
+            return
+        with open(self.path, "rb") as file:
+            while True:
+                chunk = await asyncio.to_thread(file.read, chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def close(self) -> None:
+        """Drop the content and delete the spool file, if we created one"""
+        self.content = None
+        if self._owned and self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self._owned = False
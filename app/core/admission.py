@@ -0,0 +1,309 @@
+# app/core/admission.py
+"""
+Admission control for upstream model providers
+
+Every call to an upstream (LLM, embeddings) passes through an
+AdmissionController, which applies in order:
+1. a per-user token bucket (RATE_LIMIT_REQUESTS per RATE_LIMIT_PERIOD)
+2. a per-upstream token bucket (the provider quota)
+3. an adaptive concurrency limit (AIMD on latency and 429s)
+
+Interactive requests are served before bulk ones at every step: bulk
+traffic can't take the last tokens of a bucket, may only use part of
+the concurrency limit, and always queues behind waiting interactive calls.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.metrics import PipelineMetrics, get_metrics
+from app.core.request_context import Priority, current_priority, current_user_id, remaining_time
+from app.domain.exceptions import DeadlineExceededError, RateLimitExceededError
+
+
+class TokenBucket:
+    """Classic token bucket - `rate` tokens per second, up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0, reserve: float = 0.0) -> float:
+        """
+        Take tokens if available (keeping `reserve` tokens untouched)
+        Returns 0 on success, otherwise seconds until enough tokens exist
+        """
+        now = time.monotonic()
+        self._refill(now)
+        needed = tokens + reserve
+        if self._tokens >= needed:
+            self._tokens -= tokens
+            return 0.0
+        return (needed - self._tokens) / self.rate
+
+    @property
+    def is_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self._tokens >= self.capacity
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD concurrency limit
+    - additive increase: +1 per limit's worth of fast successes
+    - multiplicative decrease: on 429 / overload errors, or latency above
+      `latency_tolerance` x the observed no-load latency
+    """
+
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 64,
+                 latency_tolerance: float = 2.0, backoff: float = 0.5,
+                 cooldown: float = 1.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self._limit = float(max(minimum, min(maximum, initial)))
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+
+    @property
+    def current(self) -> int:
+        return int(self._limit)
+
+    def on_success(self, latency: float) -> None:
+        if self._baseline is None:
+            self._baseline = latency
+        else:
+            # Track the minimum, drifting up slowly so a permanently slower upstream is accepted
+            self._baseline = min(latency, self._baseline * 1.01)
+
+        if latency > self._baseline * self.latency_tolerance:
+            self._decrease(0.9)
+        else:
+            self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+
+    def on_overload(self) -> None:
+        self._decrease(self.backoff)
+
+    def _decrease(self, factor: float) -> None:
+        # One decrease per cooldown - a burst of 429s is one congestion signal
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(self.minimum, self._limit * factor)
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """429s and provider rate-limit errors, without importing provider SDKs"""
+    if getattr(exc, "status_code", None) in (429, 503):
+        return True
+    return "RateLimit" in type(exc).__name__
+
+
+class AdmissionController:
+    """Admission control in front of one upstream"""
+
+    def __init__(
+        self,
+        name: str,
+        limit: Optional[AdaptiveConcurrencyLimit] = None,
+        upstream_bucket: Optional[TokenBucket] = None,
+        user_rate: Optional[Tuple[float, float]] = None,
+        bulk_share: float = 0.75,
+        bulk_token_reserve: float = 0.2,
+        max_queue_wait: float = 30.0,
+        metrics: Optional[PipelineMetrics] = None,
+    ):
+        """
+        user_rate: (requests, period_seconds) allowed per user, None to disable
+        bulk_share: fraction of the concurrency limit bulk traffic may use
+        bulk_token_reserve: fraction of bucket capacity bulk traffic can't consume
+        max_queue_wait: seconds a call may wait before RateLimitExceededError
+        """
+        self.name = name
+        self.limit = limit or AdaptiveConcurrencyLimit()
+        self.upstream_bucket = upstream_bucket
+        self.user_rate = user_rate
+        self.bulk_share = bulk_share
+        self.bulk_token_reserve = bulk_token_reserve
+        self.max_queue_wait = max_queue_wait
+
+        self._inflight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._queued: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._sequence = itertools.count()
+        self._user_buckets: Dict[str, TokenBucket] = {}
+        self._last_prune = time.monotonic()
+
+        registry = (metrics or get_metrics()).registry
+        self._queue_depth = registry.gauge(
+            "rag_admission_queue_depth", "Calls waiting for a concurrency slot", ("upstream", "priority"))
+        self._wait_seconds = registry.histogram(
+            "rag_admission_wait_seconds", "Time spent in admission control before the upstream call",
+            ("upstream", "priority"))
+        self._inflight_gauge = registry.gauge(
+            "rag_admission_inflight", "Calls currently running against the upstream", ("upstream",))
+        self._limit_gauge = registry.gauge(
+            "rag_admission_concurrency_limit", "Current adaptive concurrency limit", ("upstream",))
+        self._rejected = registry.counter(
+            "rag_admission_rejected_total", "Calls rejected by admission control", ("upstream", "reason"))
+        self._overloads = registry.counter(
+            "rag_admission_overload_total", "Upstream 429 / rate-limit errors", ("upstream",))
+        self._limit_gauge.labels(name).set(self.limit.current)
+
+    @asynccontextmanager
+    async def admit(self, cost: float = 1.0, user_id: Optional[str] = None,
+                    priority: Optional[Priority] = None) -> AsyncIterator[None]:
+        """Wait for admission, run the block, feed the outcome back into the limit"""
+        user_id = user_id if user_id is not None else current_user_id.get()
+        priority = priority if priority is not None else current_priority.get()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + self.max_queue_wait
+        budget = remaining_time()
+        if budget is not None and budget < self.max_queue_wait:
+            # Don't queue past the request's own deadline
+            if budget <= 0:
+                raise DeadlineExceededError(f"{self.name}: request deadline exceeded")
+            deadline = start + budget
+
+        if user_id and self.user_rate:
+            await self._wait_for_tokens(self._user_bucket(user_id), cost, priority, deadline, "user_rate")
+        if self.upstream_bucket is not None:
+            await self._wait_for_tokens(self.upstream_bucket, cost, priority, deadline, "upstream_rate")
+        await self._acquire_slot(priority, deadline)
+
+        self._wait_seconds.labels(self.name, priority.name.lower()).observe(loop.time() - start)
+        began = time.monotonic()
+        try:
+            yield
+        except Exception as exc:
+            if is_overload_error(exc):
+                self._overloads.labels(self.name).inc()
+                self.limit.on_overload()
+            raise
+        else:
+            self.limit.on_success(time.monotonic() - began)
+        finally:
+            self._release_slot()
+
+    # ==================== Token buckets ====================
+
+    def _user_bucket(self, user_id: str) -> TokenBucket:
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            requests, period = self.user_rate
+            bucket = self._user_buckets[user_id] = TokenBucket(rate=requests / period, capacity=requests)
+            self._prune_user_buckets()
+        return bucket
+
+    def _prune_user_buckets(self) -> None:
+        # A full bucket carries no state, so idle users can be dropped
+        now = time.monotonic()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        for user_id in [u for u, b in self._user_buckets.items() if b.is_full]:
+            del self._user_buckets[user_id]
+
+    async def _wait_for_tokens(self, bucket: TokenBucket, cost: float, priority: Priority,
+                               deadline: float, reason: str) -> None:
+        if cost > bucket.capacity:
+            # Would sleep until the deadline for tokens the bucket can never hold
+            self._rejected.labels(self.name, reason).inc()
+            raise RateLimitExceededError(
+                f"{self.name}: request cost {cost:g} exceeds the {reason} bucket capacity {bucket.capacity:g}"
+            )
+        reserve = 0.0
+        if priority == Priority.BULK:
+            # The reserve never makes a request larger than the bucket itself
+            reserve = min(bucket.capacity * self.bulk_token_reserve, bucket.capacity - cost)
+        loop = asyncio.get_running_loop()
+        while True:
+            wait = bucket.try_acquire(cost, reserve)
+            if wait == 0.0:
+                return
+            if loop.time() + wait > deadline:
+                self._rejected.labels(self.name, reason).inc()
+                raise RateLimitExceededError(f"{self.name}: rate limit exceeded ({reason})")
+            await asyncio.sleep(wait)
+
+    # ==================== Concurrency slots ====================
+
+    def _slots_for(self, priority: Priority) -> int:
+        limit = self.limit.current
+        if priority == Priority.INTERACTIVE:
+            return limit
+        return max(1, int(limit * self.bulk_share))
+
+    async def _acquire_slot(self, priority: Priority, deadline: float) -> None:
+        # Interactive calls only queue behind other interactive calls
+        queued_ahead = self._queued[Priority.INTERACTIVE] if priority == Priority.INTERACTIVE else self.queue_depth
+        if not queued_ahead and self._inflight < self._slots_for(priority):
+            self._take_slot()
+            return
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), future))
+        self._set_queued(priority, +1)
+        try:
+            await asyncio.wait_for(future, timeout=max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            self._set_queued(priority, -1)
+            self._rejected.labels(self.name, "queue_timeout").inc()
+            raise RateLimitExceededError(f"{self.name}: timed out waiting for upstream capacity") from None
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # Slot was granted just as we were cancelled - hand it back
+                self._release_slot()
+            else:
+                self._set_queued(priority, -1)
+            raise
+
+    def _take_slot(self) -> None:
+        self._inflight += 1
+        self._inflight_gauge.labels(self.name).set(self._inflight)
+
+    def _release_slot(self) -> None:
+        self._inflight -= 1
+        self._inflight_gauge.labels(self.name).set(self._inflight)
+        self._limit_gauge.labels(self.name).set(self.limit.current)
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                # Timed out or cancelled - already accounted for
+                heapq.heappop(self._waiters)
+                continue
+            if self._inflight >= self._slots_for(Priority(priority)):
+                return
+            heapq.heappop(self._waiters)
+            self._set_queued(Priority(priority), -1)
+            self._take_slot()
+            future.set_result(None)
+
+    def _set_queued(self, priority: Priority, delta: int) -> None:
+        self._queued[priority] += delta
+        self._queue_depth.labels(self.name, priority.name.lower()).set(self._queued[priority])
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(self._queued.values())
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
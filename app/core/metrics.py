@@ -0,0 +1,440 @@
+# app/core/metrics.py
+"""
+Lightweight Prometheus metrics for the RAG pipeline
+
+No external dependency: a small registry with counters, gauges and
+histograms rendered in the Prometheus text exposition format.
+Hot-path cost is a dict lookup, a bisect and a few additions per observation.
+
+Usage:
+    metrics = get_metrics()
+    with metrics.stage("chat", "embed"):
+        ...
+    get_metrics_server()  # once at startup (start_background_services); also serves /profiling control
+"""
+import hmac
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.profiling import current_profile, handle_control_request
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds - covers sub-millisecond cache lookups up to slow LLM generations
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base class - one metric family with labelled children"""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *labelvalues: str):
+        """Get (or create) the child for a label combination"""
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(labelvalues, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, child in list(self._children.items()):
+            lines.extend(self._render_child(labelvalues, child))
+        return lines
+
+    def _render_child(self, labelvalues, child) -> List[str]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _render_child(self, labelvalues, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # Non-cumulative bucket counts, accumulated at render time
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_child(self, labelvalues, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, labelvalues, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, labelvalues)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them for scraping"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} already registered as {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class _StageTimer:
+    """Context manager recording one pipeline stage latency"""
+    __slots__ = ("_child", "_errors", "_start")
+
+    def __init__(self, child, errors):
+        self._child = child
+        self._errors = errors
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._child.observe(time.perf_counter() - self._start)
+        if exc_type is not None:
+            self._errors.inc()
+        return False
+
+
+class _NoopStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_STAGE = _NoopStage()
+
+
+class _ProfiledStage:
+    """Stage timer that also marks the stage boundaries in the request's profile"""
+    __slots__ = ("_timer", "_span")
+
+    def __init__(self, timer, span):
+        self._timer = timer
+        self._span = span
+
+    def __enter__(self):
+        self._span.__enter__()
+        self._timer.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._timer.__exit__(exc_type, exc, tb)
+        self._span.__exit__(exc_type, exc, tb)
+        return False
+
+
+class _AccumulatedStage:
+    """
+    Stage entered many times but recorded once: `with total: ...` per
+    piece of work, then `total.observe()`. Each entry still marks the
+    stage in the request's profile.
+    """
+    __slots__ = ("_child", "_errors", "_name", "_seconds", "_start", "_span")
+
+    def __init__(self, child, errors, name: str):
+        self._child = child
+        self._errors = errors
+        self._name = name
+        self._seconds = 0.0
+        self._span = None
+
+    def __enter__(self):
+        profile = current_profile.get()
+        self._span = profile.stage(self._name) if profile is not None else None
+        if self._span is not None:
+            self._span.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._seconds += time.perf_counter() - self._start
+        if exc_type is not None and self._errors is not None:
+            self._errors.inc()
+        if self._span is not None:
+            self._span.__exit__(exc_type, exc, tb)
+            self._span = None
+        return False
+
+    def observe(self) -> None:
+        if self._child is not None:
+            self._child.observe(self._seconds)
+
+
+class PipelineMetrics:
+    """
+    RAG pipeline instrumentation hooks
+    Stage latency, batch sizes, token counts and cache hit/miss counts
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None, enabled: bool = True):
+        self.registry = registry or MetricsRegistry()
+        self.enabled = enabled
+        self.stage_seconds = self.registry.histogram(
+            "rag_stage_duration_seconds", "Latency of each RAG pipeline stage",
+            ("pipeline", "stage"),
+        )
+        self.stage_errors = self.registry.counter(
+            "rag_stage_errors_total", "Pipeline stages that raised",
+            ("pipeline", "stage"),
+        )
+        self.batch_size = self.registry.histogram(
+            "rag_batch_size", "Number of items per batched call",
+            ("pipeline", "stage"), buckets=SIZE_BUCKETS,
+        )
+        self.tokens = self.registry.counter(
+            "rag_tokens_total", "Tokens sent to / received from model providers",
+            ("model", "kind"),
+        )
+        self.cache_requests = self.registry.counter(
+            "rag_cache_requests_total", "Cache lookups by result - hit ratio is hit / (hit + miss)",
+            ("cache", "result"),
+        )
+
+    def stage(self, pipeline: str, stage: str):
+        """Time a pipeline stage: `with metrics.stage("chat", "embed"): ...`"""
+        profile = current_profile.get()
+        if not self.enabled:
+            return _NOOP_STAGE if profile is None else profile.stage(stage)
+        timer = _StageTimer(
+            self.stage_seconds.labels(pipeline, stage),
+            self.stage_errors.labels(pipeline, stage),
+        )
+        return timer if profile is None else _ProfiledStage(timer, profile.stage(stage))
+
+    def accumulated_stage(self, pipeline: str, stage: str) -> _AccumulatedStage:
+        """Stage spread over several blocks but observed once, e.g. lazy chunking per document"""
+        if not self.enabled:
+            return _AccumulatedStage(None, None, stage)
+        return _AccumulatedStage(
+            self.stage_seconds.labels(pipeline, stage),
+            self.stage_errors.labels(pipeline, stage),
+            stage,
+        )
+
+    def observe_batch(self, pipeline: str, stage: str, size: int) -> None:
+        if self.enabled:
+            self.batch_size.labels(pipeline, stage).observe(size)
+
+    def add_tokens(self, model: str, kind: str, count: Optional[int]) -> None:
+        """kind: prompt, completion or embedding"""
+        if self.enabled and count:
+            self.tokens.labels(model, kind).inc(count)
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        if self.enabled:
+            self.cache_requests.labels(cache, "hit" if hit else "miss").inc()
+
+
+ControlHandler = Callable[[str, str, bytes], Tuple[int, object]]
+
+
+def _make_handler(render: Callable[[], str], control: Optional[ControlHandler] = None,
+                  control_token: str = ""):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if control is not None and self.path.startswith("/profiling"):
+                self._control()
+                return
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self._control()
+
+        def do_DELETE(self):
+            self._control()
+
+        def _control(self):
+            if control is None or not self.path.startswith("/profiling"):
+                self.send_error(404)
+                return
+            if not self._authorized():
+                self.send_error(403)
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            status, payload = control(self.command, self.path, self.rfile.read(length))
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self) -> bool:
+            # /metrics is public to scrapers; profiling control is not
+            if not control_token:
+                return self.client_address[0] in ("127.0.0.1", "::1")
+            return hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {control_token}")
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood stderr
+            pass
+
+    return MetricsHandler
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0",
+                         registry: Optional[MetricsRegistry] = None) -> ThreadingHTTPServer:
+    """
+    Serve /metrics - and /profiling control when PROFILING_ENABLED - from a daemon thread
+    /profiling needs PROFILING_TOKEN as a bearer token, or a request from localhost.
+    """
+    registry = registry or get_metrics().registry
+    control = handle_control_request if settings.PROFILING_ENABLED else None
+    server = ThreadingHTTPServer((host, port), _make_handler(registry.render, control, settings.PROFILING_TOKEN))
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
+
+
+@lru_cache()
+def get_metrics_server() -> Optional[ThreadingHTTPServer]:
+    """
+    Process-wide server on METRICS_PORT, started on first call - None when ENABLE_METRICS
+    is false, or when the port is taken (e.g. another worker process of the app got it first)
+    """
+    if not settings.ENABLE_METRICS:
+        return None
+    try:
+        return start_metrics_server(settings.METRICS_PORT)
+    except OSError as exc:
+        logger.warning("Metrics server not started, port %d unavailable: %s", settings.METRICS_PORT, exc)
+        return None
+
+
+@lru_cache()
+def get_metrics() -> PipelineMetrics:
+    """Process-wide metrics instance, disabled when ENABLE_METRICS is false"""
+    return PipelineMetrics(enabled=settings.ENABLE_METRICS)
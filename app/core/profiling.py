@@ -0,0 +1,479 @@
+# app/core/profiling.py
+"""
+On-demand sampling profiler for live requests
+
+Off by default and free when no rule is active. A rule selects requests
+by sampling rate, user_id, pipeline and time window; rules are added and
+removed at runtime (see handle_control_request, served next to /metrics).
+
+For every selected request we record:
+- sampled stacks (sys._current_frames from a background thread) taken
+  only while the request's own coroutine is running on the event loop
+- per pipeline stage: wall time, CPU time of the request's coroutine
+  steps, and the difference - time spent waiting on I/O, locks, queues
+  (work the request hands to other tasks or threads counts as waiting)
+
+Each profile is written to PROFILE_OUTPUT_DIR as
+  <pipeline>-<timestamp>-<id>.folded  collapsed stacks (flamegraph.pl, speedscope)
+  <pipeline>-<timestamp>-<id>.json    stage CPU / wait summary
+and only the newest PROFILE_KEEP profiles are kept. Rules added at runtime
+end after PROFILE_MAX_RULE_SECONDS at most.
+"""
+import asyncio
+import functools
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+@dataclass
+class ProfilingRule:
+    """Which requests to profile - every set field must match"""
+    sample_rate: float = 1.0  # fraction of matching requests
+    user_id: Optional[str] = None
+    pipeline: Optional[str] = None  # "chat", "ingest"
+    starts_at: Optional[float] = None  # unix time
+    ends_at: Optional[float] = None
+    max_profiles: Optional[int] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    profiles_taken: int = 0
+
+    def __post_init__(self):
+        # Rules come from JSON at runtime - a bad field must fail here, not in a live request
+        self.sample_rate = _number("sample_rate", self.sample_rate)
+        if not 0.0 <= self.sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be between 0 and 1, got {self.sample_rate}")
+        for name in ("user_id", "pipeline"):
+            value = getattr(self, name)
+            if value is not None and not isinstance(value, str):
+                raise TypeError(f"{name} must be a string")
+        if self.starts_at is not None:
+            self.starts_at = _number("starts_at", self.starts_at)
+        if self.ends_at is not None:
+            self.ends_at = _number("ends_at", self.ends_at)
+        if self.max_profiles is not None:
+            if isinstance(self.max_profiles, bool) or not isinstance(self.max_profiles, int) \
+                    or self.max_profiles < 0:
+                raise ValueError("max_profiles must be a non-negative integer")
+
+    def matches(self, pipeline: str, user_id: Optional[str], now: float) -> bool:
+        if self.pipeline is not None and self.pipeline != pipeline:
+            return False
+        if self.user_id is not None and self.user_id != user_id:
+            return False
+        if self.starts_at is not None and now < self.starts_at:
+            return False
+        if self.ends_at is not None and now >= self.ends_at:
+            return False
+        if self.max_profiles is not None and self.profiles_taken >= self.max_profiles:
+            return False
+        return random.random() < self.sample_rate
+
+    def expired(self, now: float) -> bool:
+        return ((self.ends_at is not None and now >= self.ends_at)
+                or (self.max_profiles is not None and self.profiles_taken >= self.max_profiles))
+
+
+def _number(name: str, value) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"{name} must be a number, got {value!r}")
+    return float(value)
+
+
+class _StageSpan:
+    """Context manager marking one pipeline stage inside a profiled request"""
+    __slots__ = ("_profile", "_name", "_start")
+
+    def __init__(self, profile: "RequestProfile", name: str):
+        self._profile = profile
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._profile._flush()
+        self._profile._stages.append(self._name)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        profile = self._profile
+        profile._flush()
+        profile._stages.remove(self._name)
+        profile.stage_wall[self._name] = profile.stage_wall.get(self._name, 0.0) + time.perf_counter() - self._start
+        return False
+
+
+class RequestProfile:
+    """Samples and stage timings for one request"""
+
+    def __init__(self, pipeline: str, user_id: Optional[str], rule_id: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.pipeline = pipeline
+        self.user_id = user_id
+        self.rule_id = rule_id
+        self.started_at = time.time()
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.steps = 0
+        self.samples: Counter = Counter()
+        self.stage_wall: Dict[str, float] = {}
+        self.stage_cpu: Dict[str, float] = {}
+        self._stages: List[str] = []
+        self._step_thread: Optional[int] = None
+        self._step_mark = 0.0
+
+    def stage(self, name: str) -> _StageSpan:
+        return _StageSpan(self, name)
+
+    def _begin_step(self) -> None:
+        self._step_thread = threading.get_ident()
+        self._step_mark = time.thread_time()
+
+    def _end_step(self) -> None:
+        self._flush()
+        self._step_thread = None
+        self.steps += 1
+
+    def _flush(self) -> None:
+        """Charge CPU used since the last mark to the stages open right now"""
+        if self._step_thread != threading.get_ident():
+            return
+        now = time.thread_time()
+        seconds = now - self._step_mark
+        self._step_mark = now
+        self.cpu += seconds
+        for name in self._stages:
+            self.stage_cpu[name] = self.stage_cpu.get(name, 0.0) + seconds
+
+    def add_sample(self, stack: str) -> None:
+        # Pipeline and innermost stage as the root frames, so flamegraphs split by stage
+        stage = self._stages[-1] if self._stages else "-"
+        self.samples[f"{self.pipeline};{stage};{stack}"] += 1
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "pipeline": self.pipeline,
+            "user_id": self.user_id,
+            "rule_id": self.rule_id,
+            "started_at": self.started_at,
+            "wall_seconds": self.wall,
+            "cpu_seconds": self.cpu,
+            "wait_seconds": max(0.0, self.wall - self.cpu),
+            "coroutine_steps": self.steps,
+            "samples": sum(self.samples.values()),
+            "stages": {
+                name: {
+                    "wall_seconds": wall,
+                    "cpu_seconds": self.stage_cpu.get(name, 0.0),
+                    "wait_seconds": max(0.0, wall - self.stage_cpu.get(name, 0.0)),
+                }
+                for name, wall in self.stage_wall.items()
+            },
+        }
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def write(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(self.started_at))
+        base = os.path.join(directory, f"{self.pipeline}-{stamp}-{self.id}")
+        with open(base + ".folded", "w") as folded:
+            folded.write(self.folded())
+        with open(base + ".json", "w") as summary:
+            json.dump(self.summary(), summary, indent=2)
+        return base
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+class _ProfiledCoroutine:
+    """
+    Drives a coroutine step by step, timing the CPU of each step
+    Time between steps is time the request spent suspended (waiting).
+    While a step runs, the sampler attributes event-loop stacks to it.
+    """
+
+    def __init__(self, coro, profile: RequestProfile, profiler: "Profiler"):
+        self._coro = coro
+        self._profile = profile
+        self._profiler = profiler
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    def send(self, value):
+        return self._step(self._coro.send, value)
+
+    def throw(self, *args):
+        return self._step(self._coro.throw, *args)
+
+    def close(self):
+        return self._coro.close()
+
+    def _step(self, method, *args):
+        thread_id = threading.get_ident()
+        running = self._profiler._running
+        outer = running.get(thread_id)
+        running[thread_id] = self._profile
+        self._profile._begin_step()
+        try:
+            return method(*args)
+        finally:
+            self._profile._end_step()
+            if outer is None:
+                running.pop(thread_id, None)
+            else:
+                running[thread_id] = outer
+
+
+class _Sampler(threading.Thread):
+    """Samples the stacks of threads currently running a profiled step"""
+
+    def __init__(self, profiler: "Profiler", interval: float):
+        super().__init__(name="profiler-sampler", daemon=True)
+        self.profiler = profiler
+        self.interval = interval
+
+    def run(self) -> None:
+        marker = _ProfiledCoroutine._step.__code__
+        while self.profiler._active:
+            time.sleep(self.interval)
+            running = dict(self.profiler._running)
+            if not running:
+                continue
+            frames = sys._current_frames()
+            for thread_id, profile in running.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    profile.add_sample(_collapse(frame, marker))
+
+
+def _collapse(frame, marker) -> str:
+    """Root-first 'a;b;c' stack, starting below the profiler's own step frame"""
+    stack = []
+    while frame is not None:
+        if frame.f_code is marker:
+            break
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class Profiler:
+    """Process-wide rule set and sampler"""
+
+    def __init__(self, output_dir: str = "./data/profiles", sample_interval: float = 0.005,
+                 keep: int = 100, max_rule_seconds: float = 600.0):
+        """
+        keep: newest profiles left in output_dir - older ones are deleted
+        max_rule_seconds: longest a rule added through the control surface runs
+        """
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.keep = keep
+        self.max_rule_seconds = max_rule_seconds
+        self._rules: Dict[str, ProfilingRule] = {}
+        self._lock = threading.Lock()
+        self._active = 0
+        self._running: Dict[int, RequestProfile] = {}
+        self._sampler: Optional[_Sampler] = None
+        self.recent: List[Dict] = []
+
+    # ==================== Rules ====================
+
+    def add_rule(self, rule: ProfilingRule) -> ProfilingRule:
+        with self._lock:
+            self._rules[rule.id] = rule
+        return rule
+
+    def remove_rule(self, rule_id: str) -> bool:
+        with self._lock:
+            return self._rules.pop(rule_id, None) is not None
+
+    def rules(self) -> List[ProfilingRule]:
+        with self._lock:
+            return list(self._rules.values())
+
+    def _select(self, pipeline: str, user_id: Optional[str]) -> Optional[ProfilingRule]:
+        if not self._rules:
+            return None
+        now = time.time()
+        with self._lock:
+            for rule_id in [r.id for r in self._rules.values() if r.expired(now)]:
+                del self._rules[rule_id]
+            for rule in list(self._rules.values()):
+                try:
+                    selected = rule.matches(pipeline, user_id, now)
+                except (TypeError, ValueError):
+                    # A broken rule is dropped rather than failing the request
+                    del self._rules[rule.id]
+                    continue
+                if selected:
+                    rule.profiles_taken += 1
+                    return rule
+        return None
+
+    # ==================== Sessions ====================
+
+    async def run(self, pipeline: str, user_id: Optional[str], call: Callable[[], Awaitable]):
+        """
+        Await call(), profiled if a rule selects this request
+        The rule is picked before the coroutine is created, so nothing is left un-awaited.
+        """
+        rule = self._select(pipeline, user_id) if current_profile.get() is None else None
+        if rule is None:
+            return await call()
+
+        profile = RequestProfile(pipeline, user_id, rule.id)
+        token = current_profile.set(profile)
+        self._start_sampling()
+        start = time.perf_counter()
+        try:
+            return await _ProfiledCoroutine(call(), profile, self)
+        finally:
+            profile.wall = time.perf_counter() - start
+            current_profile.reset(token)
+            self._stop_sampling()
+            await asyncio.shield(asyncio.to_thread(self._finish, profile))
+
+    def _finish(self, profile: RequestProfile) -> None:
+        path = profile.write(self.output_dir)
+        summary = {**profile.summary(), "output": path}
+        with self._lock:
+            self.recent = (self.recent + [summary])[-20:]
+        self._prune()
+
+    def _prune(self) -> None:
+        """Delete all but the newest `keep` profiles (a .folded and a .json file each)"""
+        try:
+            entries = [entry for entry in os.scandir(self.output_dir)
+                       if entry.is_file() and entry.name.endswith((".folded", ".json"))]
+        except FileNotFoundError:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        bases = list(dict.fromkeys(os.path.splitext(entry.path)[0] for entry in entries))
+        for base in bases[self.keep:]:
+            for suffix in (".folded", ".json"):
+                try:
+                    os.remove(base + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def _start_sampling(self) -> None:
+        with self._lock:
+            self._active += 1
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = _Sampler(self, self.sample_interval)
+                self._sampler.start()
+
+    def _stop_sampling(self) -> None:
+        # The sampler thread exits by itself once nothing is being profiled
+        with self._lock:
+            self._active -= 1
+
+
+def profiled(pipeline: str):
+    """
+    Decorator for request entry points (async methods with a user_id argument)
+    Costs one dict check per call while no profiling rule exists.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            profiler = get_profiler()
+            if not profiler._rules:
+                return await fn(*args, **kwargs)
+            user_id = kwargs.get("user_id")
+            if user_id is None:
+                user_id = signature.bind_partial(*args, **kwargs).arguments.get("user_id")
+            return await profiler.run(pipeline, user_id, functools.partial(fn, *args, **kwargs))
+
+        return wrapper
+    return decorator
+
+
+# ==================== Runtime control ====================
+
+def handle_control_request(method: str, path: str, body: bytes,
+                           profiler: Optional[Profiler] = None) -> Tuple[int, object]:
+    """
+    HTTP-style control surface, mounted under /profiling by the metrics server
+        GET    /profiling/rules         list rules
+        POST   /profiling/rules         add a rule - JSON ProfilingRule fields,
+                                        plus "duration" (seconds from now); the rule
+                                        ends after max_rule_seconds at most
+        DELETE /profiling/rules/<id>    remove a rule
+        GET    /profiling/recent        summaries of the latest profiles
+    """
+    profiler = profiler or get_profiler()
+    parts = [part for part in path.split("?")[0].split("/") if part]
+    if parts[:2] == ["profiling", "rules"] and len(parts) == 2:
+        if method == "GET":
+            return 200, [asdict(rule) for rule in profiler.rules()]
+        if method == "POST":
+            try:
+                fields = json.loads(body or b"{}")
+                if not isinstance(fields, dict):
+                    raise ValueError("Expected a JSON object")
+                duration = fields.pop("duration", None)
+                allowed = {name for name in ProfilingRule.__dataclass_fields__ if name not in ("id", "profiles_taken")}
+                unknown = set(fields) - allowed
+                if unknown:
+                    return 400, {"error": f"Unknown fields: {sorted(unknown)}"}
+                rule = ProfilingRule(**fields)
+                starts_at = rule.starts_at or time.time()
+                if duration is not None:
+                    duration = _number("duration", duration)
+                    if duration <= 0:
+                        raise ValueError("duration must be positive")
+                    rule.ends_at = starts_at + duration
+                # A forgotten rule must not keep sampling (and writing files) for good
+                latest = starts_at + profiler.max_rule_seconds
+                rule.ends_at = latest if rule.ends_at is None else min(rule.ends_at, latest)
+            except (ValueError, TypeError) as exc:
+                return 400, {"error": str(exc)}
+            return 201, asdict(profiler.add_rule(rule))
+    if parts[:2] == ["profiling", "rules"] and len(parts) == 3 and method == "DELETE":
+        if profiler.remove_rule(parts[2]):
+            return 200, {"deleted": parts[2]}
+        return 404, {"error": f"No rule {parts[2]}"}
+    if parts == ["profiling", "recent"] and method == "GET":
+        return 200, profiler.recent
+    return 404, {"error": "Not found"}
+
+
+@lru_cache()
+def get_profiler() -> Profiler:
+    """Process-wide profiler; PROFILE_SAMPLE_RATE > 0 installs a standing rule"""
+    profiler = Profiler(
+        output_dir=settings.PROFILE_OUTPUT_DIR,
+        sample_interval=settings.PROFILE_SAMPLE_INTERVAL,
+        keep=settings.PROFILE_KEEP,
+        max_rule_seconds=settings.PROFILE_MAX_RULE_SECONDS,
+    )
+    if settings.PROFILING_ENABLED and settings.PROFILE_SAMPLE_RATE > 0:
+        profiler.add_rule(ProfilingRule(sample_rate=settings.PROFILE_SAMPLE_RATE))
+    return profiler
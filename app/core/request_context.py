@@ -0,0 +1,55 @@
+# app/core/request_context.py
+"""
+Request-scoped context carried across awaits with contextvars
+Lets infrastructure (rate limiting, retries, tracing) know who a call is
+for and how long it may take without threading user_id / deadlines
+through every interface.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Iterator, Optional
+
+
+class Priority(IntEnum):
+    """Lower value is served first"""
+    INTERACTIVE = 0  # chat traffic - a user is waiting
+    BULK = 1  # ingestion, re-indexing
+
+
+current_user_id: ContextVar[Optional[str]] = ContextVar("current_user_id", default=None)
+current_priority: ContextVar[Priority] = ContextVar("current_priority", default=Priority.INTERACTIVE)
+# Absolute time.monotonic() by which the request must be answered, None = no deadline
+current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline (may be negative), None without one"""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@contextmanager
+def request_scope(user_id: Optional[str] = None, priority: Optional[Priority] = None,
+                  timeout: Optional[float] = None) -> Iterator[None]:
+    """
+    Set user / priority / deadline for everything awaited inside the block
+    A timeout never extends a deadline set by an outer scope.
+    """
+    tokens = []
+    if user_id is not None:
+        tokens.append((current_user_id, current_user_id.set(user_id)))
+    if priority is not None:
+        tokens.append((current_priority, current_priority.set(priority)))
+    if timeout is not None:
+        deadline = time.monotonic() + timeout
+        outer = current_deadline.get()
+        if outer is not None:
+            deadline = min(deadline, outer)
+        tokens.append((current_deadline, current_deadline.set(deadline)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
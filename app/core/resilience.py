@@ -0,0 +1,280 @@
+# app/core/resilience.py
+"""
+Resilience for upstream calls: deadlines, retries, hedging, circuit breaking
+
+A ResilientCaller runs one logical upstream call as up to `max_attempts`
+attempts:
+1. fail fast with UpstreamUnavailableError while the circuit is open
+2. bound every attempt by the request deadline (request_context)
+3. retry transient errors (429, 5xx, timeouts, connection errors) after a
+   jittered backoff - but only if the backoff still fits in the budget;
+   429s are pushback from a healthy upstream and never open the circuit
+4. optionally hedge: if an attempt is still running after the observed
+   p95 latency, send a duplicate and take whichever answers first
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+from app.core.admission import is_overload_error
+from app.core.metrics import PipelineMetrics, get_metrics
+from app.core.request_context import remaining_time
+from app.domain.exceptions import (
+    DeadlineExceededError,
+    RateLimitExceededError,
+    UpstreamUnavailableError,
+)
+
+T = TypeVar("T")
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Errors worth retrying, without importing provider SDKs"""
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if is_overload_error(exc):
+        return True
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status >= 500 or status == 408
+    # openai.APIConnectionError / APITimeoutError carry no status code
+    return any(name in type(exc).__name__ for name in ("Timeout", "Connection"))
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """The upstream throttled us - it is up and answering"""
+    return getattr(exc, "status_code", None) == 429 or "RateLimit" in type(exc).__name__
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 5.0,
+                 rng: Optional[random.Random] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before attempt `attempt + 1` (attempt counts from 1)"""
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+    closed -> open after `failure_threshold` transient failures in a row;
+    open -> half-open after `reset_timeout`, letting one probe through;
+    the probe's outcome closes or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = self.CLOSED
+        self._probe_inflight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_inflight = False
+        return self._state
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_inflight:
+            self._probe_inflight = True
+            return True
+        return False
+
+    def on_success(self) -> None:
+        self._failures = 0
+        self._state = self.CLOSED
+        self._probe_inflight = False
+
+    def on_failure(self) -> None:
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_inflight = False
+
+    def on_abandoned(self) -> None:
+        """Attempt ended without an upstream verdict (cancelled, deadline) - free the probe"""
+        self._probe_inflight = False
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent attempt latencies
+    Attempts cancelled before answering (a hedge won) add the time they ran
+    as a lower bound - left out, the slow tail would vanish from the window.
+    """
+
+    def __init__(self, window: int = 1000, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, latency: float) -> None:
+        self._samples.append(latency)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """None until enough samples exist to trust the estimate"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class ResilientCaller:
+    """Retries, hedging and circuit breaking around calls to one upstream"""
+
+    def __init__(
+        self,
+        name: str,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        hedge_percentile: Optional[float] = None,
+        metrics: Optional[PipelineMetrics] = None,
+    ):
+        """hedge_percentile: hedge attempts still running after this latency percentile, None = never"""
+        self.name = name
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_percentile = hedge_percentile
+        self.latencies = LatencyTracker()
+
+        registry = (metrics or get_metrics()).registry
+        self._attempts = registry.counter(
+            "rag_upstream_attempts_total", "Upstream call attempts by outcome", ("upstream", "outcome"))
+        self._retries = registry.counter(
+            "rag_upstream_retries_total", "Upstream calls retried after a transient error", ("upstream",))
+        self._hedges = registry.counter(
+            "rag_upstream_hedges_total", "Hedged requests sent, by which request answered first",
+            ("upstream", "winner"))
+        self._rejected = registry.counter(
+            "rag_upstream_rejected_total", "Calls failed fast by the resilience layer", ("upstream", "reason"))
+        self._circuit_open = registry.gauge(
+            "rag_upstream_circuit_open", "1 while the upstream circuit breaker is open", ("upstream",))
+
+    async def call(self, fn: Callable[[], Awaitable[T]], hedge: bool = False) -> T:
+        """Run fn() - a fresh coroutine per attempt - under the resilience policy"""
+        attempt = 0
+        while True:
+            attempt += 1
+            if not self.breaker.allow():
+                self._circuit_open.labels(self.name).set(1)
+                self._rejected.labels(self.name, "circuit_open").inc()
+                raise UpstreamUnavailableError(f"{self.name}: circuit open, upstream failing")
+            budget = remaining_time()
+            if budget is not None and budget <= 0:
+                self.breaker.on_abandoned()
+                self._rejected.labels(self.name, "deadline").inc()
+                raise DeadlineExceededError(f"{self.name}: request deadline exceeded")
+
+            try:
+                if hedge and self.hedge_percentile is not None:
+                    result = await self._hedged(fn, budget)
+                else:
+                    result = await self._attempt(fn, budget)
+            except asyncio.CancelledError:
+                self.breaker.on_abandoned()
+                raise
+            except RateLimitExceededError:
+                # Our own admission control said no - not an upstream failure
+                self.breaker.on_abandoned()
+                raise
+            except asyncio.TimeoutError as exc:
+                budget = remaining_time()
+                if budget is not None and budget <= 0:
+                    # Our deadline ran out, which says nothing about the upstream's health
+                    self.breaker.on_abandoned()
+                    self._rejected.labels(self.name, "deadline").inc()
+                    raise DeadlineExceededError(f"{self.name}: request deadline exceeded") from exc
+                if not await self._should_retry(exc, attempt):
+                    raise
+                continue
+            except Exception as exc:
+                if not await self._should_retry(exc, attempt):
+                    raise
+                continue
+
+            self._attempts.labels(self.name, "success").inc()
+            self.breaker.on_success()
+            self._circuit_open.labels(self.name).set(0)
+            return result
+
+    async def _should_retry(self, exc: Exception, attempt: int) -> bool:
+        """Record a failed attempt; sleep and return True if another attempt fits"""
+        transient = is_transient_error(exc)
+        rate_limited = transient and is_rate_limited(exc)
+        outcome = "rate_limited" if rate_limited else "transient_error" if transient else "error"
+        self._attempts.labels(self.name, outcome).inc()
+        if not transient:
+            # 4xx - the request is wrong, retrying can't help and the upstream is fine
+            self.breaker.on_abandoned()
+            return False
+        if rate_limited:
+            # Throttling is load, not ill health - backing off is the remedy, not failing fast
+            self.breaker.on_abandoned()
+        else:
+            self.breaker.on_failure()
+        self._circuit_open.labels(self.name).set(int(self.breaker.state == CircuitBreaker.OPEN))
+
+        delay = self.retry.backoff(attempt)
+        budget = remaining_time()
+        if attempt >= self.retry.max_attempts or (budget is not None and delay >= budget):
+            return False
+        self._retries.labels(self.name).inc()
+        await asyncio.sleep(delay)
+        return True
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], budget: Optional[float]) -> T:
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(fn(), timeout=budget)
+        except asyncio.CancelledError:
+            # Censored sample: it would have taken at least this long. Dropping the
+            # primaries a hedge beat would shrink the percentile and hedge ever more
+            self.latencies.observe(time.monotonic() - started)
+            raise
+        self.latencies.observe(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]], budget: Optional[float]) -> T:
+        hedge_delay = self.latencies.percentile(self.hedge_percentile)
+        if hedge_delay is None or (budget is not None and hedge_delay >= budget):
+            return await self._attempt(fn, budget)
+
+        primary = asyncio.ensure_future(self._attempt(fn, budget))
+        pending = {primary}
+        # Owns every task from here - a caller cancelled during the hedge delay cancels the primary too
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if done:
+                return primary.result()
+
+            budget = remaining_time()
+            hedge = asyncio.ensure_future(self._attempt(fn, budget))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._hedges.labels(self.name, "primary" if task is primary else "hedge").inc()
+                        return task.result()
+            # Both failed - surface the primary's error
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
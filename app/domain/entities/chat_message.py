@@ -11,25 +11,26 @@ class MessageRole(str , Enum):
     ASSISTANT= "assistant"
 
 
-@dataclass
+@dataclass(slots=True)
 class ChatMessage:
     """
     Domain Entity for Chat Messages  
     Represent a single message in a conversation
+    Slotted - no per-instance __dict__, metadata only allocated when used
     """
     role:MessageRole
     content:str
     id:str=field(default_factory=lambda:str(uuid4()))
     created_at:datetime=field(default_factory=datetime.utcnow)
-    metadata:Optional[dict]=field(default_factory=dict)
+    metadata:Optional[dict]=None
 
     def __post_init__(self):
         """Validate message after initialization"""
         if not self.content.strip():
             raise ValueError("Message content connot be empty")
         
-        if isinstance(self.role , str):
-            self.role = MessageRole.USER
+        if not isinstance(self.role , MessageRole):
+            self.role = MessageRole(self.role)
 
     def is_from_user(self) -> bool:
         """Check if message is from user"""
@@ -44,3 +45,7 @@ class ChatMessage:
         if len(self.content) <= max_length:
             return self.content
         return self.content[:max_length] + "..."
+
+    def estimate_tokens(self) -> int:
+        """Rough token count (~4 chars per token + role overhead)"""
+        return len(self.content) // 4 + 4
@@ -2,7 +2,6 @@ from dataclasses import dataclass , field
 from datetime import datetime
 from typing import List ,Optional
 from uuid import uuid4
-from app.infrastructure.llm.openai_adapter import OpenAIAdapter  
 from app.domain.entities.chat_message import ChatMessage, MessageRole
 
 
@@ -11,6 +10,10 @@ class Conversation:
     """
     Domain Entity for conversations 
     Represents a chat session with multiple messages
+
+    `messages` holds only the loaded tail of the conversation - older
+    messages live in the conversation store, counted by
+    `earlier_message_count` and optionally condensed into `summary`.
     """
 
     id :str= field(default_factory=lambda:str(uuid4()))
@@ -20,9 +23,10 @@ class Conversation:
     created_at:datetime = field(default_factory=datetime.utcnow)
     updated_at:datetime=field(default_factory=datetime.utcnow)
     metadata:dict = field(default_factory=dict)
+    earlier_message_count:int = 0
+    summary:Optional[str] = None
     
 
-
     def add_message(self , role:MessageRole , content:str) -> ChatMessage:
 
         message = ChatMessage(role = role , content=content)
@@ -40,8 +44,15 @@ class Conversation:
         return self.add_message(MessageRole.ASSISTANT , content)
     
     def get_message_count(self) -> int:
-        """Get total message count"""
-        return len(self.messages)
+        """Get total message count, including messages not loaded"""
+        return self.earlier_message_count + len(self.messages)
+
+    def trim(self , keep_last:int) -> None:
+        """Drop all but the most recent messages from memory (they stay in the store)"""
+        if len(self.messages) > keep_last:
+            dropped = len(self.messages) - keep_last
+            del self.messages[:dropped]
+            self.earlier_message_count += dropped
     
     def _generate_title(self , content:str) -> str:
         return content[:20]
@@ -54,4 +65,4 @@ class Conversation:
             if message.is_from_user():
                 return message
             
-        return None
\ No newline at end of file
+        return None
@@ -1,6 +1,10 @@
-from dataclasses import dataclass
+import re
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List
+from typing import Iterator, List
+
+
+_WORD_RE = re.compile(r"\S+")
 
 
 @dataclass
@@ -14,25 +18,27 @@ class Document:
     content:str
     created_at:datetime
     user_id:str
-    chunks: List[str]= []
+    chunks: List[str]= field(default_factory=list)
     
     def split_into_chunks(self, chunk_size : int = 1000) -> list[str]:
-        words = self.content.split()
-        chunks = []
+        chunks = list(self.iter_chunks(chunk_size))
+        self.chunks = chunks
+        return chunks
+
+    def iter_chunks(self, chunk_size : int = 1000) -> Iterator[str]:
+        """Same chunks as split_into_chunks, produced lazily - no word list of the whole text"""
         current_chunk = []
         current_size = 0
-        for word in words:
+        for match in _WORD_RE.finditer(self.content):
+            word = match.group()
             current_chunk.append(word)
             current_size += len(word) + 1
 
             if current_size >= chunk_size:
-                chunks.append(" ".join(current_chunk))
+                yield " ".join(current_chunk)
                 current_chunk = []
                 current_size = 0
 
         if current_chunk:
-            chunks.append(" ".join(current_chunk))
-
-        self.chunks = chunks
-        return chunks
+            yield " ".join(current_chunk)
 
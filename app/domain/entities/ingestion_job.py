@@ -0,0 +1,33 @@
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+
+class JobStatus(str, Enum):
+    """Ingestion job lifecycle"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass
+class IngestionJob:
+    """
+    Domain Entity for background document ingestion
+    document_id is fixed at enqueue time so retries resume the same document
+    """
+    id: str
+    user_id: str
+    filename: str
+    document_id: str
+    status: JobStatus
+    attempts: int
+    created_at: datetime
+    updated_at: datetime
+    error: Optional[str] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (JobStatus.DONE, JobStatus.FAILED)
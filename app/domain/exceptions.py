@@ -10,3 +10,15 @@ class InvalidDocumentFormatError(DomainException):
 
 class EmbeddingError(DomainException):
     pass
+
+class RateLimitExceededError(DomainException):
+    pass
+
+class DeadlineExceededError(DomainException):
+    pass
+
+class UpstreamUnavailableError(DomainException):
+    pass
+
+class FileTooLargeError(DomainException):
+    pass
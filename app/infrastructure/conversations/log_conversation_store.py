@@ -0,0 +1,283 @@
+# app/infrastructure/conversations/log_conversation_store.py
+import asyncio
+import json
+import os
+import re
+import struct
+import tempfile
+import weakref
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from app.application.interfaces.conversation_store import IConversationStore
+from app.domain.entities.chat_message import ChatMessage, MessageRole
+from app.domain.entities.conversation import Conversation
+
+
+# Message record: role, flags, created_at (unix seconds), content length, metadata length
+_RECORD = struct.Struct("<BBdII")
+# Index entry per message: log offset, record length, estimated tokens
+_INDEX = struct.Struct("<QII")
+_FLAG_UUID_ID = 1
+_ROLES = list(MessageRole)
+_ROLE_CODES = {role: code for code, role in enumerate(_ROLES)}
+# Index entries read per step when walking back for a token budget
+_INDEX_BLOCK = 256
+# Conversation ids become file names - nothing that could leave the store's root
+_CONVERSATION_ID = re.compile(r"[A-Za-z0-9_-]+")
+
+
+class AppendOnlyConversationStore(IConversationStore):
+    """
+    Per-conversation append-only message logs
+
+    Files per conversation under `root/<id[:2]>/`:
+        <id>.log   compact binary message records, append only
+        <id>.idx   fixed-width (offset, length, tokens) entry per message
+        <id>.json  header - title, metadata, summary
+
+    Loading the tail only reads the last index entries and one contiguous
+    slice of the log, whatever the conversation length. The index is the
+    source of truth: a record written without its index entry (crash
+    mid-append) is simply never referenced.
+    """
+
+    def __init__(self, root: str = "./data/conversations"):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    async def save(self, conversation: Conversation) -> None:
+        async with self._lock(conversation.id):
+            await asyncio.to_thread(self._save_header, conversation)
+
+    async def append(self, conversation_id: str, message: ChatMessage) -> None:
+        record = _encode(message)
+        tokens = message.estimate_tokens()
+        async with self._lock(conversation_id):
+            await asyncio.to_thread(self._append_sync, conversation_id, record, tokens)
+
+    async def load(self, conversation_id: str, last_n: int = 20,
+                   max_tokens: Optional[int] = None) -> Optional[Conversation]:
+        return await asyncio.to_thread(self._load_sync, conversation_id, last_n, max_tokens)
+
+    async def load_range(self, conversation_id: str, start: int, stop: int) -> List[ChatMessage]:
+        return await asyncio.to_thread(self._load_range_sync, conversation_id, start, stop)
+
+    async def set_summary(self, conversation_id: str, summary: str, upto: int) -> None:
+        async with self._lock(conversation_id):
+            await asyncio.to_thread(self._set_summary_sync, conversation_id, summary, upto)
+
+    async def delete(self, conversation_id: str) -> None:
+        async with self._lock(conversation_id):
+            for path in self._paths(conversation_id):
+                try:
+                    await asyncio.to_thread(path.unlink)
+                except FileNotFoundError:
+                    pass
+
+    def message_count(self, conversation_id: str) -> int:
+        """Total messages stored - O(1), from the index size"""
+        try:
+            return self._index_path(conversation_id).stat().st_size // _INDEX.size
+        except FileNotFoundError:
+            return 0
+
+    # ==================== Internals ====================
+
+    def _lock(self, conversation_id: str) -> asyncio.Lock:
+        lock = self._locks.get(conversation_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[conversation_id] = lock
+        return lock
+
+    def _dir(self, conversation_id: str) -> Path:
+        if not _CONVERSATION_ID.fullmatch(conversation_id):
+            raise ValueError(f"Invalid conversation id {conversation_id!r}")
+        return self.root / conversation_id[:2]
+
+    def _log_path(self, conversation_id: str) -> Path:
+        return self._dir(conversation_id) / f"{conversation_id}.log"
+
+    def _index_path(self, conversation_id: str) -> Path:
+        return self._dir(conversation_id) / f"{conversation_id}.idx"
+
+    def _header_path(self, conversation_id: str) -> Path:
+        return self._dir(conversation_id) / f"{conversation_id}.json"
+
+    def _paths(self, conversation_id: str) -> List[Path]:
+        return [
+            self._log_path(conversation_id),
+            self._index_path(conversation_id),
+            self._header_path(conversation_id),
+        ]
+
+    def _read_header(self, conversation_id: str) -> Optional[Dict]:
+        try:
+            return json.loads(self._header_path(conversation_id).read_text())
+        except FileNotFoundError:
+            return None
+
+    def _write_header(self, conversation_id: str, header: Dict) -> None:
+        directory = self._dir(conversation_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as tmp:
+            json.dump(header, tmp)
+        os.replace(tmp_path, self._header_path(conversation_id))
+
+    def _save_header(self, conversation: Conversation) -> None:
+        header = self._read_header(conversation.id) or {}
+        header.update({
+            "id": conversation.id,
+            "user_id": conversation.user_id,
+            "title": conversation.title,
+            "created_at": conversation.created_at.isoformat(),
+            "metadata": conversation.metadata,
+        })
+        self._write_header(conversation.id, header)
+
+    def _set_summary_sync(self, conversation_id: str, summary: str, upto: int) -> None:
+        header = self._read_header(conversation_id) or {"id": conversation_id}
+        header["summary"] = summary
+        header["summary_upto"] = upto
+        self._write_header(conversation_id, header)
+
+    def _append_sync(self, conversation_id: str, record: bytes, tokens: int) -> None:
+        self._dir(conversation_id).mkdir(parents=True, exist_ok=True)
+        with open(self._log_path(conversation_id), "ab") as log:
+            # Real end of file - skips any orphaned record from an interrupted append
+            offset = os.fstat(log.fileno()).st_size
+            log.write(record)
+            log.flush()
+        with open(self._index_path(conversation_id), "ab") as index:
+            # Drop a torn entry from an interrupted append before adding ours
+            size = os.fstat(index.fileno()).st_size
+            if size % _INDEX.size:
+                index.truncate(size - size % _INDEX.size)
+            index.write(_INDEX.pack(offset, len(record), tokens))
+
+    def _read_index(self, conversation_id: str, start: int, stop: int) -> List[tuple]:
+        if stop <= start:
+            return []
+        with open(self._index_path(conversation_id), "rb") as index:
+            index.seek(start * _INDEX.size)
+            data = index.read((stop - start) * _INDEX.size)
+        return list(_INDEX.iter_unpack(data))
+
+    def _read_records(self, conversation_id: str, entries: List[tuple]) -> List[ChatMessage]:
+        if not entries:
+            return []
+        first_offset = entries[0][0]
+        last_offset, last_length, _ = entries[-1]
+        with open(self._log_path(conversation_id), "rb") as log:
+            log.seek(first_offset)
+            data = log.read(last_offset + last_length - first_offset)
+        view = memoryview(data)
+        return [
+            _decode(view[offset - first_offset:offset - first_offset + length])
+            for offset, length, _ in entries
+        ]
+
+    def _tail_start(self, conversation_id: str, total: int, last_n: int,
+                    max_tokens: Optional[int]) -> int:
+        start = max(0, total - last_n)
+        if max_tokens is None:
+            return start
+
+        # Walk back through the index until the token budget is spent
+        budget = max_tokens
+        position = total
+        while position > start:
+            block_start = max(start, position - _INDEX_BLOCK)
+            entries = self._read_index(conversation_id, block_start, position)
+            for i in range(len(entries) - 1, -1, -1):
+                budget -= entries[i][2]
+                if budget < 0:
+                    # The newest message is kept even when it alone is over budget
+                    return min(block_start + i + 1, total - 1)
+            position = block_start
+        return start
+
+    def _load_sync(self, conversation_id: str, last_n: int,
+                   max_tokens: Optional[int]) -> Optional[Conversation]:
+        header = self._read_header(conversation_id)
+        total = self.message_count(conversation_id)
+        if header is None and total == 0:
+            return None
+        header = header or {"id": conversation_id}
+
+        start = self._tail_start(conversation_id, total, last_n, max_tokens)
+        messages = self._read_records(conversation_id, self._read_index(conversation_id, start, total))
+
+        created_at = (
+            datetime.fromisoformat(header["created_at"]) if "created_at" in header
+            else (messages[0].created_at if messages else datetime.utcnow())
+        )
+        conversation = Conversation(
+            id=conversation_id,
+            user_id=header.get("user_id", ""),
+            messages=messages,
+            created_at=created_at,
+            updated_at=messages[-1].created_at if messages else created_at,
+            metadata=header.get("metadata") or {},
+            earlier_message_count=start,
+            summary=header.get("summary"),
+        )
+        if "title" in header:
+            conversation.title = header["title"]
+        return conversation
+
+    def _load_range_sync(self, conversation_id: str, start: int, stop: int) -> List[ChatMessage]:
+        stop = min(stop, self.message_count(conversation_id))
+        return self._read_records(conversation_id, self._read_index(conversation_id, max(0, start), stop))
+
+
+# ==================== Record encoding ====================
+
+def _encode(message: ChatMessage) -> bytes:
+    content = message.content.encode("utf-8")
+    metadata = json.dumps(message.metadata, separators=(",", ":")).encode("utf-8") if message.metadata else b""
+    try:
+        uuid = UUID(message.id)
+    except ValueError:
+        uuid = None
+    # Only canonical ids are stored as 16 bytes - UUID() also takes braces, urn: and upper case
+    if uuid is not None and str(uuid) == message.id:
+        message_id = uuid.bytes
+        flags = _FLAG_UUID_ID
+    else:
+        raw_id = message.id.encode("utf-8")
+        message_id = struct.pack("<H", len(raw_id)) + raw_id
+        flags = 0
+    created_at = message.created_at
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    header = _RECORD.pack(_ROLE_CODES[message.role], flags, created_at.timestamp(), len(content), len(metadata))
+    return b"".join((header, message_id, content, metadata))
+
+
+def _decode(view: memoryview) -> ChatMessage:
+    role, flags, timestamp, content_length, metadata_length = _RECORD.unpack_from(view)
+    position = _RECORD.size
+    if flags & _FLAG_UUID_ID:
+        message_id = str(UUID(bytes=bytes(view[position:position + 16])))
+        position += 16
+    else:
+        (id_length,) = struct.unpack_from("<H", view, position)
+        position += 2
+        message_id = bytes(view[position:position + id_length]).decode("utf-8")
+        position += id_length
+    content = bytes(view[position:position + content_length]).decode("utf-8")
+    position += content_length
+    metadata = json.loads(bytes(view[position:position + metadata_length])) if metadata_length else None
+    return ChatMessage(
+        role=_ROLES[role],
+        content=content,
+        id=message_id,
+        created_at=datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None),
+        metadata=metadata,
+    )
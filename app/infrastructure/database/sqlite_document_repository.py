@@ -0,0 +1,248 @@
+# app/infrastructure/database/sqlite_document_repository.py
+import base64
+import re
+import sqlite3
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from app.application.interfaces.document_repository import IDocumentRepositroy
+from app.domain.entities.document import Document
+from app.infrastructure.database.sqlite_executor import SQLiteExecutor, transaction
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    pk          INTEGER PRIMARY KEY,
+    id          TEXT NOT NULL UNIQUE,
+    user_id     TEXT NOT NULL,
+    filename    TEXT NOT NULL,
+    content     TEXT NOT NULL,
+    created_at  TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_documents_user_created
+    ON documents (user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_documents_user_filename
+    ON documents (user_id, filename);
+
+-- Full text index kept in sync by triggers (external content table)
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    filename, content, content='documents', content_rowid='pk'
+);
+
+-- O(1) count_by_user
+CREATE TABLE IF NOT EXISTS user_document_counts (
+    user_id  TEXT PRIMARY KEY,
+    count    INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS documents_after_insert AFTER INSERT ON documents BEGIN
+    INSERT INTO documents_fts (rowid, filename, content)
+        VALUES (new.pk, new.filename, new.content);
+    INSERT INTO user_document_counts (user_id, count) VALUES (new.user_id, 1)
+        ON CONFLICT (user_id) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS documents_after_delete AFTER DELETE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, filename, content)
+        VALUES ('delete', old.pk, old.filename, old.content);
+    UPDATE user_document_counts SET count = count - 1 WHERE user_id = old.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS documents_after_update AFTER UPDATE ON documents BEGIN
+    INSERT INTO documents_fts (documents_fts, rowid, filename, content)
+        VALUES ('delete', old.pk, old.filename, old.content);
+    INSERT INTO documents_fts (rowid, filename, content)
+        VALUES (new.pk, new.filename, new.content);
+    UPDATE user_document_counts SET count = count - 1
+        WHERE user_id = old.user_id AND old.user_id != new.user_id;
+    INSERT INTO user_document_counts (user_id, count)
+        SELECT new.user_id, 1 WHERE old.user_id != new.user_id
+        ON CONFLICT (user_id) DO UPDATE SET count = count + 1;
+END;
+"""
+
+_COLUMNS = "id, user_id, filename, content, created_at"
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class SQLiteDocumentRepository(IDocumentRepositroy):
+    """
+    Embedded SQLite document repository for single-node deployments
+    - WAL mode, all queries on one dedicated thread
+    - (user_id, created_at, id) index with keyset pagination
+    - FTS5 backed search_by_user
+    - count_by_user read from a trigger-maintained counter table
+    """
+
+    def __init__(self, path: str = "./data/rag.db"):
+        self.db = SQLiteExecutor(path, name="document-repo")
+        self.db.run_sync(lambda conn: conn.executescript(_SCHEMA))
+
+    def close(self) -> None:
+        self.db.close()
+
+    async def save(self, document: Document) -> Document:
+        """Insert or update a document"""
+        await self.db.run(_save, document)
+        return document
+
+    async def get_by_id(self, document_id: str) -> Optional[Document]:
+        row = await self.db.run(
+            _fetch_one, f"SELECT {_COLUMNS} FROM documents WHERE id = ?", (document_id,)
+        )
+        return _to_document(row) if row else None
+
+    async def get_by_filename(self, filename: str, user_id: str) -> Optional[Document]:
+        row = await self.db.run(
+            _fetch_one,
+            f"SELECT {_COLUMNS} FROM documents WHERE user_id = ? AND filename = ? "
+            "ORDER BY created_at DESC LIMIT 1",
+            (user_id, filename),
+        )
+        return _to_document(row) if row else None
+
+    async def list_by_user(self, user_id: str, limit: int = 50, offset: int = 0) -> List[Document]:
+        """Offset pagination - kept for compatibility, prefer list_by_user_after"""
+        rows = await self.db.run(
+            _fetch_all,
+            f"SELECT {_COLUMNS} FROM documents WHERE user_id = ? "
+            "ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+            (user_id, limit, offset),
+        )
+        return [_to_document(row) for row in rows]
+
+    async def list_by_user_after(self, user_id: str, cursor: Optional[str] = None,
+                                 limit: int = 50) -> Tuple[List[Document], Optional[str]]:
+        """Keyset pagination - every page is an index range scan, however deep"""
+        if cursor:
+            created_at, document_id = _decode_cursor(cursor)
+            rows = await self.db.run(
+                _fetch_all,
+                f"SELECT {_COLUMNS} FROM documents WHERE user_id = ? "
+                "AND (created_at, id) < (?, ?) "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (user_id, created_at, document_id, limit + 1),
+            )
+        else:
+            rows = await self.db.run(
+                _fetch_all,
+                f"SELECT {_COLUMNS} FROM documents WHERE user_id = ? "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (user_id, limit + 1),
+            )
+
+        # One extra row tells us whether a next page exists
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        return [_to_document(row) for row in rows], next_cursor
+
+    async def list_all_after(self, cursor: Optional[str] = None,
+                             limit: int = 100) -> Tuple[List[Document], Optional[str]]:
+        """Rowid order - updates keep their row, new documents land after the cursor"""
+        rows = await self.db.run(
+            _fetch_all,
+            f"SELECT pk, {_COLUMNS} FROM documents WHERE pk > ? ORDER BY pk LIMIT ?",
+            (int(cursor) if cursor else 0, limit + 1),
+        )
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = str(rows[-1]["pk"])
+        return [_to_document(row) for row in rows], next_cursor
+
+    async def count_all(self) -> int:
+        row = await self.db.run(_fetch_one, "SELECT COALESCE(SUM(count), 0) AS n FROM user_document_counts", ())
+        return row["n"]
+
+    async def delete(self, document_id) -> None:
+        await self.db.run(_execute, "DELETE FROM documents WHERE id = ?", (document_id,))
+
+    async def exists(self, document_id: str) -> bool:
+        row = await self.db.run(_fetch_one, "SELECT 1 FROM documents WHERE id = ?", (document_id,))
+        return row is not None
+
+    async def count_by_user(self, user_id: str) -> int:
+        row = await self.db.run(
+            _fetch_one, "SELECT count FROM user_document_counts WHERE user_id = ?", (user_id,)
+        )
+        return row["count"] if row else 0
+
+    async def search_by_user(self, user_id: str, query: str, limit: int = 10) -> List[Document]:
+        """Full text search over filename and content, best matches first"""
+        match = _to_match_expression(query)
+        if not match:
+            return []
+        rows = await self.db.run(
+            _fetch_all,
+            "SELECT d.id, d.user_id, d.filename, d.content, d.created_at "
+            "FROM documents_fts JOIN documents d ON d.pk = documents_fts.rowid "
+            "WHERE documents_fts MATCH ? AND d.user_id = ? "
+            "ORDER BY bm25(documents_fts) LIMIT ?",
+            (match, user_id, limit),
+        )
+        return [_to_document(row) for row in rows]
+
+
+# ==================== Database thread functions ====================
+
+@transaction
+def _save(conn: sqlite3.Connection, document: Document) -> None:
+    conn.execute(
+        f"INSERT INTO documents ({_COLUMNS}) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (id) DO UPDATE SET user_id = excluded.user_id, "
+        "filename = excluded.filename, content = excluded.content, "
+        "created_at = excluded.created_at",
+        (document.id, document.user_id, document.filename, document.content,
+         _format_datetime(document.created_at)),
+    )
+
+
+def _execute(conn: sqlite3.Connection, sql: str, params: tuple) -> None:
+    conn.execute(sql, params)
+
+
+def _fetch_one(conn: sqlite3.Connection, sql: str, params: tuple) -> Optional[sqlite3.Row]:
+    return conn.execute(sql, params).fetchone()
+
+
+def _fetch_all(conn: sqlite3.Connection, sql: str, params: tuple) -> List[sqlite3.Row]:
+    return conn.execute(sql, params).fetchall()
+
+
+# ==================== Helpers ====================
+
+def _format_datetime(value: datetime) -> str:
+    """Fixed-width UTC text so lexical order == time order"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(timespec="microseconds")
+
+
+def _to_document(row: sqlite3.Row) -> Document:
+    return Document(
+        id=row["id"],
+        filename=row["filename"],
+        content=row["content"],
+        created_at=datetime.fromisoformat(row["created_at"]),
+        user_id=row["user_id"],
+    )
+
+
+def _encode_cursor(created_at: str, document_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{document_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, document_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except ValueError:
+        raise ValueError("Invalid pagination cursor") from None
+    return created_at, document_id
+
+
+def _to_match_expression(query: str) -> str:
+    """Quote every word so user input can't inject FTS5 syntax - words are ANDed"""
+    return " ".join(f'"{token}"' for token in _TOKEN_RE.findall(query))
@@ -0,0 +1,62 @@
+# app/infrastructure/database/sqlite_executor.py
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class SQLiteExecutor:
+    """
+    Runs all work for one SQLite database on a single dedicated thread
+    The connection never leaves that thread, and the event loop is never
+    blocked by a query - callers just await `run`.
+    """
+
+    def __init__(self, path: str, name: str = "sqlite"):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._conn: sqlite3.Connection = self._executor.submit(self._connect).result()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: durable on checkpoint, no fsync per commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run fn(connection, *args) on the database thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, self._conn, *args)
+
+    def run_sync(self, fn: Callable[..., T], *args: Any) -> T:
+        """Blocking variant for start-up code (schema creation etc.)"""
+        return self._executor.submit(fn, self._conn, *args).result()
+
+    def close(self) -> None:
+        self._executor.submit(self._conn.close).result()
+        self._executor.shutdown(wait=True)
+
+
+def transaction(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap a database-thread function in BEGIN IMMEDIATE / COMMIT"""
+    def wrapper(conn: sqlite3.Connection, *args: Any) -> T:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, *args)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+    wrapper.__name__ = fn.__name__
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
@@ -0,0 +1,326 @@
+# app/infrastructure/dedup/minhash_deduplicator.py
+"""
+MinHash + LSH near-duplicate detection for chunks
+
+Each chunk is reduced to a MinHash signature over its word shingles; the
+fraction of equal signature slots estimates the Jaccard similarity of two
+chunks. Signatures are split into bands and each band hashed into a
+bucket, so candidates are found with a few indexed lookups instead of
+comparing against every stored chunk. Candidates are then verified
+against the threshold with the full signature.
+"""
+import asyncio
+import hashlib
+import re
+import sqlite3
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.application.interfaces.chunk_deduplicator import DuplicateChunk, IChunkDeduplicator
+from app.core.metrics import PipelineMetrics, get_metrics
+from app.domain.entities.embedding import Embedding
+from app.infrastructure.database.sqlite_executor import SQLiteExecutor, transaction
+
+
+# Largest prime below 2**32 - (a * x + b) stays below 2**64 for 32-bit x
+_PRIME = np.uint64(4294967291)
+_TOKEN_RE = re.compile(r"\w+")
+# Cap per bucket so very common boilerplate can't make a lookup scan thousands of rows
+_MAX_CANDIDATES_PER_BUCKET = 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunk_signatures (
+    user_id    TEXT NOT NULL,
+    vector_id  TEXT NOT NULL,
+    signature  BLOB NOT NULL,
+    model      TEXT,
+    embedding  BLOB,
+    PRIMARY KEY (user_id, vector_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS chunk_bands (
+    user_id    TEXT NOT NULL,
+    band       INTEGER NOT NULL,
+    bucket     INTEGER NOT NULL,
+    vector_id  TEXT NOT NULL,
+    PRIMARY KEY (user_id, band, bucket, vector_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS chunk_refs (
+    user_id       TEXT NOT NULL,
+    vector_id     TEXT NOT NULL,
+    canonical_id  TEXT NOT NULL,
+    document_id   TEXT NOT NULL,
+    chars         INTEGER NOT NULL,
+    PRIMARY KEY (user_id, vector_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS chunk_refs_document ON chunk_refs (user_id, document_id);
+"""
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    conn.executescript(_SCHEMA)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(chunk_signatures)")}
+    # Indexes created before embeddings were kept alongside the signatures
+    for column in ("model TEXT", "embedding BLOB"):
+        if column.split()[0] not in columns:
+            conn.execute(f"ALTER TABLE chunk_signatures ADD COLUMN {column}")
+
+
+def choose_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    (bands, rows) for LSH banding
+    Two chunks become candidates at about (1/bands) ** (1/rows) similarity;
+    aim a bit below the threshold since candidates are verified anyway.
+    """
+    target = max(0.05, threshold - 0.1)
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - target))
+
+
+class MinHasher:
+    """MinHash signatures over word shingles"""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        tokens = _TOKEN_RE.findall(text.lower())
+        if not tokens:
+            return np.empty(0, dtype=np.uint64)
+        size = min(self.shingle_size, len(tokens))
+        grams = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+        return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        shingles = self.shingles(text)
+        if shingles.size == 0:
+            return None
+        hashed = (shingles[:, None] * self._a + self._b) % _PRIME
+        return hashed.min(axis=0).astype(np.uint32)
+
+    @staticmethod
+    def similarity(left: np.ndarray, right: np.ndarray) -> float:
+        return float(np.mean(left == right))
+
+
+class MinHashDeduplicator(IChunkDeduplicator):
+    """
+    Per-tenant MinHash LSH index, stored in SQLite
+
+    Only canonical (embedded) chunks go into the index, together with
+    their embedding; a near-duplicate reuses that embedding for its own
+    vector and is recorded in chunk_refs as pointing at the canonical one.
+    Lookups are read only - a batch is registered once its vectors are
+    stored. A chunk matching its own earlier entry (a re-run of the same
+    batch) counts as new again.
+    """
+
+    def __init__(self, path: str = "./data/chunk_dedup.db", threshold: float = 0.8,
+                 num_perm: int = 128, shingle_size: int = 3,
+                 metrics: Optional[PipelineMetrics] = None):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+        self.bands, self.rows = choose_bands(threshold, num_perm)
+        self.db = SQLiteExecutor(path, name="chunk-dedup")
+        self.db.run_sync(_migrate)
+
+        registry = (metrics or get_metrics()).registry
+        self._chunks = registry.counter(
+            "rag_dedup_chunks_total", "Chunks checked for near-duplicates", ("result",))
+        self._saved_chars = registry.counter(
+            "rag_dedup_saved_chars_total", "Characters of near-duplicate chunks not re-embedded")
+
+    async def resolve_duplicates(self, user_id: str, document_id: str,
+                                 chunks: List[Tuple[str, str]]) -> Dict[str, DuplicateChunk]:
+        # Hashing is CPU work - do it off the event loop, next to the database thread
+        prepared = await asyncio.to_thread(self._prepare, chunks)
+        texts = dict(chunks)
+        return await self.db.run(self._lookup, user_id, prepared, texts)
+
+    async def register_chunks(self, user_id: str, document_id: str, chunks: List[Tuple[str, str]],
+                              duplicates: Dict[str, str], embeddings: Dict[str, Embedding]) -> None:
+        # Only the embedded chunks become canonical - they are hashed (again) for the index
+        prepared = await asyncio.to_thread(
+            self._prepare, [(vector_id, text) for vector_id, text in chunks if vector_id in embeddings]
+        )
+        canonical = [
+            (vector_id, signature, buckets, embeddings[vector_id])
+            for vector_id, _, signature, buckets in prepared
+        ]
+        refs = [
+            (user_id, vector_id, duplicates.get(vector_id, vector_id), document_id, len(text))
+            for vector_id, text in chunks
+        ]
+        await self.db.run(transaction(self._register), user_id, canonical, refs)
+
+        saved = sum(len(text) for vector_id, text in chunks if vector_id in duplicates)
+        self._chunks.labels("duplicate").inc(len(duplicates))
+        self._chunks.labels("unique").inc(len(chunks) - len(duplicates))
+        if saved:
+            self._saved_chars.inc(saved)
+
+    async def forget_document(self, user_id: str, document_id: str) -> None:
+        await self.db.run(transaction(self._forget), user_id, document_id)
+
+    async def stats(self, user_id: str) -> Dict:
+        row = await self.db.run(
+            lambda conn: conn.execute(
+                "SELECT COUNT(*) AS chunks, "
+                "COALESCE(SUM(vector_id != canonical_id), 0) AS duplicates, "
+                "COALESCE(SUM(CASE WHEN vector_id != canonical_id THEN chars END), 0) AS saved_chars "
+                "FROM chunk_refs WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        )
+        chunks, duplicates = row["chunks"], row["duplicates"]
+        return {
+            "chunks": chunks,
+            "unique": chunks - duplicates,
+            "duplicates": duplicates,
+            "saved_chars": row["saved_chars"],
+            "dedup_ratio": duplicates / chunks if chunks else 0.0,
+        }
+
+    def close(self) -> None:
+        self.db.close()
+
+    # ==================== Internals ====================
+
+    def _prepare(self, chunks: List[Tuple[str, str]]) -> List[Tuple[str, int, Optional[np.ndarray], List[int]]]:
+        prepared = []
+        for vector_id, text in chunks:
+            signature = self.hasher.signature(text)
+            buckets = self._buckets(signature) if signature is not None else []
+            prepared.append((vector_id, len(text), signature, buckets))
+        return prepared
+
+    def _buckets(self, signature: np.ndarray) -> List[int]:
+        buckets = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8)
+            buckets.append(int.from_bytes(digest.digest(), "little", signed=True))
+        return buckets
+
+    def _lookup(self, conn: sqlite3.Connection, user_id: str,
+                prepared: List[Tuple[str, int, Optional[np.ndarray], List[int]]],
+                texts: Dict[str, str]) -> Dict[str, DuplicateChunk]:
+        # New chunks earlier in the batch are candidates for later ones - they are embedded together
+        duplicates: Dict[str, DuplicateChunk] = {}
+        batch_signatures: Dict[str, np.ndarray] = {}
+        batch_buckets: Dict[Tuple[int, int], List[str]] = {}
+        for vector_id, _, signature, buckets in prepared:
+            if signature is None:
+                continue
+            match = self._best_match(conn, user_id, signature, buckets, batch_signatures, batch_buckets)
+            if match is not None and match != vector_id:
+                if match in batch_signatures:
+                    duplicates[vector_id] = DuplicateChunk(match, None)
+                    continue
+                embedding = self._embedding(conn, user_id, match, texts[vector_id])
+                if embedding is not None:
+                    duplicates[vector_id] = DuplicateChunk(match, embedding)
+                    continue
+            batch_signatures[vector_id] = signature
+            for band, bucket in enumerate(buckets):
+                batch_buckets.setdefault((band, bucket), []).append(vector_id)
+        return duplicates
+
+    def _embedding(self, conn: sqlite3.Connection, user_id: str, vector_id: str,
+                   text: str) -> Optional[Embedding]:
+        row = conn.execute(
+            "SELECT model, embedding FROM chunk_signatures WHERE user_id = ? AND vector_id = ?",
+            (user_id, vector_id),
+        ).fetchone()
+        if row is None or row["embedding"] is None:
+            # Indexed before embeddings were kept - can't be reused
+            return None
+        vector = np.frombuffer(row["embedding"], dtype=np.float32).tolist()
+        return Embedding(vector=vector, model=row["model"], text=text)
+
+    def _register(self, conn: sqlite3.Connection, user_id: str,
+                  canonical: List[Tuple[str, Optional[np.ndarray], List[int], Embedding]],
+                  refs: List[Tuple[str, str, str, str, int]]) -> None:
+        for vector_id, signature, buckets, embedding in canonical:
+            # A re-run may have changed the text - drop the old bands first
+            self._unindex(conn, user_id, vector_id)
+            if signature is not None:
+                self._index(conn, user_id, vector_id, signature, buckets, embedding)
+        conn.executemany(
+            "INSERT OR REPLACE INTO chunk_refs (user_id, vector_id, canonical_id, document_id, chars) "
+            "VALUES (?, ?, ?, ?, ?)",
+            refs,
+        )
+
+    def _forget(self, conn: sqlite3.Connection, user_id: str, document_id: str) -> None:
+        # Every document has its own vectors - other documents' refs only record a reused embedding
+        rows = conn.execute(
+            "SELECT vector_id FROM chunk_refs WHERE user_id = ? AND document_id = ? AND vector_id = canonical_id",
+            (user_id, document_id),
+        ).fetchall()
+        for row in rows:
+            self._unindex(conn, user_id, row["vector_id"])
+        conn.execute("DELETE FROM chunk_refs WHERE user_id = ? AND document_id = ?", (user_id, document_id))
+
+    def _best_match(self, conn: sqlite3.Connection, user_id: str, signature: np.ndarray,
+                    buckets: List[int], batch_signatures: Dict[str, np.ndarray],
+                    batch_buckets: Dict[Tuple[int, int], List[str]]) -> Optional[str]:
+        candidates = set()
+        for band, bucket in enumerate(buckets):
+            rows = conn.execute(
+                "SELECT vector_id FROM chunk_bands WHERE user_id = ? AND band = ? AND bucket = ? LIMIT ?",
+                (user_id, band, bucket, _MAX_CANDIDATES_PER_BUCKET),
+            ).fetchall()
+            candidates.update(row["vector_id"] for row in rows)
+            candidates.update(batch_buckets.get((band, bucket), ())[:_MAX_CANDIDATES_PER_BUCKET])
+        if not candidates:
+            return None
+
+        best_id, best_score = None, self.threshold
+        for candidate in candidates:
+            candidate_signature = batch_signatures.get(candidate)
+            if candidate_signature is None:
+                row = conn.execute(
+                    "SELECT signature FROM chunk_signatures WHERE user_id = ? AND vector_id = ?",
+                    (user_id, candidate),
+                ).fetchone()
+                if row is None:
+                    continue
+                candidate_signature = np.frombuffer(row["signature"], dtype=np.uint32)
+            score = MinHasher.similarity(signature, candidate_signature)
+            if score >= best_score:
+                best_id, best_score = candidate, score
+        return best_id
+
+    def _index(self, conn: sqlite3.Connection, user_id: str, vector_id: str,
+               signature: np.ndarray, buckets: List[int], embedding: Embedding) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO chunk_signatures (user_id, vector_id, signature, model, embedding) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (user_id, vector_id, signature.tobytes(), embedding.model,
+             np.asarray(embedding.vector, dtype=np.float32).tobytes()),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO chunk_bands (user_id, band, bucket, vector_id) VALUES (?, ?, ?, ?)",
+            [(user_id, band, bucket, vector_id) for band, bucket in enumerate(buckets)],
+        )
+
+    def _unindex(self, conn: sqlite3.Connection, user_id: str, vector_id: str) -> None:
+        row = conn.execute(
+            "SELECT signature FROM chunk_signatures WHERE user_id = ? AND vector_id = ?", (user_id, vector_id)
+        ).fetchone()
+        if row is None:
+            return
+        # Band rows are keyed by bucket - recompute the buckets from the stored signature
+        buckets = self._buckets(np.frombuffer(row["signature"], dtype=np.uint32))
+        conn.executemany(
+            "DELETE FROM chunk_bands WHERE user_id = ? AND band = ? AND bucket = ? AND vector_id = ?",
+            [(user_id, band, bucket, vector_id) for band, bucket in enumerate(buckets)],
+        )
+        conn.execute("DELETE FROM chunk_signatures WHERE user_id = ? AND vector_id = ?", (user_id, vector_id))
@@ -1,15 +1,33 @@
 # app/infrastructure/dependencies.py
+from concurrent.futures import Executor, ProcessPoolExecutor
 from functools import lru_cache
+from typing import Optional
 from fastapi import Depends
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import Settings
-from app.infrastructure.database.session import get_db_session
+from app.core.admission import AdaptiveConcurrencyLimit, AdmissionController, TokenBucket
+from app.core.resilience import CircuitBreaker, ResilientCaller, RetryPolicy
+from app.core.metrics import get_metrics_server
+from app.infrastructure.database.sqlite_document_repository import SQLiteDocumentRepository
 
 # Adapters
 from app.infrastructure.llm.openai_adapter import OpenAIAdapter
+from app.infrastructure.llm.openai_embedding import OpenAIEmbeddingService
 from app.infrastructure.llm.embedding_sentence_transformers import SentenceTransformerEmbeddingService
+from app.infrastructure.llm.embedding_projection import PCAProjection, ReducedEmbeddingService
+from app.infrastructure.llm.admission_adapters import (
+    AdmissionControlledEmbeddingService,
+    AdmissionControlledLLMService,
+)
+from app.infrastructure.llm.resilient_adapters import ResilientEmbeddingService, ResilientLLMService
 from app.infrastructure.vector_stores.pinecone_adapter import PineconeAdapter
+from app.infrastructure.vector_stores.local_adapter import LocalVectorStore
+from app.infrastructure.vector_stores.generational_store import Generation, GenerationalVectorStore
+from app.infrastructure.storage.local_storage import LocalStorageService
+from app.infrastructure.conversations.log_conversation_store import AppendOnlyConversationStore
+from app.infrastructure.jobs.ingestion_queue import IngestionJobQueue
+from app.infrastructure.jobs.reindex_job import ReindexJob
+from app.infrastructure.dedup.minhash_deduplicator import MinHashDeduplicator
 
 # Services
 from app.application.services.document_service import DocumentService
@@ -21,6 +39,8 @@ from app.application.interfaces.embedding_service import IEmbeddingService
 from app.application.interfaces.vector_store import IvectorStore
 from app.application.interfaces.storage_service import IStorageService
 from app.application.interfaces.document_repository import IDocumentRepositroy
+from app.application.interfaces.conversation_store import IConversationStore
+from app.application.interfaces.chunk_deduplicator import IChunkDeduplicator
 
 
 @lru_cache()
@@ -28,6 +48,54 @@ def get_settings() -> Settings:
     return Settings()
 
 
+@lru_cache()
+def get_admission_controller(upstream: str) -> AdmissionController:
+    """
+    One controller per upstream for the whole process
+    Chat and ingestion share it, so they share (and compete fairly for) the quota
+    """
+    settings = get_settings()
+    upstream_requests = {
+        "llm": settings.UPSTREAM_LLM_RATE_LIMIT,
+        "embedding": settings.UPSTREAM_EMBEDDING_RATE_LIMIT,
+    }[upstream]
+    return AdmissionController(
+        name=upstream,
+        limit=AdaptiveConcurrencyLimit(
+            initial=settings.ADMISSION_INITIAL_CONCURRENCY,
+            maximum=settings.ADMISSION_MAX_CONCURRENCY,
+            # Generation time depends on answer length, so be lenient on latency
+            latency_tolerance=3.0 if upstream == "llm" else 2.0,
+        ),
+        upstream_bucket=TokenBucket(
+            rate=upstream_requests / settings.RATE_LIMIT_PERIOD,
+            capacity=upstream_requests,
+        ),
+        user_rate=(settings.RATE_LIMIT_REQUESTS, settings.RATE_LIMIT_PERIOD),
+        bulk_share=settings.ADMISSION_BULK_SHARE,
+        max_queue_wait=settings.ADMISSION_MAX_QUEUE_WAIT,
+    )
+
+
+@lru_cache()
+def get_resilient_caller(upstream: str) -> ResilientCaller:
+    """One per upstream - the circuit breaker and latency history are process-wide"""
+    settings = get_settings()
+    return ResilientCaller(
+        name=upstream,
+        retry=RetryPolicy(
+            max_attempts=settings.UPSTREAM_MAX_ATTEMPTS,
+            base_delay=settings.UPSTREAM_RETRY_BASE_DELAY,
+            max_delay=settings.UPSTREAM_RETRY_MAX_DELAY,
+        ),
+        breaker=CircuitBreaker(
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT,
+        ),
+        hedge_percentile=settings.EMBEDDING_HEDGE_PERCENTILE if upstream == "embedding" else None,
+    )
+
+
 # --- Infrastructure Providers ---
 
 def get_llm_service(settings:Settings = Depends(get_settings)) -> ILLMService:
@@ -36,46 +104,176 @@ def get_llm_service(settings:Settings = Depends(get_settings)) -> ILLMService:
     Easy to switch between providers based on config
     """
     if settings.LLM_PROVIDER == "openai":
-        return OpenAIAdapter(
+        llm_service = OpenAIAdapter(
             api_key=settings.OPENAI_API_KEY,
-            model=settings.OPENAI_MODEL)
+            model=settings.OPENAI_MODEL,
+            # Retries are handled (within the deadline) by ResilientLLMService
+            max_retries=0 if settings.RESILIENCE_ENABLED else 2)
         
     else:
         raise ValueError(f"Unknown LLM provider: {settings.LLM_PROVIDER}")
 
+    if settings.RATE_LIMIT_ENABLED:
+        llm_service = AdmissionControlledLLMService(llm_service, get_admission_controller("llm"))
+    if settings.RESILIENCE_ENABLED:
+        # Outermost, so every retry goes back through admission control
+        llm_service = ResilientLLMService(llm_service, get_resilient_caller("llm"))
+    return llm_service
+
+
+@lru_cache()
+def _local_embedding_service(model_name: str, dimensions: Optional[int], reduction: str,
+                             projection_path: str) -> IEmbeddingService:
+    # Loading the model (and projection) is expensive - once per process
+    embedding_service = SentenceTransformerEmbeddingService(model_name=model_name)
+    if not dimensions:
+        return embedding_service
+    projection = PCAProjection.load(projection_path) if reduction == "pca" else None
+    return ReducedEmbeddingService(embedding_service, dimensions, method=reduction, projection=projection)
+
 
 def get_embedding_service(
     settings: Settings = Depends(get_settings)
 ) -> IEmbeddingService:
-    return OpenAIEmbeddingService(
-        api_key=settings.OPENAI_API_KEY,
-        model="text-embedding-3-small"
+    if settings.EMBEDDING_PROVIDER == "openai":
+        embedding_service = OpenAIEmbeddingService(
+            model_name=settings.OPENAI_EMBEDDING_MODEL,
+            dimensions=settings.EMBEDDING_DIMENSIONS,
+            max_retries=0 if settings.RESILIENCE_ENABLED else 2
+        )
+    elif settings.EMBEDDING_PROVIDER == "local":
+        embedding_service = _local_embedding_service(
+            settings.LOCAL_EMBEDDING_MODEL,
+            settings.EMBEDDING_DIMENSIONS,
+            settings.EMBEDDING_REDUCTION,
+            settings.EMBEDDING_PROJECTION_PATH,
+        )
+    else:
+        raise ValueError(f"Unknown embedding provider: {settings.EMBEDDING_PROVIDER}")
+    if settings.RATE_LIMIT_ENABLED:
+        embedding_service = AdmissionControlledEmbeddingService(embedding_service, get_admission_controller("embedding"))
+    if settings.RESILIENCE_ENABLED and settings.EMBEDDING_PROVIDER == "openai":
+        embedding_service = ResilientEmbeddingService(
+            embedding_service,
+            get_resilient_caller("embedding"),
+            hedge=settings.EMBEDDING_HEDGING_ENABLED
+        )
+    return embedding_service
+
+
+@lru_cache()
+def _local_vector_store(path: str, memory_budget_mb: int, search_processes: int,
+                        shard_min_rows: int, indexed_fields: tuple) -> LocalVectorStore:
+    # Partitions are cached in memory (and own the search pool), so keep one instance per path
+    return LocalVectorStore(
+        root=path,
+        memory_budget_bytes=memory_budget_mb * 1024 * 1024,
+        search_processes=search_processes,
+        shard_min_rows=shard_min_rows,
+        indexed_fields=indexed_fields
     )
 
 
-def get_vector_store(
-    settings: Settings = Depends(get_settings)
-) -> IvectorStore:
+def _provider_vector_store(provider: str, suffix: str, settings: Settings) -> IvectorStore:
+    if provider == "local":
+        return _local_vector_store(
+            settings.LOCAL_VECTOR_STORE_PATH + suffix,
+            settings.LOCAL_VECTOR_MEMORY_BUDGET_MB,
+            settings.LOCAL_VECTOR_SEARCH_PROCESSES,
+            settings.LOCAL_VECTOR_SHARD_MIN_ROWS,
+            tuple(settings.LOCAL_VECTOR_INDEXED_FIELDS)
+        )
     return PineconeAdapter(
         api_key=settings.PINECONE_API_KEY,
-        index_name=settings.PINECONE_INDEX_NAME
+        index_name=settings.PINECONE_INDEX_NAME + suffix
     )
 
 
+def _open_vector_generation(generation: Generation) -> IvectorStore:
+    """g0 is the pre-existing index; later generations get their own path / Pinecone index (created beforehand)"""
+    settings = get_settings()
+    suffix = "" if generation.name == "g0" else f"-{generation.name}"
+    return _provider_vector_store(generation.provider or settings.VECTOR_STORE_PROVIDER, suffix, settings)
+
+
+@lru_cache()
+def _generational_vector_store(pointer_path: str) -> GenerationalVectorStore:
+    return GenerationalVectorStore(pointer_path=pointer_path, open_generation=_open_vector_generation)
+
+
+def get_vector_store(
+    settings: Settings = Depends(get_settings)
+) -> IvectorStore:
+    if settings.VECTOR_GENERATIONS_ENABLED:
+        return _generational_vector_store(settings.VECTOR_GENERATION_POINTER_PATH)
+    return _provider_vector_store(settings.VECTOR_STORE_PROVIDER, "", settings)
+
+
+@lru_cache()
+def _local_storage(path: str) -> LocalStorageService:
+    # One instance per path - it owns the reference-count lock
+    return LocalStorageService(root=path)
+
+
+def get_storage_service(
+    settings: Settings = Depends(get_settings)
+) -> IStorageService:
+    if settings.STORAGE_PROVIDER == "local":
+        return _local_storage(settings.LOCAL_STORAGE_PATH)
+    else:
+        raise ValueError(f"Unknown storage provider: {settings.STORAGE_PROVIDER}")
+
+
+@lru_cache()
+def _sqlite_repository(path: str) -> SQLiteDocumentRepository:
+    # One connection thread per database file for the whole process
+    return SQLiteDocumentRepository(path=path)
+
 
 def get_document_repository(
-    session: AsyncSession = Depends(get_db_session)
+    settings: Settings = Depends(get_settings)
 ) -> IDocumentRepositroy:
-    return DocumentRepository(session)
+    return _sqlite_repository(settings.SQLITE_DATABASE_PATH)
+
+
+@lru_cache()
+def _conversation_store(path: str) -> AppendOnlyConversationStore:
+    return AppendOnlyConversationStore(root=path)
+
+
+def get_conversation_store(
+    settings: Settings = Depends(get_settings)
+) -> IConversationStore:
+    return _conversation_store(settings.CONVERSATION_STORE_PATH)
+
+
+@lru_cache()
+def _parser_executor(processes: int) -> Optional[Executor]:
+    # 0 keeps parsing on the default thread pool
+    return ProcessPoolExecutor(max_workers=processes) if processes > 0 else None
+
+
+@lru_cache()
+def _chunk_deduplicator(path: str, threshold: float) -> MinHashDeduplicator:
+    return MinHashDeduplicator(path=path, threshold=threshold)
+
+
+def get_chunk_deduplicator(
+    settings: Settings = Depends(get_settings)
+) -> Optional[IChunkDeduplicator]:
+    if not settings.CHUNK_DEDUP_ENABLED:
+        return None
+    return _chunk_deduplicator(settings.CHUNK_DEDUP_PATH, settings.CHUNK_DEDUP_THRESHOLD)
 
 
 # --- Application Service Providers ---
 
 def get_document_service(
-    document_repo: IDocumentRepository = Depends(get_document_repository),
+    document_repo: IDocumentRepositroy = Depends(get_document_repository),
     embedding_service: IEmbeddingService = Depends(get_embedding_service),
-    vector_store: IVectorStore = Depends(get_vector_store),
-    storage_service: IStorageService = Depends(get_storage_service)
+    vector_store: IvectorStore = Depends(get_vector_store),
+    storage_service: IStorageService = Depends(get_storage_service),
+    settings: Settings = Depends(get_settings)
 ) -> DocumentService:
     """
     All dependencies injected automatically!
@@ -85,17 +283,94 @@ def get_document_service(
         document_repo=document_repo,
         embedding_service=embedding_service,
         vector_store=vector_store,
-        storage_service=storage_service
+        storage_service=storage_service,
+        embedding_batch_size=settings.EMBEDDING_BATCH_SIZE,
+        parser_executor=_parser_executor(settings.INGESTION_PARSER_PROCESSES),
+        deduplicator=get_chunk_deduplicator(settings),
+        max_file_size=settings.MAX_FILE_SIZE,
+        spool_threshold=settings.UPLOAD_SPOOL_THRESHOLD,
+        spool_dir=settings.UPLOAD_SPOOL_DIR
+    )
+
+
+@lru_cache()
+def get_ingestion_queue() -> IngestionJobQueue:
+    """
+    Process-wide ingestion queue
+    Built outside request scope - started by `start_background_services()` on startup
+    """
+    settings = get_settings()
+    storage_service = get_storage_service(settings)
+    document_service = get_document_service(
+        document_repo=get_document_repository(settings),
+        embedding_service=get_embedding_service(settings),
+        vector_store=get_vector_store(settings),
+        storage_service=storage_service,
+        settings=settings
+    )
+    return IngestionJobQueue(
+        document_service=document_service,
+        storage_service=storage_service,
+        path=settings.INGESTION_QUEUE_PATH,
+        workers=settings.INGESTION_WORKERS,
+        max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+        lease_seconds=settings.INGESTION_LEASE_SECONDS
+    )
+
+
+async def start_background_services() -> None:
+    """
+    Call once from the app's startup hook:
+    the /metrics (and /profiling) server when ENABLE_METRICS, and the ingestion workers
+    """
+    get_metrics_server()
+    await get_ingestion_queue().start()
+
+
+def get_reindex_job(generation: str, source_model: Optional[str] = None,
+                    concurrency: Optional[int] = None) -> ReindexJob:
+    """
+    Re-embedding job for a new index generation, built from the current settings
+    The configured embedding model and vector store provider are the targets.
+    Every chunk is re-embedded: the dedup index holds embeddings from the
+    serving generation, so the reindex service runs without a deduplicator.
+    """
+    settings = get_settings()
+    if not settings.VECTOR_GENERATIONS_ENABLED:
+        raise ValueError("Re-embedding needs VECTOR_GENERATIONS_ENABLED=true")
+    generations = _generational_vector_store(settings.VECTOR_GENERATION_POINTER_PATH)
+    document_repo = get_document_repository(settings)
+    document_service = DocumentService(
+        document_repo=document_repo,
+        embedding_service=get_embedding_service(settings),
+        vector_store=generations,
+        storage_service=get_storage_service(settings),
+        embedding_batch_size=settings.REINDEX_BATCH_SIZE,
+        parser_executor=_parser_executor(settings.INGESTION_PARSER_PROCESSES),
+        spool_threshold=settings.UPLOAD_SPOOL_THRESHOLD,
+        spool_dir=settings.UPLOAD_SPOOL_DIR
+    )
+    return ReindexJob(
+        document_service=document_service,
+        generations=generations,
+        document_repo=document_repo,
+        generation=generation,
+        path=settings.REINDEX_CHECKPOINT_PATH,
+        concurrency=concurrency or settings.REINDEX_CONCURRENCY,
+        provider=settings.VECTOR_STORE_PROVIDER,
+        source_model=source_model
     )
 
 
 def get_chat_service(
     llm_service: ILLMService = Depends(get_llm_service),
     embedding_service: IEmbeddingService = Depends(get_embedding_service),
-    vector_store: IVectorStore = Depends(get_vector_store)
+    vector_store: IvectorStore = Depends(get_vector_store),
+    settings: Settings = Depends(get_settings)
 ) -> ChatService:
     return ChatService(
         llm_service=llm_service,
         embedding_service=embedding_service,
-        vector_store=vector_store
+        vector_store=vector_store,
+        request_timeout=settings.CHAT_REQUEST_TIMEOUT if settings.RESILIENCE_ENABLED else None
     )
\ No newline at end of file
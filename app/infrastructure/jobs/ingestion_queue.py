@@ -0,0 +1,375 @@
+# app/infrastructure/jobs/ingestion_queue.py
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Set
+
+from app.application.interfaces.ingestion_checkpoint import IIngestionCheckpoint
+from app.application.interfaces.storage_service import IStorageService
+from app.application.services.document_service import DocumentService
+from app.application.services.upload_spool import limit_stream
+from app.domain.entities.ingestion_job import IngestionJob, JobStatus
+from app.domain.exceptions import FileTooLargeError, InvalidDocumentFormatError
+from app.infrastructure.database.sqlite_executor import SQLiteExecutor, transaction
+
+logger = logging.getLogger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    id            TEXT PRIMARY KEY,
+    user_id       TEXT NOT NULL,
+    filename      TEXT NOT NULL,
+    document_id   TEXT NOT NULL,
+    staging_key   TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    error         TEXT,
+    available_at  REAL NOT NULL,
+    claimed_by    TEXT,
+    lease_expires_at REAL,
+    created_at    TEXT NOT NULL,
+    updated_at    TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_ready
+    ON ingestion_jobs (status, available_at);
+
+CREATE TABLE IF NOT EXISTS ingestion_job_steps (
+    job_id  TEXT NOT NULL REFERENCES ingestion_jobs (id) ON DELETE CASCADE,
+    step    TEXT NOT NULL,
+    PRIMARY KEY (job_id, step)
+) WITHOUT ROWID;
+"""
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    conn.executescript(_SCHEMA)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(ingestion_jobs)")}
+    # Queues created before running jobs carried a lease
+    for column in ("claimed_by TEXT", "lease_expires_at REAL"):
+        if column.split()[0] not in columns:
+            conn.execute(f"ALTER TABLE ingestion_jobs ADD COLUMN {column}")
+
+
+_JOB_COLUMNS = "id, user_id, filename, document_id, status, attempts, error, created_at, updated_at"
+_NON_RETRYABLE = (InvalidDocumentFormatError, UnicodeDecodeError, FileTooLargeError)
+
+
+class SQLiteJobCheckpoint(IIngestionCheckpoint):
+    """Finished steps of one job, stored next to the job row"""
+
+    def __init__(self, db: SQLiteExecutor, job_id: str):
+        self.db = db
+        self.job_id = job_id
+
+    async def completed_steps(self) -> Set[str]:
+        rows = await self.db.run(
+            lambda conn: conn.execute(
+                "SELECT step FROM ingestion_job_steps WHERE job_id = ?", (self.job_id,)
+            ).fetchall()
+        )
+        return {row["step"] for row in rows}
+
+    async def mark_done(self, step: str) -> None:
+        await self.db.run(
+            lambda conn: conn.execute(
+                "INSERT OR IGNORE INTO ingestion_job_steps (job_id, step) VALUES (?, ?)",
+                (self.job_id, step),
+            )
+        )
+
+
+class IngestionJobQueue:
+    """
+    Embedded background ingestion queue - no Redis / Celery needed
+
+    enqueue() stages the upload in storage, records a job and returns its id
+    immediately. A pool of async workers runs DocumentService.process_document
+    with a checkpoint, so a job interrupted by a restart resumes from its
+    last finished embedding batch instead of starting over.
+
+    A running job holds a lease, renewed by a heartbeat while it runs. Only
+    jobs whose lease expired - their worker died - are taken over, so
+    several processes can share one queue file.
+    """
+
+    def __init__(
+        self,
+        document_service: DocumentService,
+        storage_service: IStorageService,
+        path: str = "./data/ingestion_jobs.db",
+        workers: int = 2,
+        max_attempts: int = 3,
+        retry_base_delay: float = 2.0,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 30.0,
+        max_backoff: float = 60.0,
+    ):
+        """
+        lease_seconds: how long a running job stays claimed without a heartbeat
+        max_backoff: longest a worker pauses after its own errors (e.g. the queue database)
+        """
+        self.document_service = document_service
+        self.storage_service = storage_service
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_backoff = max_backoff
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.db = SQLiteExecutor(path, name="ingestion-queue")
+        self.db.run_sync(_migrate)
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    # ==================== Producer side ====================
+
+    async def enqueue(self, filename: str, content: bytes, user_id: str) -> str:
+        """Stage the file and queue it - returns the job id"""
+        max_size = self.document_service.max_file_size
+        if max_size is not None and len(content) > max_size:
+            raise FileTooLargeError(f"File exceeds the maximum size of {max_size} bytes")
+        job_id = str(uuid.uuid4())
+        staging_key = f"staging/{job_id}/{filename}"
+        await self.storage_service.upload(key=staging_key, content=content)
+        return await self._record_job(job_id, filename, user_id, staging_key)
+
+    async def enqueue_stream(self, filename: str, chunks: AsyncIterator[bytes], user_id: str) -> str:
+        """Stage an upload straight from a byte stream - never buffered whole in memory"""
+        job_id = str(uuid.uuid4())
+        staging_key = f"staging/{job_id}/{filename}"
+        try:
+            await self.storage_service.upload_stream(
+                staging_key, limit_stream(chunks, self.document_service.max_file_size)
+            )
+        except FileTooLargeError:
+            await self._discard_staged(staging_key)
+            raise
+        return await self._record_job(job_id, filename, user_id, staging_key)
+
+    async def _record_job(self, job_id: str, filename: str, user_id: str, staging_key: str) -> str:
+        now = datetime.utcnow().isoformat()
+        await self.db.run(
+            lambda conn: conn.execute(
+                "INSERT INTO ingestion_jobs (id, user_id, filename, document_id, staging_key, "
+                "status, available_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, filename, str(uuid.uuid4()), staging_key,
+                 JobStatus.QUEUED.value, time.time(), now, now),
+            )
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        row = await self.db.run(
+            lambda conn: conn.execute(
+                f"SELECT {_JOB_COLUMNS} FROM ingestion_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        )
+        return _to_job(row) if row else None
+
+    async def count_by_status(self) -> dict:
+        rows = await self.db.run(
+            lambda conn: conn.execute(
+                "SELECT status, COUNT(*) AS n FROM ingestion_jobs GROUP BY status"
+            ).fetchall()
+        )
+        return {row["status"]: row["n"] for row in rows}
+
+    # ==================== Worker side ====================
+
+    async def start(self) -> None:
+        """Requeue jobs whose worker died (lease expired) and start the workers"""
+        requeued = await self.db.run(_requeue_expired, time.time())
+        if requeued:
+            logger.info("Resuming %d interrupted ingestion jobs", requeued)
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"ingestion-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Cancel workers - jobs in flight are released and resumed by the next worker"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def close(self) -> None:
+        self.db.close()
+
+    async def _worker(self, number: int) -> None:
+        errors = 0
+        while True:
+            try:
+                row = await self.db.run(_claim_next, time.time(), self.worker_id, self.lease_seconds)
+                if row is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run_job(row)
+                errors = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # A job left RUNNING here is taken over once its lease expires
+                errors += 1
+                delay = min(self.max_backoff, self.poll_interval * 2 ** errors)
+                logger.exception("Ingestion worker %d failed, retrying in %.1fs", number, delay)
+                await asyncio.sleep(delay)
+
+    async def _run_job(self, row: sqlite3.Row) -> None:
+        job_id = row["id"]
+        heartbeat = asyncio.create_task(self._heartbeat(job_id), name=f"ingestion-lease-{job_id}")
+        try:
+            await self._process(row)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            renewed = await self.db.run(_renew_lease, job_id, self.worker_id, time.time() + self.lease_seconds)
+            if not renewed:
+                logger.warning("Lost the lease on ingestion job %s - another worker took it over", job_id)
+                return
+
+    async def _process(self, row: sqlite3.Row) -> None:
+        job_id = row["id"]
+        checkpoint = SQLiteJobCheckpoint(self.db, job_id)
+        try:
+            await self.document_service.process_upload(
+                filename=row["filename"],
+                source=self.storage_service.download_stream(row["staging_key"]),
+                user_id=row["user_id"],
+                document_id=row["document_id"],
+                checkpoint=checkpoint,
+            )
+        except asyncio.CancelledError:
+            # Shutdown - hand it back now rather than after the lease expires
+            await asyncio.shield(self.db.run(_release, job_id, self.worker_id))
+            raise
+        except Exception as exc:
+            retry = not isinstance(exc, _NON_RETRYABLE) and row["attempts"] < self.max_attempts
+            delay = self.retry_base_delay * (2 ** (row["attempts"] - 1))
+            logger.warning("Ingestion job %s failed (attempt %d): %s", job_id, row["attempts"], exc)
+            recorded = await self.db.run(
+                _record_failure, job_id, self.worker_id, repr(exc), retry, time.time() + delay
+            )
+            if recorded and not retry:
+                # Nothing resumes it - drop the vectors and dedup entries of its finished batches
+                await self._discard_partial(row, checkpoint)
+                await self._discard_staged(row["staging_key"])
+            return
+
+        # The staged upload stays if another worker took the job over meanwhile
+        if await self.db.run(_record_success, job_id, self.worker_id):
+            await self._discard_staged(row["staging_key"])
+
+    async def _discard_partial(self, row: sqlite3.Row, checkpoint: SQLiteJobCheckpoint) -> None:
+        try:
+            await self.document_service.discard_ingestion(
+                row["document_id"], row["user_id"], row["filename"], checkpoint
+            )
+        except Exception as exc:
+            logger.warning("Could not clean up failed ingestion job %s: %s", row["id"], exc)
+
+    async def _discard_staged(self, staging_key: str) -> None:
+        try:
+            await self.storage_service.delete(key=staging_key)
+        except Exception as exc:
+            logger.warning("Could not delete staged upload %s: %s", staging_key, exc)
+
+
+# ==================== Database thread functions ====================
+
+@transaction
+def _claim_next(conn: sqlite3.Connection, now: float, worker_id: str,
+                lease_seconds: float) -> Optional[sqlite3.Row]:
+    # Queued jobs that are due, and running ones whose worker stopped renewing the lease
+    row = conn.execute(
+        "SELECT id FROM ingestion_jobs WHERE (status = ? AND available_at <= ?) "
+        "OR (status = ? AND COALESCE(lease_expires_at, 0) < ?) ORDER BY available_at LIMIT 1",
+        (JobStatus.QUEUED.value, now, JobStatus.RUNNING.value, now),
+    ).fetchone()
+    if row is None:
+        return None
+    return conn.execute(
+        "UPDATE ingestion_jobs SET status = ?, attempts = attempts + 1, claimed_by = ?, "
+        "lease_expires_at = ?, updated_at = ? "
+        "WHERE id = ? RETURNING id, user_id, filename, document_id, staging_key, attempts",
+        (JobStatus.RUNNING.value, worker_id, now + lease_seconds, datetime.utcnow().isoformat(), row["id"]),
+    ).fetchone()
+
+
+def _requeue_expired(conn: sqlite3.Connection, now: float) -> int:
+    # Jobs without a lease were claimed before leases existed - nothing renews them
+    return conn.execute(
+        "UPDATE ingestion_jobs SET status = ?, available_at = ?, claimed_by = NULL, lease_expires_at = NULL "
+        "WHERE status = ? AND COALESCE(lease_expires_at, 0) < ?",
+        (JobStatus.QUEUED.value, now, JobStatus.RUNNING.value, now),
+    ).rowcount
+
+
+def _renew_lease(conn: sqlite3.Connection, job_id: str, worker_id: str, expires_at: float) -> bool:
+    return conn.execute(
+        "UPDATE ingestion_jobs SET lease_expires_at = ? WHERE id = ? AND status = ? AND claimed_by = ?",
+        (expires_at, job_id, JobStatus.RUNNING.value, worker_id),
+    ).rowcount > 0
+
+
+def _release(conn: sqlite3.Connection, job_id: str, worker_id: str) -> None:
+    conn.execute(
+        "UPDATE ingestion_jobs SET status = ?, available_at = ?, claimed_by = NULL, lease_expires_at = NULL "
+        "WHERE id = ? AND status = ? AND claimed_by = ?",
+        (JobStatus.QUEUED.value, time.time(), job_id, JobStatus.RUNNING.value, worker_id),
+    )
+
+
+@transaction
+def _record_success(conn: sqlite3.Connection, job_id: str, worker_id: str) -> bool:
+    # A worker that lost its lease leaves the job to the one that took it over
+    updated = conn.execute(
+        "UPDATE ingestion_jobs SET status = ?, error = NULL, claimed_by = NULL, lease_expires_at = NULL, "
+        "updated_at = ? WHERE id = ? AND claimed_by = ?",
+        (JobStatus.DONE.value, datetime.utcnow().isoformat(), job_id, worker_id),
+    ).rowcount
+    if updated:
+        conn.execute("DELETE FROM ingestion_job_steps WHERE job_id = ?", (job_id,))
+    return updated > 0
+
+
+def _record_failure(conn: sqlite3.Connection, job_id: str, worker_id: str, error: str, retry: bool,
+                    available_at: float) -> bool:
+    return conn.execute(
+        "UPDATE ingestion_jobs SET status = ?, error = ?, available_at = ?, claimed_by = NULL, "
+        "lease_expires_at = NULL, updated_at = ? WHERE id = ? AND claimed_by = ?",
+        (JobStatus.QUEUED.value if retry else JobStatus.FAILED.value, error, available_at,
+         datetime.utcnow().isoformat(), job_id, worker_id),
+    ).rowcount > 0
+
+
+def _to_job(row: sqlite3.Row) -> IngestionJob:
+    return IngestionJob(
+        id=row["id"],
+        user_id=row["user_id"],
+        filename=row["filename"],
+        document_id=row["document_id"],
+        status=JobStatus(row["status"]),
+        attempts=row["attempts"],
+        error=row["error"],
+        created_at=datetime.fromisoformat(row["created_at"]),
+        updated_at=datetime.fromisoformat(row["updated_at"]),
+    )
@@ -0,0 +1,416 @@
+# app/infrastructure/jobs/reindex_job.py
+"""
+Corpus re-embedding into a new index generation
+
+Run after changing the embedding model (or vector store provider):
+
+    EMBEDDING_PROVIDER=... OPENAI_EMBEDDING_MODEL=... \\
+        python -m app.infrastructure.jobs.reindex_job --generation g1
+
+The job streams every document's original file back from storage,
+re-chunks and re-embeds it with the *configured* (new) embedding service,
+`concurrency` documents at a time, writing into generation g1. Chat keeps
+reading the active generation until every document is done; then the
+pointer is swapped atomically. Restart the workers with the new
+configuration afterwards - until they are, their queries are still served
+from the previous generation.
+
+Progress is checkpointed per document and per embedding batch, so an
+interrupted run resumes where it stopped (keep the batch size unchanged).
+
+Once every worker runs the new model, retire the old generation:
+
+    python -m app.infrastructure.jobs.reindex_job --generation g1 --retire-previous
+
+This first re-embeds documents uploaded since the swap (old-model workers
+wrote them to the old generation only) and refuses while any is missing.
+"""
+import argparse
+import asyncio
+import logging
+import sqlite3
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from app.application.interfaces.document_repository import IDocumentRepositroy
+from app.application.interfaces.ingestion_checkpoint import IIngestionCheckpoint
+from app.application.services.document_service import DocumentService
+from app.core.metrics import PipelineMetrics, get_metrics
+from app.domain.entities.document import Document
+from app.infrastructure.database.sqlite_executor import SQLiteExecutor, transaction
+from app.infrastructure.vector_stores.generational_store import Generation, GenerationalVectorStore
+
+logger = logging.getLogger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reindex_runs (
+    generation   TEXT PRIMARY KEY,
+    model        TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    started_at   TEXT NOT NULL,
+    finished_at  TEXT
+);
+
+CREATE TABLE IF NOT EXISTS reindex_documents (
+    generation   TEXT NOT NULL,
+    document_id  TEXT NOT NULL,
+    chunks       INTEGER NOT NULL,
+    PRIMARY KEY (generation, document_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS reindex_failures (
+    generation   TEXT NOT NULL,
+    document_id  TEXT NOT NULL,
+    error        TEXT NOT NULL,
+    PRIMARY KEY (generation, document_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS reindex_steps (
+    generation   TEXT NOT NULL,
+    document_id  TEXT NOT NULL,
+    step         TEXT NOT NULL,
+    PRIMARY KEY (generation, document_id, step)
+) WITHOUT ROWID;
+"""
+
+_PROBE_TEXT = "embedding model probe"
+
+
+class SQLiteReindexCheckpoint(IIngestionCheckpoint):
+    """Finished embedding batches of one document in one generation"""
+
+    def __init__(self, db: SQLiteExecutor, generation: str, document_id: str):
+        self.db = db
+        self.generation = generation
+        self.document_id = document_id
+
+    async def completed_steps(self) -> Set[str]:
+        rows = await self.db.run(
+            lambda conn: conn.execute(
+                "SELECT step FROM reindex_steps WHERE generation = ? AND document_id = ?",
+                (self.generation, self.document_id),
+            ).fetchall()
+        )
+        return {row["step"] for row in rows}
+
+    async def mark_done(self, step: str) -> None:
+        await self.db.run(
+            lambda conn: conn.execute(
+                "INSERT OR IGNORE INTO reindex_steps (generation, document_id, step) VALUES (?, ?, ?)",
+                (self.generation, self.document_id, step),
+            )
+        )
+
+
+@dataclass
+class ReindexProgress:
+    generation: str
+    model: str = ""
+    documents_total: int = 0
+    documents_done: int = 0
+    documents_skipped: int = 0  # finished by an earlier run
+    documents_failed: int = 0
+    chunks_done: int = 0
+    elapsed_seconds: float = 0.0
+    swapped: bool = False
+
+    @property
+    def documents_per_second(self) -> float:
+        return self.documents_done / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks_done / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        remaining = self.documents_total - self.documents_done - self.documents_skipped - self.documents_failed
+        rate = self.documents_per_second
+        return max(0, remaining) / rate if rate else None
+
+    def to_dict(self) -> Dict:
+        return {
+            **asdict(self),
+            "documents_per_second": round(self.documents_per_second, 2),
+            "chunks_per_second": round(self.chunks_per_second, 1),
+            "eta_seconds": None if self.eta_seconds is None else round(self.eta_seconds),
+        }
+
+
+class ReindexJob:
+    """
+    Re-embeds the whole corpus into a new generation of a GenerationalVectorStore
+
+    document_service must be built with the target embedding service and
+    the generational store as its vector store: the building generation
+    claims embeddings of the new model, so its writes land there only.
+    """
+
+    def __init__(
+        self,
+        document_service: DocumentService,
+        generations: GenerationalVectorStore,
+        document_repo: IDocumentRepositroy,
+        generation: str,
+        path: str = "./data/reindex.db",
+        concurrency: int = 8,
+        page_size: int = 200,
+        report_interval: float = 30.0,
+        provider: Optional[str] = None,
+        source_model: Optional[str] = None,
+        metrics: Optional[PipelineMetrics] = None,
+    ):
+        """
+        concurrency: documents re-embedded at once - each sends batches of
+        document_service.embedding_batch_size chunks
+        source_model: tags an active generation built before generations were tracked
+        """
+        self.document_service = document_service
+        self.generations = generations
+        self.document_repo = document_repo
+        self.generation = generation
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.report_interval = report_interval
+        self.provider = provider
+        self.source_model = source_model
+        self.db = SQLiteExecutor(path, name="reindex")
+        self.db.run_sync(lambda conn: conn.executescript(_SCHEMA))
+        self.progress = ReindexProgress(generation=generation)
+
+        registry = (metrics or get_metrics()).registry
+        self._documents = registry.counter(
+            "rag_reindex_documents_total", "Documents processed by the re-embedding job", ("result",))
+        self._chunks = registry.counter(
+            "rag_reindex_chunks_total", "Chunks re-embedded into the new index generation")
+        self._progress_ratio = registry.gauge(
+            "rag_reindex_progress_ratio", "Fraction of documents in the new index generation")
+
+    async def run(self, swap: bool = True) -> ReindexProgress:
+        """Build the generation and - if every document made it - make it active"""
+        probe = await self.document_service.embedding_service.create_embedding(_PROBE_TEXT)
+        building = self.generations.begin(
+            self.generation, probe.model, provider=self.provider, source_model=self.source_model
+        )
+        await self.db.run(_record_start, self.generation, building.model)
+        self.progress = ReindexProgress(
+            generation=self.generation,
+            model=building.model,
+            documents_total=await self.document_repo.count_all(),
+        )
+        logger.info("Re-embedding %d documents into generation %s (%s)",
+                    self.progress.documents_total, self.generation, building.model)
+
+        started = time.monotonic()
+        reporter = asyncio.create_task(self._report(started))
+        try:
+            await self._reindex_all(started)
+        finally:
+            reporter.cancel()
+            self.progress.elapsed_seconds = time.monotonic() - started
+
+        if self.progress.documents_failed:
+            logger.warning("%d documents failed - generation %s not activated, re-run to retry them",
+                           self.progress.documents_failed, self.generation)
+        elif swap:
+            # Stores that buffer writes (LocalVectorStore) persist them before other processes switch over
+            flush = getattr(self.generations.store_for(building), "flush", None)
+            if flush is not None:
+                await flush()
+            self.generations.promote(self.generation)
+            await self.db.run(_record_finish, self.generation)
+            self.progress.swapped = True
+        self._log_progress()
+        return self.progress
+
+    async def retire_previous(self) -> Optional[Generation]:
+        """
+        Stop serving the previous generation once this one is active
+        Documents uploaded since the swap by workers still on the old model
+        are only in the previous generation: re-embed them first, and refuse
+        while any document is missing from this generation.
+        """
+        if self.generations.pointer.active.name != self.generation:
+            raise ValueError(f"Generation {self.generation} is not active")
+        self.progress = ReindexProgress(
+            generation=self.generation,
+            model=self.generations.pointer.active.model or "",
+            documents_total=await self.document_repo.count_all(),
+        )
+        started = time.monotonic()
+        await self._reindex_all(started)
+        self.progress.elapsed_seconds = time.monotonic() - started
+        missing = await self._missing_documents()
+        if missing:
+            raise ValueError(f"{missing} documents are not in generation {self.generation} yet - "
+                             "previous generation kept, re-run to retry them")
+        return self.generations.retire_previous()
+
+    async def _reindex_all(self, started: float) -> None:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self._worker(queue, started)) for _ in range(self.concurrency)]
+        try:
+            # Pages are read in insertion order, so documents uploaded meanwhile land on
+            # later pages. The last page is re-read from its cursor once the queue drains,
+            # until no new document shows up - the building generation is still not active.
+            cursor, listed = None, set()
+            while True:
+                page, next_cursor = await self.document_repo.list_all_after(cursor, self.page_size)
+                fresh = [document for document in page if document.id not in listed]
+                done = await self.db.run(_finished_ids, self.generation, [d.id for d in fresh])
+                for document in fresh:
+                    if document.id in done:
+                        self.progress.documents_skipped += 1
+                        self._documents.labels("skipped").inc()
+                    else:
+                        await queue.put(document)
+                if next_cursor is not None:
+                    cursor, listed = next_cursor, set()
+                    continue
+                await queue.join()
+                if not fresh:
+                    break
+                listed = {document.id for document in page}
+                self.progress.documents_total = max(self.progress.documents_total,
+                                                    await self.document_repo.count_all())
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _missing_documents(self) -> int:
+        missing, cursor = 0, None
+        while True:
+            page, cursor = await self.document_repo.list_all_after(cursor, self.page_size)
+            done = await self.db.run(_finished_ids, self.generation, [d.id for d in page])
+            missing += sum(1 for document in page if document.id not in done)
+            if cursor is None:
+                return missing
+
+    async def _worker(self, queue: asyncio.Queue, started: float) -> None:
+        while True:
+            document: Document = await queue.get()
+            try:
+                await self._reindex_one(document)
+            finally:
+                queue.task_done()
+                self.progress.elapsed_seconds = time.monotonic() - started
+
+    async def _reindex_one(self, document: Document) -> None:
+        checkpoint = SQLiteReindexCheckpoint(self.db, self.generation, document.id)
+        try:
+            chunks = await self.document_service.reindex_document(document, checkpoint)
+        except Exception as exc:
+            logger.warning("Re-embedding document %s failed: %s", document.id, exc)
+            await self.db.run(_record_failure, self.generation, document.id, repr(exc))
+            self.progress.documents_failed += 1
+            self._documents.labels("failed").inc()
+            return
+        await self.db.run(_record_done, self.generation, document.id, chunks)
+        self.progress.documents_done += 1
+        self.progress.chunks_done += chunks
+        self._documents.labels("done").inc()
+        self._chunks.inc(chunks)
+        if self.progress.documents_total:
+            finished = self.progress.documents_done + self.progress.documents_skipped
+            self._progress_ratio.set(min(1.0, finished / self.progress.documents_total))
+
+    async def _report(self, started: float) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.progress.elapsed_seconds = time.monotonic() - started
+            self._log_progress()
+
+    def _log_progress(self) -> None:
+        p = self.progress
+        eta = p.eta_seconds
+        logger.info(
+            "Generation %s: %d/%d documents (%d from earlier runs, %d failed), %d chunks, "
+            "%.1f docs/s, %.0f chunks/s, ETA %s",
+            p.generation, p.documents_done + p.documents_skipped, p.documents_total,
+            p.documents_skipped, p.documents_failed, p.chunks_done,
+            p.documents_per_second, p.chunks_per_second,
+            "-" if eta is None else f"{eta / 60:.1f} min",
+        )
+
+    def close(self) -> None:
+        self.db.close()
+
+
+# ==================== Database thread functions ====================
+
+def _record_start(conn: sqlite3.Connection, generation: str, model: str) -> None:
+    conn.execute(
+        "INSERT OR IGNORE INTO reindex_runs (generation, model, status, started_at) VALUES (?, ?, ?, ?)",
+        (generation, model, "running", datetime.utcnow().isoformat()),
+    )
+
+
+def _record_finish(conn: sqlite3.Connection, generation: str) -> None:
+    conn.execute(
+        "UPDATE reindex_runs SET status = ?, finished_at = ? WHERE generation = ?",
+        ("active", datetime.utcnow().isoformat(), generation),
+    )
+
+
+def _finished_ids(conn: sqlite3.Connection, generation: str, document_ids: List[str]) -> Set[str]:
+    if not document_ids:
+        return set()
+    placeholders = ",".join("?" * len(document_ids))
+    rows = conn.execute(
+        f"SELECT document_id FROM reindex_documents WHERE generation = ? AND document_id IN ({placeholders})",
+        (generation, *document_ids),
+    ).fetchall()
+    return {row["document_id"] for row in rows}
+
+
+@transaction
+def _record_done(conn: sqlite3.Connection, generation: str, document_id: str, chunks: int) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO reindex_documents (generation, document_id, chunks) VALUES (?, ?, ?)",
+        (generation, document_id, chunks),
+    )
+    conn.execute("DELETE FROM reindex_failures WHERE generation = ? AND document_id = ?", (generation, document_id))
+    conn.execute("DELETE FROM reindex_steps WHERE generation = ? AND document_id = ?", (generation, document_id))
+
+
+def _record_failure(conn: sqlite3.Connection, generation: str, document_id: str, error: str) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO reindex_failures (generation, document_id, error) VALUES (?, ?, ?)",
+        (generation, document_id, error),
+    )
+
+
+# ==================== Command line ====================
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Re-embed all documents into a new index generation")
+    parser.add_argument("--generation", required=True, help="Name of the generation to build, e.g. g1")
+    parser.add_argument("--no-swap", action="store_true", help="Build only - don't make it active")
+    parser.add_argument("--retire-previous", action="store_true",
+                        help="Catch up on documents uploaded since the swap, then stop serving the previous generation")
+    parser.add_argument("--source-model", help="Model of the current index, if it predates generations")
+    parser.add_argument("--concurrency", type=int, help="Documents in flight (default REINDEX_CONCURRENCY)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    # Imported here - dependencies imports this module
+    from app.infrastructure.dependencies import get_reindex_job
+
+    job = get_reindex_job(args.generation, source_model=args.source_model, concurrency=args.concurrency)
+    try:
+        if args.retire_previous:
+            retired = asyncio.run(job.retire_previous())
+            print({**job.progress.to_dict(), "retired": retired.name if retired else None})
+            return
+        progress = asyncio.run(job.run(swap=not args.no_swap))
+    finally:
+        job.close()
+    print(progress.to_dict())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from typing import List
+from app.application.interfaces.embedding_service import IEmbeddingService
+from app.application.interfaces.llm_services import ILLMService
+from app.core.admission import AdmissionController
+from app.domain.entities.chat_message import ChatMessage
+from app.domain.entities.embedding import Embedding
+
+
+class AdmissionControlledLLMService(ILLMService):
+    """Decorator - every generation goes through the upstream's admission controller"""
+
+    def __init__(self, inner: ILLMService, controller: AdmissionController):
+        self.inner = inner
+        self.controller = controller
+
+    async def generate_response(self, messages: List[ChatMessage], context: str) -> str:
+        async with self.controller.admit():
+            return await self.inner.generate_response(messages, context)
+
+    async def generate_streaming_response(self, messages: List[ChatMessage], context: str):
+        # The slot is held until the stream is fully consumed
+        async with self.controller.admit():
+            async for token in self.inner.generate_streaming_response(messages, context):
+                yield token
+
+
+class AdmissionControlledEmbeddingService(IEmbeddingService):
+    """Decorator - every embedding request goes through the upstream's admission controller"""
+
+    def __init__(self, inner: IEmbeddingService, controller: AdmissionController):
+        self.inner = inner
+        self.controller = controller
+
+    async def create_embedding(self, text: str) -> Embedding:
+        async with self.controller.admit():
+            return await self.inner.create_embedding(text)
+
+    async def create_embeddings_batch(self, texts: List[str]) -> List[Embedding]:
+        # A batch is one request against the provider's request quota
+        async with self.controller.admit():
+            return await self.inner.create_embeddings_batch(texts)
@@ -0,0 +1,217 @@
+# app/infrastructure/llm/embedding_projection.py
+"""
+Embedding dimensionality reduction for models without native shortening
+
+Vector memory and search time grow linearly with dimension. OpenAI's
+text-embedding-3 models shorten natively (see OpenAIEmbeddingService),
+other models go through ReducedEmbeddingService:
+- "truncate": keep the first N components (Matryoshka-trained models)
+- "pca": project onto the top N principal components of the corpus
+
+Either way vectors are renormalized to unit length, and the model name
+is tagged with the reduction so reduced and full vectors never mix.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from app.application.interfaces.embedding_service import IEmbeddingService
+from app.domain.entities.embedding import Embedding
+from app.domain.exceptions import EmbeddingError
+
+
+REDUCTION_METHODS = ("truncate", "pca")
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class PCAProjection:
+    """
+    Projection onto the top principal components of the corpus
+    Axes are fitted on centred vectors but applied without centring, so
+    the projection is a rotation followed by a cut: at full width it keeps
+    cosine similarities exactly.
+    """
+
+    def __init__(self, components: np.ndarray, source_model: str, explained_variance: float = 0.0):
+        self.components = components.astype(np.float32)  # (dimension, source_dimension)
+        self.source_model = source_model
+        self.explained_variance = explained_variance
+
+    @property
+    def dimension(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def source_dimension(self) -> int:
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, dimension: int, source_model: str) -> "PCAProjection":
+        """Fit on a sample of corpus embeddings - needs at least `dimension` of them"""
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if vectors.ndim != 2 or vectors.shape[0] < dimension:
+            raise ValueError(
+                f"PCA to {dimension} dimensions needs at least {dimension} sample vectors, got {len(vectors)}"
+            )
+        if dimension > vectors.shape[1]:
+            raise ValueError(f"Cannot project {vectors.shape[1]} dimensions up to {dimension}")
+        # Rows of vt are the principal axes, by decreasing singular value
+        _, singular_values, vt = np.linalg.svd(vectors - vectors.mean(axis=0), full_matrices=False)
+        variance = singular_values ** 2
+        explained = float(variance[:dimension].sum() / variance.sum()) if variance.sum() else 1.0
+        return cls(vt[:dimension], source_model, explained)
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        projected = np.asarray(vectors, dtype=np.float32) @ self.components.T
+        return normalize_rows(np.atleast_2d(projected))
+
+    def save(self, path: str) -> None:
+        """Write atomically - readers never see a half-written projection"""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        header = json.dumps({"source_model": self.source_model, "explained_variance": self.explained_variance})
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp:
+            np.savez(tmp, components=self.components,
+                     header=np.frombuffer(header.encode("utf-8"), dtype=np.uint8))
+        os.replace(tmp_path, target)
+
+    @classmethod
+    def load(cls, path: str) -> "PCAProjection":
+        with np.load(path) as data:
+            header = json.loads(data["header"].tobytes())
+            return cls(data["components"], header["source_model"], header.get("explained_variance", 0.0))
+
+
+class ReducedEmbeddingService(IEmbeddingService):
+    """
+    Decorator reducing another service's embeddings to `dimension`
+    Queries and chunks go through the same instance, so both are
+    reduced identically.
+    """
+
+    def __init__(self, embedding_service: IEmbeddingService, dimension: int,
+                 method: str = "pca", projection: Optional[PCAProjection] = None):
+        if method not in REDUCTION_METHODS:
+            raise ValueError(f"Unknown reduction method: {method}")
+        if method == "pca" and projection is not None:
+            if projection.dimension != dimension:
+                raise ValueError(
+                    f"Projection has {projection.dimension} dimensions, expected {dimension}"
+                )
+            # A projection fitted on another model silently scrambles every vector - refuse it
+            source_model = getattr(embedding_service, "model_name", "unknown")
+            if projection.source_model != source_model:
+                raise ValueError(
+                    f"Projection was fitted on {projection.source_model}, not {source_model} - refit it"
+                )
+        self.embedding_service = embedding_service
+        self.dimension = dimension
+        self.method = method
+        self.projection = projection
+
+    @property
+    def model_name(self) -> str:
+        return _tagged(getattr(self.embedding_service, "model_name", "unknown"), self.method, self.dimension)
+
+    async def create_embedding(self, text: str) -> Embedding:
+        embedding = await self.embedding_service.create_embedding(text)
+        return self._reduce([embedding])[0]
+
+    async def create_embeddings_batch(self, texts: List[str]) -> List[Embedding]:
+        embeddings = await self.embedding_service.create_embeddings_batch(texts)
+        return self._reduce(embeddings)
+
+    async def fit(self, texts: List[str], batch_size: int = 256) -> PCAProjection:
+        """Fit the PCA projection on a sample of corpus texts"""
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            batch = await self.embedding_service.create_embeddings_batch(texts[start:start + batch_size])
+            vectors.extend(embedding.vector for embedding in batch)
+        source_model = getattr(self.embedding_service, "model_name", "unknown")
+        self.projection = PCAProjection.fit(np.asarray(vectors), self.dimension, source_model)
+        return self.projection
+
+    def _reduce(self, embeddings: List[Embedding]) -> List[Embedding]:
+        if not embeddings:
+            return []
+        matrix = np.asarray([embedding.vector for embedding in embeddings], dtype=np.float32)
+        if self.method == "truncate":
+            if matrix.shape[1] < self.dimension:
+                raise EmbeddingError(f"Cannot truncate {matrix.shape[1]} dimensions to {self.dimension}")
+            reduced = normalize_rows(matrix[:, :self.dimension])
+        else:
+            if self.projection is None:
+                raise EmbeddingError("PCA projection is not fitted - run the embedding_projection fit first")
+            if matrix.shape[1] != self.projection.source_dimension:
+                raise EmbeddingError(
+                    f"Projection expects {self.projection.source_dimension}-dimensional embeddings, "
+                    f"got {matrix.shape[1]} from {getattr(self.embedding_service, 'model_name', 'unknown')}"
+                )
+            reduced = self.projection.transform(matrix)
+        model = self.model_name
+        return [
+            Embedding(vector=vector.tolist(), model=model, text=embedding.text)
+            for vector, embedding in zip(reduced, embeddings)
+        ]
+
+
+def _tagged(model_name: str, method: str, dimension: int) -> str:
+    return f"{model_name}@{method}{dimension}"
+
+
+def _read_corpus(paths: List[Path], max_chars: int) -> List[str]:
+    """Plain text files, cut into chunk-sized passages"""
+    texts = []
+    for path in paths:
+        files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+        for file in files:
+            content = file.read_text(errors="ignore")
+            texts.extend(
+                content[start:start + max_chars]
+                for start in range(0, len(content), max_chars)
+                if content[start:start + max_chars].strip()
+            )
+    return texts
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Fit and save a PCA projection for a local embedding model:
+        python -m app.infrastructure.llm.embedding_projection corpus/ --dimension 128
+    """
+    from app.core.config import Settings
+    from app.infrastructure.llm.embedding_sentence_transformers import SentenceTransformerEmbeddingService
+
+    settings = Settings()
+    parser = argparse.ArgumentParser(description="Fit a PCA projection for embedding reduction")
+    parser.add_argument("corpus", nargs="+", type=Path, help="Text files or directories to sample")
+    parser.add_argument("--dimension", type=int, default=settings.EMBEDDING_DIMENSIONS)
+    parser.add_argument("--model", default=settings.LOCAL_EMBEDDING_MODEL)
+    parser.add_argument("--output", default=settings.EMBEDDING_PROJECTION_PATH)
+    parser.add_argument("--sample", type=int, default=20000, help="Maximum passages to fit on")
+    args = parser.parse_args(argv)
+    if not args.dimension:
+        parser.error("--dimension (or EMBEDDING_DIMENSIONS) is required")
+
+    texts = _read_corpus(args.corpus, settings.CHUNK_SIZE)[:args.sample]
+    service = ReducedEmbeddingService(SentenceTransformerEmbeddingService(args.model), args.dimension)
+    projection = asyncio.run(service.fit(texts))
+    projection.save(args.output)
+    print(f"Fitted {args.model} -> {args.dimension} dimensions on {len(texts)} passages "
+          f"({projection.explained_variance:.1%} variance kept), saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,16 @@
 from typing import Any, List , cast
 import openai
 from app.application.interfaces.llm_services import ILLMService
+from app.core.metrics import get_metrics
 from app.domain.entities.chat_message import ChatMessage
 
 
 class OpenAIAdapter(ILLMService):
-    def __init__(self, api_key :str , model:str="gpt-4-mini"):
-        self.client = openai.AsyncOpenAI(api_key=api_key)
+    def __init__(self, api_key :str , model:str="gpt-4-mini", max_retries:int = 2):
+        """max_retries: SDK-level retries - set 0 when a ResilientLLMService wraps this adapter"""
+        self.client = openai.AsyncOpenAI(api_key=api_key, max_retries=max_retries)
         self.model = model
+        self.metrics = get_metrics()
 
     async def generate_response(self, messages: List[ChatMessage] , context:str):
         system_message = {
@@ -23,6 +26,10 @@ class OpenAIAdapter(ILLMService):
             model=self.model,
             messages=cast(Any , formatted_messages)
         )
+
+        if response.usage is not None:
+            self.metrics.add_tokens(self.model, "prompt", response.usage.prompt_tokens)
+            self.metrics.add_tokens(self.model, "completion", response.usage.completion_tokens)
         
         return response.choices[0].message.content
     
@@ -1,21 +1,41 @@
 from app.domain.entities.embedding import Embedding
-from typing import List
+from typing import List, Optional
 from openai import AsyncOpenAI
 from app.application.interfaces.embedding_service import IEmbeddingService
 from app.domain.exceptions import EmbeddingError
+from app.core.metrics import get_metrics
 class OpenAIEmbeddingService(IEmbeddingService):
     """OpenAI embedding serice """
 
-    def __init__(self , model_name:str = "text-embedding-3-small"):
-        self.model_name = model_name
-        self.client = AsyncOpenAI()
+    def __init__(self , model_name:str = "text-embedding-3-small", dimensions:Optional[int] = None,
+                 max_retries:int = 2):
+        """
+        dimensions: shortened output size (text-embedding-3 models only)
+        OpenAI returns shortened vectors already normalized to unit length
+        max_retries: SDK-level retries - set 0 when a ResilientEmbeddingService wraps this
+        """
+        if dimensions and not model_name.startswith("text-embedding-3"):
+            raise ValueError(f"{model_name} does not support shortened embeddings")
+        self.base_model = model_name
+        self.dimensions = dimensions
+        # Tag the dimension so vectors of different sizes are never mixed
+        self.model_name = f"{model_name}@{dimensions}" if dimensions else model_name
+        self.client = AsyncOpenAI(max_retries=max_retries)
+        self.metrics = get_metrics()
+
+    def _request_options(self) -> dict:
+        options = {"model": self.base_model}
+        if self.dimensions:
+            options["dimensions"] = self.dimensions
+        return options
         
 
     async def create_embedding(self, text: str) -> Embedding:
         response = await self.client.embeddings.create(
             input= text , 
-            model = self.model_name
+            **self._request_options()
         )
+        self._record_usage(response, batch_size=1)
         vector =  response.data[0].embedding
         return Embedding(
             vector=vector , 
@@ -29,8 +49,9 @@ class OpenAIEmbeddingService(IEmbeddingService):
 
         response = await self.client.embeddings.create(
                     input=texts ,
-                    model=self.model_name
+                    **self._request_options()
                 )
+        self._record_usage(response, batch_size=len(texts))
 
         for i , embedding_data in enumerate(response.data):
                 vectors.append(
@@ -42,4 +63,9 @@ class OpenAIEmbeddingService(IEmbeddingService):
                 ) 
 
 
-        return vectors
\ No newline at end of file
+        return vectors
+
+    def _record_usage(self, response, batch_size:int) -> None:
+        self.metrics.observe_batch("embedding", "request", batch_size)
+        if response.usage is not None:
+            self.metrics.add_tokens(self.base_model, "embedding", response.usage.total_tokens)
@@ -0,0 +1,55 @@
+from typing import List
+from app.application.interfaces.embedding_service import IEmbeddingService
+from app.application.interfaces.llm_services import ILLMService
+from app.core.resilience import ResilientCaller
+from app.domain.entities.chat_message import ChatMessage
+from app.domain.entities.embedding import Embedding
+
+
+_EMPTY = object()
+
+
+class ResilientLLMService(ILLMService):
+    """Decorator - deadlines, retries and circuit breaking for generations (never hedged)"""
+
+    def __init__(self, inner: ILLMService, caller: ResilientCaller):
+        self.inner = inner
+        self.caller = caller
+
+    async def generate_response(self, messages: List[ChatMessage], context: str) -> str:
+        return await self.caller.call(lambda: self.inner.generate_response(messages, context))
+
+    async def generate_streaming_response(self, messages: List[ChatMessage], context: str):
+        # Only opening the stream is retried - once tokens reach the caller a retry would repeat them
+        async def open_stream():
+            stream = self.inner.generate_streaming_response(messages, context)
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, _EMPTY
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        stream, token = await self.caller.call(open_stream)
+        if token is _EMPTY:
+            return
+        yield token
+        async for token in stream:
+            yield token
+
+
+class ResilientEmbeddingService(IEmbeddingService):
+    """Decorator - deadlines, retries, circuit breaking and optional hedging for embeddings"""
+
+    def __init__(self, inner: IEmbeddingService, caller: ResilientCaller, hedge: bool = False):
+        """hedge: embeddings are idempotent and cheap, so a slow request may be duplicated"""
+        self.inner = inner
+        self.caller = caller
+        self.hedge = hedge
+
+    async def create_embedding(self, text: str) -> Embedding:
+        return await self.caller.call(lambda: self.inner.create_embedding(text), hedge=self.hedge)
+
+    async def create_embeddings_batch(self, texts: List[str]) -> List[Embedding]:
+        return await self.caller.call(lambda: self.inner.create_embeddings_batch(texts), hedge=self.hedge)
@@ -0,0 +1,279 @@
+# app/infrastructure/storage/local_storage.py
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Iterator, Optional, Tuple
+
+from app.application.interfaces.storage_service import IStorageService
+
+
+class LocalStorageService(IStorageService):
+    """
+    Content-addressed local filesystem storage
+
+    Layout under `root`:
+        blobs/ab/<sha256>       file content, stored once per distinct content
+        blobs/ab/<sha256>.refs  number of keys pointing at the blob
+        keys/cd/<sha256(key)>   JSON {"key", "digest", "size"}
+        tmp/                    in-flight writes, renamed into place atomically
+
+    Identical files uploaded under different keys share one blob.
+    Blobs larger than `mmap_threshold` are read through mmap.
+    """
+
+    def __init__(self, root: str = "./storage", chunk_size: int = 1024 * 1024,
+                 mmap_threshold: int = 8 * 1024 * 1024, fsync: bool = True):
+        self.root = Path(root).resolve()
+        self.chunk_size = chunk_size
+        self.mmap_threshold = mmap_threshold
+        self.fsync = fsync
+        self._blobs = self.root / "blobs"
+        self._keys = self.root / "keys"
+        self._tmp = self.root / "tmp"
+        for directory in (self._blobs, self._keys, self._tmp):
+            directory.mkdir(parents=True, exist_ok=True)
+        # Guards reference counts and key records (single node, one process)
+        self._lock = threading.Lock()
+
+    # ==================== IStorageService ====================
+
+    async def upload(self, key: str, content: bytes) -> str:
+        """Upload bytes under key and return file URL"""
+        return await asyncio.to_thread(self._upload_sync, key, content)
+
+    async def upload_stream(self, key: str, chunks: AsyncIterator[bytes]) -> str:
+        """Write an async byte stream to a temp file, hashing as it arrives"""
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp)
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                async for chunk in chunks:
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    await asyncio.to_thread(tmp.write, chunk)
+                await asyncio.to_thread(self._flush, tmp)
+            digest = hasher.hexdigest()
+            await asyncio.to_thread(self._store, Path(tmp_path), key, digest, size)
+        except BaseException:
+            self._discard(Path(tmp_path))
+            raise
+        return self._blob_path(digest).as_uri()
+
+    async def download(self, key: str) -> bytes:
+        """Download whole file content"""
+        return await asyncio.to_thread(self._download_sync, key)
+
+    async def download_stream(self, key: str, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream file content in chunks, never holding the whole file in memory"""
+        chunk_size = chunk_size or self.chunk_size
+        blob, size = await asyncio.to_thread(self._open, key)
+
+        with blob:
+            if size >= self.mmap_threshold:
+                with self._mmap(blob) as view:
+                    for start in range(0, size, chunk_size):
+                        # Slicing an mmap copies only this chunk - but faults the pages in from
+                        # disk, so it runs off the event loop
+                        yield await _read_in_thread(view.__getitem__, slice(start, start + chunk_size))
+                return
+
+            while True:
+                chunk = await asyncio.to_thread(blob.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    async def delete(self, key: str) -> None:
+        """Remove key; the blob goes when its last reference does"""
+        await asyncio.to_thread(self._delete_sync, key)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._key_path(key).exists)
+
+    async def get_url(self, key: str, expires_in: int = 3600) -> str:
+        """Local files have no expiry - return a file:// URL to the blob"""
+        path, _ = await asyncio.to_thread(self._resolve, key)
+        return path.as_uri()
+
+    # ==================== Local-only helpers ====================
+
+    @contextmanager
+    def open_blob(self, key: str) -> Iterator[mmap.mmap]:
+        """Read-only memory map of the content - zero-copy for parsers that accept file objects"""
+        blob, _ = self._open(key)
+        with blob, self._mmap(blob) as view:
+            yield view
+
+    def blob_path(self, key: str) -> Path:
+        """Filesystem path of the content behind key"""
+        return self._resolve(key)[0]
+
+    def get_digest(self, key: str) -> str:
+        return self._read_key(key)["digest"]
+
+    # ==================== Internals ====================
+
+    def _upload_sync(self, key: str, content: bytes) -> str:
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp)
+        hasher = hashlib.sha256()
+        view = memoryview(content)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for start in range(0, len(view), self.chunk_size):
+                    chunk = view[start:start + self.chunk_size]
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+                self._flush(tmp)
+            digest = hasher.hexdigest()
+            self._store(Path(tmp_path), key, digest, len(content))
+        except BaseException:
+            self._discard(Path(tmp_path))
+            raise
+        return self._blob_path(digest).as_uri()
+
+    def _download_sync(self, key: str) -> bytes:
+        blob, size = self._open(key)
+        with blob:
+            if size >= self.mmap_threshold:
+                with self._mmap(blob) as view:
+                    return view[:]
+            return blob.read()
+
+    def _delete_sync(self, key: str) -> None:
+        key_path = self._key_path(key)
+        with self._lock:
+            try:
+                record = json.loads(key_path.read_text())
+            except FileNotFoundError:
+                return
+            key_path.unlink()
+            self._decref(record["digest"])
+
+    def _store(self, tmp_path: Path, key: str, digest: str, size: int) -> None:
+        """
+        Move a fully written temp file into the blob store (or drop it if the
+        content is already stored) and point key at it
+        Both steps hold the lock so a concurrent delete can't remove the blob in between
+        """
+        blob_path = self._blob_path(digest)
+        key_path = self._key_path(key)
+        with self._lock:
+            if blob_path.exists():
+                self._discard(tmp_path)
+            else:
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, blob_path)
+
+            previous = None
+            if key_path.exists():
+                previous = json.loads(key_path.read_text())["digest"]
+                if previous == digest:
+                    return
+            self._incref(digest)
+            self._atomic_write(key_path, json.dumps({"key": key, "digest": digest, "size": size}))
+            if previous is not None:
+                self._decref(previous)
+
+    def _incref(self, digest: str) -> None:
+        self._write_refs(digest, self._read_refs(digest) + 1)
+
+    def _decref(self, digest: str) -> None:
+        refs = self._read_refs(digest) - 1
+        if refs > 0:
+            self._write_refs(digest, refs)
+            return
+        self._discard(self._blob_path(digest))
+        self._discard(self._refs_path(digest))
+
+    def _read_refs(self, digest: str) -> int:
+        try:
+            return int(self._refs_path(digest).read_text())
+        except FileNotFoundError:
+            return 0
+
+    def _write_refs(self, digest: str, refs: int) -> None:
+        self._atomic_write(self._refs_path(digest), str(refs))
+
+    def _atomic_write(self, path: Path, text: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp)
+        with os.fdopen(fd, "w") as tmp:
+            tmp.write(text)
+            self._flush(tmp)
+        os.replace(tmp_path, path)
+
+    def _flush(self, fileobj) -> None:
+        fileobj.flush()
+        if self.fsync:
+            os.fsync(fileobj.fileno())
+
+    def _read_key(self, key: str) -> dict:
+        try:
+            return json.loads(self._key_path(key).read_text())
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No file stored under key {key}") from None
+
+    def _resolve(self, key: str) -> Tuple[Path, int]:
+        # Under the lock, so the key can't be pointed elsewhere halfway through
+        with self._lock:
+            record = self._read_key(key)
+        return self._blob_path(record["digest"]), record["size"]
+
+    def _open(self, key: str) -> Tuple[BinaryIO, int]:
+        """
+        Open the blob behind key, with the size recorded for it
+        Opened under the lock: a concurrent delete can't remove the blob between
+        reading the key and opening it, and an open file outlives a later unlink.
+        """
+        with self._lock:
+            record = self._read_key(key)
+            return open(self._blob_path(record["digest"]), "rb"), record["size"]
+
+    @contextmanager
+    def _mmap(self, blob: BinaryIO) -> Iterator[mmap.mmap]:
+        if os.fstat(blob.fileno()).st_size == 0:
+            # mmap cannot map an empty file
+            yield b""
+            return
+        view = mmap.mmap(blob.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield view
+        finally:
+            view.close()
+
+    def _blob_path(self, digest: str) -> Path:
+        return self._blobs / digest[:2] / digest
+
+    def _refs_path(self, digest: str) -> Path:
+        return self._blobs / digest[:2] / f"{digest}.refs"
+
+    def _key_path(self, key: str) -> Path:
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self._keys / name[:2] / name
+
+    @staticmethod
+    def _discard(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+async def _read_in_thread(fn, *args):
+    """
+    Run a read in a thread; when cancelled, wait for it before re-raising
+    The caller then closes the mmap - never while a thread is still reading it.
+    """
+    read = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+    try:
+        return await asyncio.shield(read)
+    except asyncio.CancelledError:
+        await asyncio.wait([read])
+        raise
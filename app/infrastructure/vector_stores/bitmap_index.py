@@ -0,0 +1,380 @@
+# app/infrastructure/vector_stores/bitmap_index.py
+"""
+Compressed bitmap indexes over vector metadata
+
+A Bitmap is a set of row numbers stored roaring-style: rows are grouped
+by their high 16 bits, and each group of up to 65536 rows is either a
+sorted uint16 array (sparse, at most 4096 rows) or an 8 KiB bitset
+(dense). Selective values cost a few bytes per row, common ones a fixed
+8 KiB per 65536 rows, and AND / OR / AND-NOT run container by container.
+
+MetadataIndex keeps one Bitmap per (field, value) and resolves a filter
+to the sorted rows that match it, before any similarity is computed.
+
+Filter syntax (Pinecone-compatible subset):
+    {"document_id": "a"}                        equality
+    {"document_id": {"$eq": "a"}}               equality
+    {"filename": {"$in": ["a.pdf", "b.pdf"]}}   any of
+    {"filename": {"$ne": "a.pdf"}}              not equal (or missing)
+    {"chunk_index": {"$nin": [0, 1]}}           none of (or missing)
+    {"$and": [f1, f2]}, {"$or": [f1, f2]}       boolean combinations
+Several keys in one dict are ANDed. Fields that are not indexed are
+checked row by row, but only on the rows the indexed clauses left.
+"""
+from collections.abc import Hashable
+from typing import Callable, Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+_CHUNK_ROWS = 1 << 16
+_ARRAY_MAX = 4096  # Above this many rows a bitset (8 KiB) is smaller than an array
+
+_OPERATORS = ("$eq", "$ne", "$in", "$nin")
+_MISSING = object()
+
+
+# ==================== Containers ====================
+# Array container: sorted unique uint16. Bitset container: uint8[8192], little bit order.
+
+def _is_bitset(container: np.ndarray) -> bool:
+    return container.dtype == np.uint8
+
+
+def _to_bitset(container: np.ndarray) -> np.ndarray:
+    if _is_bitset(container):
+        return container
+    flags = np.zeros(_CHUNK_ROWS, dtype=bool)
+    flags[container] = True
+    return np.packbits(flags, bitorder="little")
+
+
+def _to_array(container: np.ndarray) -> np.ndarray:
+    if not _is_bitset(container):
+        return container
+    return np.flatnonzero(np.unpackbits(container, bitorder="little")).astype(np.uint16)
+
+
+def _cardinality(container: np.ndarray) -> int:
+    if _is_bitset(container):
+        return int(np.unpackbits(container).sum())
+    return container.shape[0]
+
+
+def _compact(container: np.ndarray) -> Optional[np.ndarray]:
+    """Smallest representation - None when empty"""
+    count = _cardinality(container)
+    if count == 0:
+        return None
+    if _is_bitset(container) and count <= _ARRAY_MAX:
+        return _to_array(container)
+    return container
+
+
+def _and(a: np.ndarray, b: np.ndarray) -> Optional[np.ndarray]:
+    if _is_bitset(a) and _is_bitset(b):
+        return _compact(a & b)
+    if _is_bitset(a):
+        a, b = b, a
+    if _is_bitset(b):
+        # Array probing a bitset: test each row's bit
+        bits = np.unpackbits(b, bitorder="little")
+        result = a[bits[a].astype(bool)]
+    else:
+        result = np.intersect1d(a, b, assume_unique=True)
+    return result if result.shape[0] else None
+
+
+def _or(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if not _is_bitset(a) and not _is_bitset(b) and a.shape[0] + b.shape[0] <= _ARRAY_MAX:
+        return np.union1d(a, b).astype(np.uint16)
+    return _compact(_to_bitset(a) | _to_bitset(b))
+
+
+def _and_not(a: np.ndarray, b: np.ndarray) -> Optional[np.ndarray]:
+    if _is_bitset(a):
+        return _compact(a & ~_to_bitset(b))
+    if _is_bitset(b):
+        bits = np.unpackbits(b, bitorder="little")
+        result = a[~bits[a].astype(bool)]
+    else:
+        result = np.setdiff1d(a, b, assume_unique=True)
+    return result if result.shape[0] else None
+
+
+class Bitmap:
+    """Compressed set of non-negative row numbers"""
+    __slots__ = ("_containers",)
+
+    def __init__(self, containers: Optional[Dict[int, np.ndarray]] = None):
+        self._containers: Dict[int, np.ndarray] = containers or {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[int]) -> "Bitmap":
+        rows = np.unique(np.fromiter(rows, dtype=np.int64))
+        containers = {}
+        if rows.shape[0]:
+            keys = rows >> 16
+            splits = np.flatnonzero(np.diff(keys)) + 1
+            for chunk in np.split(rows, splits):
+                container = (chunk & 0xFFFF).astype(np.uint16)
+                containers[int(chunk[0] >> 16)] = _to_bitset(container) if container.shape[0] > _ARRAY_MAX else container
+        return cls(containers)
+
+    @classmethod
+    def full(cls, size: int) -> "Bitmap":
+        """Rows 0 .. size - 1"""
+        containers = {}
+        for key in range((size + _CHUNK_ROWS - 1) // _CHUNK_ROWS):
+            count = min(_CHUNK_ROWS, size - key * _CHUNK_ROWS)
+            containers[key] = _compact(_to_bitset(np.arange(count, dtype=np.uint16)))
+        return cls(containers)
+
+    @classmethod
+    def union(cls, bitmaps: Iterable["Bitmap"]) -> "Bitmap":
+        """OR of many bitmaps in one pass per container - for wide $in / $or"""
+        grouped: Dict[int, List[np.ndarray]] = {}
+        for bitmap in bitmaps:
+            for key, container in bitmap._containers.items():
+                grouped.setdefault(key, []).append(container)
+        containers = {}
+        for key, parts in grouped.items():
+            if len(parts) == 1:
+                container = parts[0].copy()
+            elif not any(_is_bitset(part) for part in parts) and sum(part.shape[0] for part in parts) <= _ARRAY_MAX:
+                container = np.unique(np.concatenate(parts))
+            else:
+                flags = np.zeros(_CHUNK_ROWS, dtype=bool)
+                for part in parts:
+                    if _is_bitset(part):
+                        flags |= np.unpackbits(part, bitorder="little").astype(bool)
+                    else:
+                        flags[part] = True
+                container = _compact(np.packbits(flags, bitorder="little"))
+            if container is not None:
+                containers[key] = container
+        return cls(containers)
+
+    def add(self, row: int) -> None:
+        key, low = row >> 16, row & 0xFFFF
+        container = self._containers.get(key)
+        if container is None:
+            self._containers[key] = np.array([low], dtype=np.uint16)
+        elif _is_bitset(container):
+            container[low >> 3] |= np.uint8(1 << (low & 7))
+        else:
+            position = int(np.searchsorted(container, low))
+            if position < container.shape[0] and container[position] == low:
+                return
+            container = np.insert(container, position, np.uint16(low))
+            self._containers[key] = _to_bitset(container) if container.shape[0] > _ARRAY_MAX else container
+
+    def remove(self, row: int) -> None:
+        key, low = row >> 16, row & 0xFFFF
+        container = self._containers.get(key)
+        if container is None:
+            return
+        if _is_bitset(container):
+            # Stays a bitset until the next set operation compacts it
+            container[low >> 3] &= np.uint8(~(1 << (low & 7)) & 0xFF)
+            return
+        position = int(np.searchsorted(container, low))
+        if position < container.shape[0] and container[position] == low:
+            container = np.delete(container, position)
+            if container.shape[0]:
+                self._containers[key] = container
+            else:
+                del self._containers[key]
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        containers = {}
+        for key in self._containers.keys() & other._containers.keys():
+            container = _and(self._containers[key], other._containers[key])
+            if container is not None:
+                containers[key] = container
+        return Bitmap(containers)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        containers = dict(self._containers)
+        for key, container in other._containers.items():
+            mine = containers.get(key)
+            merged = container.copy() if mine is None else _or(mine, container)
+            if merged is not None:
+                containers[key] = merged
+        return Bitmap(containers)
+
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        containers = {}
+        for key, container in self._containers.items():
+            theirs = other._containers.get(key)
+            result = container if theirs is None else _and_not(container, theirs)
+            if result is not None:
+                containers[key] = result
+        return Bitmap(containers)
+
+    def __len__(self) -> int:
+        return sum(_cardinality(container) for container in self._containers.values())
+
+    def __bool__(self) -> bool:
+        return any(_cardinality(container) for container in self._containers.values())
+
+    def to_array(self) -> np.ndarray:
+        """Sorted rows as int64"""
+        parts = [
+            (key << 16) + _to_array(self._containers[key]).astype(np.int64)
+            for key in sorted(self._containers)
+        ]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(container.nbytes for container in self._containers.values())
+
+
+# ==================== Filters ====================
+
+def _condition(condition) -> Tuple[str, object]:
+    """Normalise a field condition to (operator, operand)"""
+    if isinstance(condition, dict):
+        if len(condition) != 1:
+            raise ValueError(f"Expected one operator per field condition, got {list(condition)}")
+        operator, operand = next(iter(condition.items()))
+        if operator not in _OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+        if operator in ("$in", "$nin") and not isinstance(operand, (list, tuple, set)):
+            raise ValueError(f"{operator} needs a list of values")
+        return operator, operand
+    return "$eq", condition
+
+
+def compile_filter(filter: Dict) -> Callable[[Dict], bool]:
+    """Metadata predicate for a filter - the row-by-row fallback"""
+    clauses: List[Callable[[Dict], bool]] = []
+    for key, condition in filter.items():
+        if key in ("$and", "$or"):
+            predicates = [compile_filter(sub) for sub in condition]
+            combine = all if key == "$and" else any
+            clauses.append(lambda metadata, p=predicates, c=combine: c(pred(metadata) for pred in p))
+            continue
+        operator, operand = _condition(condition)
+        if operator == "$eq":
+            test = lambda value, o=operand: value == o
+        elif operator == "$ne":
+            test = lambda value, o=operand: value != o
+        elif operator == "$in":
+            test = lambda value, o=_lookup(operand): _contains(o, value)
+        else:
+            test = lambda value, o=_lookup(operand): not _contains(o, value)
+        clauses.append(lambda metadata, k=key, t=test: t(metadata.get(k, _MISSING)))
+    return lambda metadata: all(clause(metadata) for clause in clauses)
+
+
+def _hashable(value) -> bool:
+    return isinstance(value, Hashable)
+
+
+def _lookup(operand) -> Collection:
+    """A set when every value is hashable, so membership is O(1) per row"""
+    values = list(operand)
+    return set(values) if all(_hashable(value) for value in values) else values
+
+
+def _contains(values: Collection, value) -> bool:
+    if isinstance(values, set) and not _hashable(value):
+        return False
+    return value in values
+
+
+class MetadataIndex:
+    """One Bitmap per (field, value) for the indexed metadata fields of a partition"""
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = frozenset(fields)
+        self._bitmaps: Dict[str, Dict[object, Bitmap]] = {field: {} for field in self.fields}
+
+    @classmethod
+    def build(cls, fields: Sequence[str], metadata: Sequence[Dict]) -> "MetadataIndex":
+        """Bulk build - one bitmap construction per value instead of per row"""
+        index = cls(fields)
+        for field in index.fields:
+            groups: Dict[object, List[int]] = {}
+            for row, entry in enumerate(metadata):
+                value = entry.get(field, _MISSING)
+                if value is not _MISSING and _hashable(value):
+                    groups.setdefault(value, []).append(row)
+            index._bitmaps[field] = {value: Bitmap.from_rows(rows) for value, rows in groups.items()}
+        return index
+
+    def add(self, row: int, metadata: Dict) -> None:
+        for field in self.fields:
+            value = metadata.get(field, _MISSING)
+            if value is not _MISSING and _hashable(value):
+                bitmap = self._bitmaps[field].get(value)
+                if bitmap is None:
+                    bitmap = self._bitmaps[field][value] = Bitmap()
+                bitmap.add(row)
+
+    def remove(self, row: int, metadata: Dict) -> None:
+        for field in self.fields:
+            value = metadata.get(field, _MISSING)
+            if value is not _MISSING and _hashable(value):
+                bitmap = self._bitmaps[field].get(value)
+                if bitmap is not None:
+                    bitmap.remove(row)
+                    if not bitmap:
+                        del self._bitmaps[field][value]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(bitmap.nbytes for values in self._bitmaps.values() for bitmap in values.values())
+
+    def resolve(self, filter: Dict, size: int, metadata: Sequence[Dict]) -> np.ndarray:
+        """Sorted rows in [0, size) matching the filter"""
+        return self._resolve(filter, size, metadata).to_array()
+
+    def _resolve(self, filter: Dict, size: int, metadata: Sequence[Dict]) -> Bitmap:
+        indexed = [(key, condition) for key, condition in filter.items() if self._indexable(key, condition)]
+        residual = {key: condition for key, condition in filter.items() if not self._indexable(key, condition)}
+
+        result: Optional[Bitmap] = None
+        for key, condition in indexed:
+            bitmap = self._clause(key, condition, size, metadata)
+            result = bitmap if result is None else result & bitmap
+            if not result:
+                return result
+
+        if residual:
+            # Only rows the indexed clauses kept are checked one by one
+            predicate = compile_filter(residual)
+            rows = result.to_array() if result is not None else range(size)
+            result = Bitmap.from_rows(row for row in rows if predicate(metadata[row]))
+        return result if result is not None else Bitmap.full(size)
+
+    def _indexable(self, key: str, condition) -> bool:
+        if key in ("$and", "$or"):
+            return all(self._indexable(k, c) for sub in condition for k, c in sub.items())
+        if key not in self.fields:
+            return False
+        operator, operand = _condition(condition)
+        values = operand if operator in ("$in", "$nin") else [operand]
+        return all(_hashable(value) for value in values)
+
+    def _clause(self, key: str, condition, size: int, metadata: Sequence[Dict]) -> Bitmap:
+        if key == "$and":
+            result = None
+            for sub in condition:
+                bitmap = self._resolve(sub, size, metadata)
+                result = bitmap if result is None else result & bitmap
+            return result if result is not None else Bitmap.full(size)
+        if key == "$or":
+            return Bitmap.union(self._resolve(sub, size, metadata) for sub in condition)
+
+        operator, operand = _condition(condition)
+        values = self._bitmaps[key]
+        if operator in ("$eq", "$ne"):
+            matched = values.get(operand, Bitmap())
+        else:
+            matched = Bitmap.union(values[value] for value in set(operand) if value in values)
+        if operator in ("$ne", "$nin"):
+            return Bitmap.full(size) - matched
+        return matched
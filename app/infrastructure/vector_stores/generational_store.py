@@ -0,0 +1,221 @@
+# app/infrastructure/vector_stores/generational_store.py
+"""
+Index generations for zero-downtime re-embedding
+
+Every generation is a complete vector index built with one embedding
+model (and vector store provider). A small JSON pointer file, replaced
+atomically, says which generation is active, which one a migration is
+building and which one was active before the last swap.
+
+Routing is by the embedding's model tag:
+- writes go to every generation built for that model, so documents
+  uploaded while a migration runs land in the old index and - once
+  workers run the new model - in the new one
+- reads go to the active generation, or to the previous one for
+  queries still embedded with the old model (workers not yet restarted)
+- the generation being built is never read
+
+Processes sharing the pointer file pick up a swap within `reload_interval`.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.application.interfaces.vector_store import IvectorStore
+from app.domain.entities.embedding import Embedding
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Generation:
+    name: str
+    model: Optional[str] = None  # None - built before generations were tracked, accepts any model
+    provider: Optional[str] = None  # None - the configured VECTOR_STORE_PROVIDER
+
+
+@dataclass(frozen=True)
+class GenerationPointer:
+    active: Generation
+    building: Optional[Generation] = None
+    previous: Optional[Generation] = None
+
+    def generations(self) -> List[Generation]:
+        return [g for g in (self.active, self.building, self.previous) if g is not None]
+
+    def to_dict(self) -> Dict:
+        return {
+            "active": asdict(self.active),
+            "building": asdict(self.building) if self.building else None,
+            "previous": asdict(self.previous) if self.previous else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "GenerationPointer":
+        return cls(
+            active=Generation(**data["active"]),
+            building=Generation(**data["building"]) if data.get("building") else None,
+            previous=Generation(**data["previous"]) if data.get("previous") else None,
+        )
+
+
+class GenerationalVectorStore(IvectorStore):
+    """Routes IvectorStore calls to index generations named by a pointer file"""
+
+    def __init__(
+        self,
+        pointer_path: str,
+        open_generation: Callable[[Generation], IvectorStore],
+        initial_generation: str = "g0",
+        reload_interval: float = 1.0,
+    ):
+        """open_generation: builds the store for a generation - called once per generation"""
+        self.pointer_path = pointer_path
+        self.open_generation = open_generation
+        self.reload_interval = reload_interval
+        self._stores: Dict[str, IvectorStore] = {}
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._mtime: Optional[float] = None
+        self._pointer = GenerationPointer(active=Generation(initial_generation))
+        self._reload(force=True)
+
+    # ==================== Pointer ====================
+
+    @property
+    def pointer(self) -> GenerationPointer:
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_interval:
+            self._checked_at = now
+            self._reload()
+        return self._pointer
+
+    def _reload(self, force: bool = False) -> None:
+        try:
+            mtime = os.stat(self.pointer_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if not force and mtime == self._mtime:
+            return
+        with open(self.pointer_path) as file:
+            self._pointer = GenerationPointer.from_dict(json.load(file))
+        self._mtime = mtime
+
+    def _write(self, pointer: GenerationPointer) -> None:
+        # Write-then-rename: readers see the old pointer or the new one, never half of one
+        directory = os.path.dirname(os.path.abspath(self.pointer_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.pointer_path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(pointer.to_dict(), file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.pointer_path)
+        self._pointer = pointer
+        self._mtime = os.stat(self.pointer_path).st_mtime_ns
+
+    def begin(self, name: str, model: str, provider: Optional[str] = None,
+              source_model: Optional[str] = None) -> Generation:
+        """
+        Start building generation `name` for `model` - resumes if it is already being built
+        source_model tags an untracked active generation, so writes can be told apart.
+        """
+        with self._lock:
+            self._reload(force=True)
+            pointer = self._pointer
+            if pointer.building is not None:
+                if pointer.building.name != name:
+                    raise ValueError(f"Generation {pointer.building.name} is already being built")
+                return pointer.building
+            if name in {g.name for g in pointer.generations()}:
+                raise ValueError(f"Generation {name} already exists")
+            active = pointer.active
+            if active.model is None and source_model is not None:
+                active = Generation(active.name, source_model, active.provider)
+            if active.model == model:
+                raise ValueError(f"Active generation {active.name} already uses {model}")
+            building = Generation(name, model, provider)
+            self._write(GenerationPointer(active=active, building=building, previous=pointer.previous))
+            logger.info("Building index generation %s for %s", name, model)
+            return building
+
+    def promote(self, name: str) -> None:
+        """Atomic swap - the finished generation becomes active, the old one previous"""
+        with self._lock:
+            self._reload(force=True)
+            pointer = self._pointer
+            if pointer.building is None or pointer.building.name != name:
+                raise ValueError(f"Generation {name} is not being built")
+            self._write(GenerationPointer(active=pointer.building, previous=pointer.active))
+            logger.info("Index generation %s is now active (previous: %s)", name, pointer.active.name)
+
+    def abort(self, name: str) -> None:
+        """Stop routing writes to an unfinished generation - its data is left in place"""
+        with self._lock:
+            self._reload(force=True)
+            pointer = self._pointer
+            if pointer.building is None or pointer.building.name != name:
+                raise ValueError(f"Generation {name} is not being built")
+            self._write(GenerationPointer(active=pointer.active, previous=pointer.previous))
+
+    def retire_previous(self) -> Optional[Generation]:
+        """Stop serving the previous generation, once every worker runs the new model"""
+        with self._lock:
+            self._reload(force=True)
+            pointer = self._pointer
+            self._write(GenerationPointer(active=pointer.active, building=pointer.building))
+            if pointer.previous is not None:
+                self._stores.pop(pointer.previous.name, None)
+            return pointer.previous
+
+    def store_for(self, generation: Generation) -> IvectorStore:
+        store = self._stores.get(generation.name)
+        if store is None:
+            with self._lock:
+                store = self._stores.get(generation.name)
+                if store is None:
+                    store = self._stores[generation.name] = self.open_generation(generation)
+        return store
+
+    # ==================== Routing ====================
+
+    def _write_targets(self, model: str) -> List[Generation]:
+        generations = self.pointer.generations()
+        claimed = [g for g in generations if g.model == model]
+        return claimed or [g for g in generations if g.model is None] or [self._pointer.active]
+
+    def _read_target(self, model: str) -> Generation:
+        pointer = self.pointer
+        readable = [g for g in (pointer.active, pointer.previous) if g is not None]
+        for generation in readable:
+            if generation.model == model:
+                return generation
+        # An untracked generation is the best guess for a model no generation claims
+        for generation in readable:
+            if generation.model is None:
+                return generation
+        return pointer.active
+
+    async def upsert(self, id: str, embedding: Embedding, metadata: Dict) -> None:
+        for generation in self._write_targets(embedding.model):
+            await self.store_for(generation).upsert(id=id, embedding=embedding, metadata=metadata)
+
+    async def upsert_batch(self, items: List[Tuple[str, Embedding, Dict]]) -> None:
+        by_model: Dict[str, List[Tuple[str, Embedding, Dict]]] = {}
+        for item in items:
+            by_model.setdefault(item[1].model, []).append(item)
+        for model, model_items in by_model.items():
+            for generation in self._write_targets(model):
+                await self.store_for(generation).upsert_batch(model_items)
+
+    async def search(self, query_embedding: Embedding, top_k: int = 5, filter: Dict = {}) -> List[Dict]:
+        store = self.store_for(self._read_target(query_embedding.model))
+        return await store.search(query_embedding, top_k=top_k, filter=filter)
+
+    async def delete(self, id: str) -> None:
+        for generation in self.pointer.generations():
+            await self.store_for(generation).delete(id)
@@ -0,0 +1,542 @@
+# app/infrastructure/vector_stores/local_adapter.py
+import asyncio
+import hashlib
+import io
+import json
+import os
+import struct
+import tempfile
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.application.interfaces.vector_store import IvectorStore
+from app.core.metrics import PipelineMetrics, get_metrics
+from app.core.request_context import current_user_id
+from app.domain.entities.embedding import Embedding
+from app.infrastructure.vector_stores.bitmap_index import MetadataIndex, compile_filter
+from app.infrastructure.vector_stores.sharded_search import SharedMatrix, ShardedSearcher
+
+
+# Partition key used for vectors upserted without a user_id
+SHARED_PARTITION = "__shared__"
+
+# WAL record: op, id length, dimension, metadata length
+_WAL_RECORD = struct.Struct("<BHII")
+_OP_UPSERT = 1
+_OP_DELETE = 2
+# Per-row overhead of the id string and metadata dict, on top of the text
+_ROW_OVERHEAD_BYTES = 400
+
+
+class _Partition:
+    """
+    All vectors of one tenant
+    Rows are kept dense: deleting a row moves the last row into its slot.
+    `index` holds bitmaps of the rows per value of each indexed metadata field.
+    Writes, their WAL records and snapshots happen under `lock`; an evicted
+    partition is `closed` and writers holding it load it again instead.
+    """
+
+    def __init__(self, key: str, dimension: Optional[int] = None, indexed_fields: Sequence[str] = ()):
+        self.key = key
+        self.dimension = dimension
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.metadata: List[Dict] = []
+        self.index = MetadataIndex(indexed_fields)
+        self.size = 0
+        self._matrix = np.empty((0, dimension or 0), dtype=np.float32)
+        self._metadata_bytes = 0
+        self.last_access = time.monotonic()
+        self.wal_bytes = 0
+        # Bumped by every write - a search that awaited across a write is stale
+        self.version = 0
+        self.shared: Optional[SharedMatrix] = None
+        self._release_shared: Optional[weakref.finalize] = None
+        self.lock = asyncio.Lock()
+        self.closed = False
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._matrix[:self.size]
+
+    @property
+    def nbytes(self) -> int:
+        return (self._matrix.nbytes + self._metadata_bytes + self.index.nbytes
+                + self.size * _ROW_OVERHEAD_BYTES)
+
+    def upsert(self, id: str, vector: np.ndarray, metadata: Dict) -> None:
+        if self.dimension is None:
+            self.dimension = vector.shape[0]
+            self._matrix = np.empty((0, self.dimension), dtype=np.float32)
+        elif vector.shape[0] != self.dimension:
+            raise ValueError(
+                f"Vector dimension {vector.shape[0]} does not match partition dimension {self.dimension}"
+            )
+
+        row = self.rows.get(id)
+        if row is None:
+            row = self.size
+            self._ensure_capacity(row + 1)
+            self.rows[id] = row
+            self.ids.append(id)
+            self.metadata.append(metadata)
+            self.size += 1
+        else:
+            self._metadata_bytes -= _metadata_size(self.metadata[row])
+            self.index.remove(row, self.metadata[row])
+            self.metadata[row] = metadata
+        self.index.add(row, metadata)
+        self._matrix[row] = vector
+        self._metadata_bytes += _metadata_size(metadata)
+        self.version += 1
+
+    def delete(self, id: str) -> bool:
+        row = self.rows.pop(id, None)
+        if row is None:
+            return False
+        self._metadata_bytes -= _metadata_size(self.metadata[row])
+        self.index.remove(row, self.metadata[row])
+        last = self.size - 1
+        if row != last:
+            # Move the last row into the hole
+            self.index.remove(last, self.metadata[last])
+            self.index.add(row, self.metadata[last])
+            self._matrix[row] = self._matrix[last]
+            self.ids[row] = self.ids[last]
+            self.metadata[row] = self.metadata[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+        self.metadata.pop()
+        self.size -= 1
+        self.version += 1
+        return True
+
+    def search(self, query: np.ndarray, top_k: int,
+               filter: Optional[Dict] = None) -> List[Tuple[int, float]]:
+        """Top-k (row, cosine score) - vectors and query are unit length"""
+        if self.size == 0 or top_k <= 0:
+            return []
+        if not filter:
+            scores = self.vectors @ query
+            candidates = None
+        else:
+            # Only the rows the filter leaves are scored
+            candidates = self.candidates(filter)
+            if candidates.size == 0:
+                return []
+            if candidates.size * 4 < self.size:
+                scores = self.vectors[candidates] @ query
+            else:
+                # Gathering most rows costs more than scoring all of them in place
+                scores = (self.vectors @ query)[candidates]
+
+        k = min(top_k, scores.shape[0])
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        rows = best if candidates is None else candidates[best]
+        return [(int(row), float(score)) for row, score in zip(rows, scores[best])]
+
+    def candidates(self, filter: Dict) -> np.ndarray:
+        """Sorted rows whose metadata passes the filter"""
+        return self.index.resolve(filter, self.size, self.metadata)
+
+    def share(self) -> None:
+        """Move the matrix into shared memory, where search worker processes can map it"""
+        if self.shared is None:
+            self._move_to_shared(max(self._matrix.shape[0], 64))
+
+    def _move_to_shared(self, capacity: int) -> None:
+        matrix = SharedMatrix(capacity, self.dimension)
+        matrix.array[:self.size] = self._matrix[:self.size]
+        self._matrix = matrix.array
+        self.shared = matrix
+        if self._release_shared is not None:
+            # Workers that already mapped the old segment finish on it; new searches use the new one
+            self._release_shared()
+        # Unlinked when the partition is garbage - never under a search still holding it
+        self._release_shared = weakref.finalize(self, SharedMatrix.release, matrix)
+
+    def release_shared(self) -> None:
+        if self._release_shared is not None:
+            self._matrix = self._matrix[:self.size].copy()
+            self._release_shared()
+            self._release_shared = None
+            self.shared = None
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = self._matrix.shape[0]
+        if rows <= capacity:
+            return
+        # Grow geometrically so appends are amortised O(1)
+        new_capacity = max(rows, 64, int(capacity * 1.5))
+        if self.shared is not None:
+            self._move_to_shared(new_capacity)
+            return
+        grown = np.empty((new_capacity, self.dimension), dtype=np.float32)
+        grown[:self.size] = self._matrix[:self.size]
+        self._matrix = grown
+
+    # ==================== Persistence ====================
+
+    def save(self, path: Path) -> None:
+        """Write a snapshot atomically (single .npz file)"""
+        header = json.dumps({"key": self.key, "dimension": self.dimension, "ids": self.ids,
+                             "metadata": self.metadata}).encode("utf-8")
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp:
+            np.savez(tmp, vectors=self.vectors, header=np.frombuffer(header, dtype=np.uint8))
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, key: str, path: Path, indexed_fields: Sequence[str] = ()) -> "_Partition":
+        with np.load(path) as data:
+            header = json.loads(data["header"].tobytes())
+            vectors = data["vectors"]
+        partition = cls(key, header["dimension"])
+        if header["dimension"] is not None:
+            partition._matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        partition.ids = header["ids"]
+        partition.metadata = header["metadata"]
+        partition.rows = {id: row for row, id in enumerate(partition.ids)}
+        partition.size = len(partition.ids)
+        partition._metadata_bytes = sum(_metadata_size(m) for m in partition.metadata)
+        # Indexes aren't persisted - rebuilding them in bulk is cheap next to the vectors
+        partition.index = MetadataIndex.build(indexed_fields, partition.metadata)
+        return partition
+
+
+def _metadata_size(metadata: Dict) -> int:
+    text = metadata.get("text")
+    return len(text) if isinstance(text, str) else 0
+
+
+def _normalize(vector) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
+
+
+def _encode_wal(op: int, id: str, vector: Optional[np.ndarray] = None, metadata: Optional[Dict] = None) -> bytes:
+    raw_id = id.encode("utf-8")
+    raw_vector = vector.astype(np.float32).tobytes() if vector is not None else b""
+    raw_metadata = json.dumps(metadata, separators=(",", ":")).encode("utf-8") if metadata is not None else b""
+    dimension = vector.shape[0] if vector is not None else 0
+    return _WAL_RECORD.pack(op, len(raw_id), dimension, len(raw_metadata)) + raw_id + raw_vector + raw_metadata
+
+
+def _replay_wal(partition: _Partition, path: Path) -> int:
+    """Apply WAL records to a partition, truncating a torn last record - returns valid bytes"""
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return 0
+    position = 0
+    while position + _WAL_RECORD.size <= len(data):
+        op, id_length, dimension, metadata_length = _WAL_RECORD.unpack_from(data, position)
+        end = position + _WAL_RECORD.size + id_length + dimension * 4 + metadata_length
+        if end > len(data):
+            break
+        cursor = position + _WAL_RECORD.size
+        id = data[cursor:cursor + id_length].decode("utf-8")
+        cursor += id_length
+        if op == _OP_UPSERT:
+            vector = np.frombuffer(data, dtype=np.float32, count=dimension, offset=cursor)
+            cursor += dimension * 4
+            metadata = json.loads(data[cursor:cursor + metadata_length])
+            partition.upsert(id, vector, metadata)
+        elif op == _OP_DELETE:
+            partition.delete(id)
+        position = end
+    if position != len(data):
+        with open(path, "r+b") as wal:
+            wal.truncate(position)
+    return position
+
+
+class LocalVectorStore(IvectorStore):
+    """
+    Embedded vector store partitioned by user_id
+
+    Each tenant's vectors live in their own partition, so a search with
+    filter={"user_id": ...} only ever touches that tenant's matrix.
+    Partitions load lazily and the least recently used ones are written
+    back and dropped when resident memory exceeds `memory_budget_bytes`.
+
+    On disk, per partition directory:
+        snapshot.npz  vectors + ids + metadata
+        wal.log       upserts / deletes since the snapshot
+    Writes append to the WAL; the snapshot is rewritten on eviction or
+    once the WAL grows past `compact_wal_bytes`.
+
+    Metadata filters ($eq, $ne, $in, $nin, $and, $or) are resolved to the
+    matching rows through bitmap indexes over `indexed_fields` before any
+    vector is scored, so a selective filter makes a search cheaper.
+
+    With search_processes > 0, partitions of at least `shard_min_rows`
+    rows (typically the shared corpus) live in shared memory and are
+    searched in shards across that many worker processes, off the event loop.
+    """
+
+    def __init__(self, root: str = "./data/vectors",
+                 memory_budget_bytes: int = 512 * 1024 * 1024,
+                 compact_wal_bytes: int = 64 * 1024 * 1024,
+                 search_processes: int = 0,
+                 shard_min_rows: int = 50_000,
+                 indexed_fields: Sequence[str] = ("document_id", "filename", "chunk_index", "user_id"),
+                 metrics: Optional[PipelineMetrics] = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.memory_budget_bytes = memory_budget_bytes
+        self.compact_wal_bytes = compact_wal_bytes
+        self.indexed_fields = tuple(indexed_fields)
+        self.metrics = metrics or get_metrics()
+        self._resident: "OrderedDict[str, _Partition]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Lock] = {}
+        self._flushing: Dict[str, asyncio.Task] = {}
+        self.shard_min_rows = shard_min_rows
+        self._searcher = ShardedSearcher(search_processes) if search_processes > 0 else None
+
+        registry = self.metrics.registry
+        self._resident_gauge = registry.gauge(
+            "rag_vector_partitions_resident", "Vector partitions held in memory")
+        self._resident_bytes_gauge = registry.gauge(
+            "rag_vector_partitions_resident_bytes", "Estimated memory used by resident vector partitions")
+        self._evictions = registry.counter(
+            "rag_vector_partition_evictions_total", "Vector partitions written back and dropped from memory")
+
+    # ==================== IvectorStore ====================
+
+    async def upsert(self, id: str, embedding: Embedding, metadata: Dict) -> None:
+        await self.upsert_batch([(id, embedding, metadata)])
+
+    async def upsert_batch(self, items: List[Tuple[str, Embedding, Dict]]) -> None:
+        by_partition: Dict[str, List[Tuple[str, np.ndarray, Dict]]] = {}
+        for id, embedding, metadata in items:
+            key = metadata.get("user_id") or SHARED_PARTITION
+            by_partition.setdefault(key, []).append((id, _normalize(embedding.vector), metadata))
+
+        for key, rows in by_partition.items():
+            while True:
+                partition = await self._get_partition(key, create=True)
+                async with partition.lock:
+                    if partition.closed:
+                        # Evicted while we waited - write to the copy loaded back from disk
+                        continue
+                    for id, vector, metadata in rows:
+                        partition.upsert(id, vector, metadata)
+                    self._maybe_share(partition)
+                    wal = b"".join(_encode_wal(_OP_UPSERT, id, vector, metadata) for id, vector, metadata in rows)
+                    await self._append_wal(partition, wal)
+                break
+        await self._evict_if_needed()
+
+    async def search(self, query_embedding: Embedding, top_k: int = 5, filter: Dict = {}) -> List[Dict]:
+        filter = dict(filter or {})
+        user_id = filter.pop("user_id", None)
+        query = _normalize(query_embedding.vector)
+
+        if isinstance(user_id, str):
+            keys = [user_id]
+        elif user_id is None:
+            # No tenant given - every partition has to be searched
+            keys = self._all_keys()
+        else:
+            # A condition on the tenant picks partitions, every row in them has that user_id
+            matches = compile_filter({"user_id": user_id})
+            keys = [key for key in self._all_keys() if matches({"user_id": key})]
+
+        results: List[Dict] = []
+        for key in keys:
+            partition = await self._get_partition(key, create=False)
+            if partition is None:
+                continue
+            if partition.shared is not None:
+                hits = await self._search_sharded(partition, query, top_k, filter)
+            else:
+                hits = partition.search(query, top_k, filter)
+            for row, score in hits:
+                results.append({"id": partition.ids[row], "score": score, "metadata": partition.metadata[row]})
+        await self._evict_if_needed()
+
+        results.sort(key=lambda result: result["score"], reverse=True)
+        return results[:top_k]
+
+    async def delete(self, id: str) -> None:
+        """Delete by id - tries the current user's partition, then resident ones, then the rest"""
+        candidates = []
+        user_id = current_user_id.get()
+        if user_id:
+            candidates.append(user_id)
+        candidates.extend(key for key in list(self._resident) if key not in candidates)
+        candidates.extend(key for key in self._all_keys() if key not in candidates)
+
+        for key in candidates:
+            while True:
+                partition = await self._get_partition(key, create=False)
+                if partition is None:
+                    break
+                async with partition.lock:
+                    if partition.closed:
+                        continue
+                    if partition.delete(id):
+                        await self._append_wal(partition, _encode_wal(_OP_DELETE, id))
+                        return
+                break
+
+    async def _search_sharded(self, partition: _Partition, query: np.ndarray, top_k: int,
+                              filter: Dict) -> List[Tuple[int, float]]:
+        for _ in range(3):
+            version = partition.version
+            candidates = partition.candidates(filter) if filter else None
+            try:
+                hits = await self._searcher.search(partition.shared, partition.size, query, top_k, candidates)
+            except FileNotFoundError:
+                # The matrix grew into a new segment while this search was queued
+                continue
+            except BrokenProcessPool:
+                # A search worker died - the searcher starts a fresh pool for the next call
+                break
+            if partition.version == version:
+                return hits
+        # Writes keep racing the searches, or the pool broke - answer from this process
+        return partition.search(query, top_k, filter)
+
+    def _maybe_share(self, partition: _Partition) -> None:
+        if self._searcher is not None and partition.shared is None and partition.size >= self.shard_min_rows:
+            partition.share()
+
+    # ==================== Maintenance ====================
+
+    async def flush(self) -> None:
+        """Snapshot every resident partition and clear its WAL"""
+        for partition in list(self._resident.values()):
+            async with partition.lock:
+                if partition.wal_bytes and not partition.closed:
+                    await asyncio.to_thread(self._snapshot, partition)
+
+    async def close(self) -> None:
+        await self.flush()
+        for partition in self._resident.values():
+            partition.closed = True
+            partition.release_shared()
+        self._resident.clear()
+        if self._searcher is not None:
+            self._searcher.close()
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(partition.nbytes for partition in self._resident.values())
+
+    # ==================== Partition management ====================
+
+    def _partition_dir(self, key: str) -> Path:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+        return self.root / digest[:2] / digest
+
+    def _all_keys(self) -> List[str]:
+        keys = set(self._resident)
+        for key_file in self.root.glob("*/*/key"):
+            keys.add(key_file.read_text())
+        return sorted(keys)
+
+    async def _get_partition(self, key: str, create: bool) -> Optional[_Partition]:
+        partition = self._resident.get(key)
+        if partition is not None:
+            self._touch(partition)
+            self.metrics.record_cache("vector_partition", hit=True)
+            return partition
+
+        lock = self._loading.setdefault(key, asyncio.Lock())
+        async with lock:
+            partition = self._resident.get(key)
+            if partition is None:
+                # Don't read the files while an eviction is still writing them
+                pending = self._flushing.get(key)
+                if pending is not None:
+                    await pending
+                partition = await asyncio.to_thread(self._load, key, create)
+                if partition is None:
+                    return None
+                self._maybe_share(partition)
+                self.metrics.record_cache("vector_partition", hit=False)
+                self._resident[key] = partition
+        self._loading.pop(key, None)
+        self._touch(partition)
+        return partition
+
+    def _touch(self, partition: _Partition) -> None:
+        partition.last_access = time.monotonic()
+        self._resident.move_to_end(partition.key)
+
+    def _load(self, key: str, create: bool) -> Optional[_Partition]:
+        directory = self._partition_dir(key)
+        snapshot = directory / "snapshot.npz"
+        wal = directory / "wal.log"
+        if not directory.exists():
+            if not create:
+                return None
+            directory.mkdir(parents=True, exist_ok=True)
+            (directory / "key").write_text(key)
+            return _Partition(key, indexed_fields=self.indexed_fields)
+
+        if snapshot.exists():
+            partition = _Partition.load(key, snapshot, self.indexed_fields)
+        else:
+            partition = _Partition(key, indexed_fields=self.indexed_fields)
+        partition.wal_bytes = _replay_wal(partition, wal)
+        return partition
+
+    async def _append_wal(self, partition: _Partition, records: bytes) -> None:
+        """Caller holds partition.lock - the records and any compaction follow its writes in order"""
+        path = self._partition_dir(partition.key) / "wal.log"
+        await asyncio.to_thread(_append_file, path, records)
+        partition.wal_bytes += len(records)
+        if partition.wal_bytes >= self.compact_wal_bytes:
+            await asyncio.to_thread(self._snapshot, partition)
+
+    def _snapshot(self, partition: _Partition) -> None:
+        """Runs in a thread under partition.lock, so no write lands between save and truncate"""
+        directory = self._partition_dir(partition.key)
+        partition.save(directory / "snapshot.npz")
+        # Snapshot is durable, the WAL is now redundant
+        with open(directory / "wal.log", "wb"):
+            pass
+        partition.wal_bytes = 0
+
+    async def _evict_if_needed(self) -> None:
+        resident_bytes = self.resident_bytes
+        while resident_bytes > self.memory_budget_bytes and len(self._resident) > 1:
+            key, partition = self._resident.popitem(last=False)
+            resident_bytes -= partition.nbytes
+            self._evictions.inc()
+            task = asyncio.create_task(self._write_back(partition))
+            self._flushing[key] = task
+            try:
+                await task
+            finally:
+                self._flushing.pop(key, None)
+        self._resident_gauge.set(len(self._resident))
+        self._resident_bytes_gauge.set(resident_bytes)
+
+    async def _write_back(self, partition: _Partition) -> None:
+        # Writes already holding the lock finish first and are in the snapshot;
+        # later ones see `closed` and go to the partition loaded back from disk
+        async with partition.lock:
+            partition.closed = True
+            if partition.wal_bytes:
+                await asyncio.to_thread(self._snapshot, partition)
+
+
+def _append_file(path: Path, data: bytes) -> None:
+    with open(path, "ab") as wal:
+        wal.write(data)
+        wal.flush()
@@ -1,10 +1,10 @@
 # app/infrastructure/vector_stores/pinecone_adapter.py
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from pinecone import Pinecone, ServerlessSpec
-from app.application.interfaces.vector_store import IVectorStore
+from app.application.interfaces.vector_store import IvectorStore
 from app.domain.entities.embedding import Embedding
 
-class PineconeAdapter(IVectorStore):
+class PineconeAdapter(IvectorStore):
     """Pinecone implementation"""
     
     def __init__(self, api_key: str, index_name: str):
@@ -24,6 +24,16 @@ class PineconeAdapter(IVectorStore):
             "values": list(embedding.vector),
             "metadata": metadata
         }])
+
+    async def upsert_batch(
+        self,
+        items: List[Tuple[str, Embedding, Dict]]
+    ) -> None:
+        """One request for the whole batch"""
+        self.index.upsert(vectors=[
+            {"id": id, "values": list(embedding.vector), "metadata": metadata}
+            for id, embedding, metadata in items
+        ])
     
     async def search(
         self,
@@ -0,0 +1,182 @@
+# app/infrastructure/vector_stores/sharded_search.py
+"""
+Multi-core brute-force search over a matrix in shared memory
+
+A large partition keeps its vectors in a SharedMatrix - a float32 matrix
+in a multiprocessing.shared_memory segment - instead of private memory.
+ShardedSearcher splits the rows into one contiguous shard per worker
+process; each worker maps the segment by name (no copy, no pickling of
+vectors), computes its shard's top-k, and the parent merges the per-shard
+results into the global top-k. The event loop only awaits futures.
+"""
+import asyncio
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import FrozenSet, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+# Segments this (parent) process has created and not yet released
+_LIVE_SEGMENTS: Set[str] = set()
+
+
+class SharedMatrix:
+    """Fixed-capacity float32 matrix backed by a shared memory segment"""
+
+    def __init__(self, capacity: int, dimension: int):
+        self.capacity = capacity
+        self.dimension = dimension
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, capacity * dimension * 4))
+        self.array = np.ndarray((capacity, dimension), dtype=np.float32, buffer=self._shm.buf)
+        _LIVE_SEGMENTS.add(self._shm.name)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def release(self) -> None:
+        """Unlink the segment - workers still mapping it keep it alive until they let go"""
+        _LIVE_SEGMENTS.discard(self._shm.name)
+        self.array = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A view is still referenced somewhere; the mapping goes when it is collected
+            pass
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# ==================== Worker process side ====================
+
+# Segments mapped by this worker, most recently used last
+_ATTACHED: "OrderedDict[str, Tuple[shared_memory.SharedMemory, np.ndarray]]" = OrderedDict()
+_MAX_ATTACHED = 16
+
+
+def _detach(name: str) -> None:
+    shm, array = _ATTACHED.pop(name)
+    del array
+    try:
+        shm.close()
+    except BufferError:
+        pass
+
+
+def _attach(name: str, capacity: int, dimension: int, live: FrozenSet[str]) -> np.ndarray:
+    # An unlinked segment's pages are only freed once every mapping closes - drop the
+    # ones the parent has retired (outgrown or evicted) before mapping another
+    for retired in [attached for attached in _ATTACHED if attached not in live]:
+        _detach(retired)
+    entry = _ATTACHED.get(name)
+    if entry is None:
+        shm = shared_memory.SharedMemory(name=name)
+        entry = (shm, np.ndarray((capacity, dimension), dtype=np.float32, buffer=shm.buf))
+        _ATTACHED[name] = entry
+        while len(_ATTACHED) > _MAX_ATTACHED:
+            _detach(next(iter(_ATTACHED)))
+    else:
+        _ATTACHED.move_to_end(name)
+    return entry[1]
+
+
+def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    k = min(k, scores.shape[0])
+    if k == 0:
+        return rows[:0], scores[:0]
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best])]
+    return rows[best], scores[best]
+
+
+def _search_shard(name: str, capacity: int, dimension: int, live: FrozenSet[str],
+                  start: int, end: int, query: np.ndarray, k: int,
+                  candidates: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k (rows, scores) of rows[start:end], or of the given candidate rows"""
+    matrix = _attach(name, capacity, dimension, live)
+    if candidates is None:
+        scores = matrix[start:end] @ query
+        rows = np.arange(start, end, dtype=np.int64)
+    else:
+        scores = matrix[candidates] @ query
+        rows = candidates
+    return _top_k(rows, scores, k)
+
+
+# ==================== Parent side ====================
+
+class ShardedSearcher:
+    """Fans one search out over a pool of worker processes"""
+
+    def __init__(self, processes: int, min_shard_rows: int = 4096):
+        """min_shard_rows: smaller shards aren't worth the inter-process round trip"""
+        self.processes = processes
+        self.min_shard_rows = min_shard_rows
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # Started lazily, so merely constructing a store starts no processes. Spawned rather
+        # than forked: a forked worker would inherit (and pin) the parent's segment mappings
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def search(self, matrix: SharedMatrix, size: int, query: np.ndarray, top_k: int,
+                     candidates: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Global top-k (row, score) over rows [0, size) or over `candidates`
+        Raises BrokenProcessPool if a worker died; the next search gets a new pool.
+        """
+        total = size if candidates is None else candidates.shape[0]
+        if total == 0 or top_k <= 0:
+            return []
+        shards = max(1, min(self.processes, total // self.min_shard_rows))
+        query = np.ascontiguousarray(query, dtype=np.float32)
+        loop = asyncio.get_running_loop()
+
+        bounds = np.linspace(0, total, shards + 1, dtype=np.int64)
+        live = frozenset(_LIVE_SEGMENTS)
+        pool = self.pool
+        futures = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if candidates is None:
+                args = (int(start), int(end), query, top_k, None)
+            else:
+                args = (0, 0, query, top_k, candidates[start:end])
+            futures.append(loop.run_in_executor(
+                pool, _search_shard, matrix.name, matrix.capacity, matrix.dimension, live, *args
+            ))
+        try:
+            results = await asyncio.gather(*futures)
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise
+
+        # Merge: the global top-k is within the union of the per-shard top-ks
+        rows, scores = _top_k(
+            np.concatenate([rows for rows, _ in results]),
+            np.concatenate([scores for _, scores in results]),
+            top_k,
+        )
+        return [(int(row), float(score)) for row, score in zip(rows, scores)]
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        # A killed worker (OOM, segfault) breaks the whole executor - replace it once,
+        # not once per search that was queued on it
+        if self._pool is pool:
+            self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
@@ -0,0 +1,145 @@
+"""
+Retrieval quality vs. embedding dimension
+
+Embeds a synthetic topical corpus once at full width, then for each target
+dimension and reduction method (PCA fitted on the corpus, or truncation)
+reports:
+- recall@k against the full-dimension top-k
+- hit@k of the chunk each query was drawn from
+- index size and brute-force search time per query
+
+Usage:
+    python -m benchmarks.dimension_benchmark --dimensions 384,192,96,48
+    python -m benchmarks.dimension_benchmark --model all-MiniLM-L6-v2   # needs sentence-transformers
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.infrastructure.llm.embedding_projection import PCAProjection, normalize_rows
+from benchmarks.rag_benchmark import _VOCABULARY
+from benchmarks.stand_ins import FakeEmbeddingService
+
+
+@dataclass
+class DimensionBenchmarkConfig:
+    chunks: int = 4000
+    words_per_chunk: int = 120
+    topics: int = 40
+    queries: int = 300
+    words_per_query: int = 12
+    top_k: int = 10
+    embedding_dimension: int = 384
+    dimensions: str = "384,256,192,128,96,64,32"
+    seed: int = 42
+
+
+def _topical_corpus(config: DimensionBenchmarkConfig, rng: random.Random) -> List[str]:
+    """Chunks drawn from a few dozen topics, each with its own word distribution"""
+    vocabulary = _VOCABULARY + [f"term{i}" for i in range(2000)]
+    topics = [rng.sample(vocabulary, 60) for _ in range(config.topics)]
+    chunks = []
+    for _ in range(config.chunks):
+        topic = rng.choice(topics)
+        words = rng.choices(topic, k=config.words_per_chunk // 2) + rng.choices(vocabulary, k=config.words_per_chunk // 2)
+        rng.shuffle(words)
+        chunks.append(" ".join(words))
+    return chunks
+
+
+async def _embed(service, texts: List[str], batch_size: int = 256) -> np.ndarray:
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        batch = await service.create_embeddings_batch(texts[start:start + batch_size])
+        vectors.extend(embedding.vector for embedding in batch)
+    return normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+
+def _top_k(index: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ index.T
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return best
+
+
+def _evaluate(index: np.ndarray, queries: np.ndarray, truth: np.ndarray, sources: np.ndarray, k: int) -> Dict:
+    start = time.perf_counter()
+    found = _top_k(index, queries, k)
+    elapsed = time.perf_counter() - start
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    hits = np.mean([source in f for f, source in zip(found, sources)])
+    return {
+        "dimension": index.shape[1],
+        "recall_at_k": round(float(recall), 4),
+        "hit_at_k": round(float(hits), 4),
+        "index_mb": round(index.nbytes / 1024 / 1024, 3),
+        "search_ms_per_query": round(elapsed / len(queries) * 1000, 4),
+    }
+
+
+async def run_dimension_benchmark(config: DimensionBenchmarkConfig, model: Optional[str] = None) -> Dict:
+    rng = random.Random(config.seed)
+    chunks = _topical_corpus(config, rng)
+    sources = np.asarray(rng.sample(range(len(chunks)), config.queries))
+    queries = [" ".join(rng.sample(chunks[i].split(), config.words_per_query)) for i in sources]
+
+    if model:
+        from app.infrastructure.llm.embedding_sentence_transformers import SentenceTransformerEmbeddingService
+        service = SentenceTransformerEmbeddingService(model)
+    else:
+        service = FakeEmbeddingService(dimension=config.embedding_dimension)
+
+    index = await _embed(service, chunks)
+    query_vectors = await _embed(service, queries)
+    k = config.top_k
+    truth = _top_k(index, query_vectors, k)
+
+    results = {"full": _evaluate(index, query_vectors, truth, sources, k), "pca": [], "truncate": []}
+    for dimension in (int(d) for d in config.dimensions.split(",")):
+        if dimension > index.shape[1]:
+            continue
+        projection = PCAProjection.fit(index, dimension, getattr(service, "model_name", "unknown"))
+        pca = _evaluate(projection.transform(index), projection.transform(query_vectors), truth, sources, k)
+        pca["explained_variance"] = round(projection.explained_variance, 4)
+        results["pca"].append(pca)
+        results["truncate"].append(_evaluate(
+            normalize_rows(index[:, :dimension]), normalize_rows(query_vectors[:, :dimension]), truth, sources, k
+        ))
+    return {"config": asdict(config), "model": getattr(service, "model_name", model), "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Retrieval quality vs. embedding dimension")
+    for name, default in asdict(DimensionBenchmarkConfig()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    parser.add_argument("--model", help="sentence-transformers model instead of the hashing stand-in")
+    parser.add_argument("--output", type=Path, help="Write results JSON to this path")
+    args = parser.parse_args(argv)
+    config = DimensionBenchmarkConfig(**{
+        name: getattr(args, name) for name in asdict(DimensionBenchmarkConfig())
+    })
+    report = asyncio.run(run_dimension_benchmark(config, args.model))
+
+    full = report["results"]["full"]
+    print(f"{report['model']}: full {full['dimension']}d hit@{config.top_k}={full['hit_at_k']:.3f} "
+          f"index={full['index_mb']}MB")
+    print(f"{'method':<9}{'dim':>5}{'recall@k':>10}{'hit@k':>8}{'index MB':>10}{'ms/query':>10}")
+    for method in ("pca", "truncate"):
+        for row in report["results"][method]:
+            print(f"{method:<9}{row['dimension']:>5}{row['recall_at_k']:>10.3f}{row['hit_at_k']:>8.3f}"
+                  f"{row['index_mb']:>10.3f}{row['search_ms_per_query']:>10.4f}")
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
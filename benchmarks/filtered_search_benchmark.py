@@ -0,0 +1,120 @@
+"""
+Local vector store filtered search: bitmap indexes vs. row-by-row filters
+
+Loads one partition whose chunks belong to `documents` documents, then
+searches it scoped to 1, 10, ... of them with document_id {"$in": [...]}.
+Each run is repeated with document_id indexed and unindexed (the filter is
+then checked against every row's metadata), next to an unfiltered search.
+A selective filter should make an indexed search cheaper than no filter.
+
+Usage:
+    python -m benchmarks.filtered_search_benchmark --rows 200000 --scopes 1,10,100,1000
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.metrics import MetricsRegistry, PipelineMetrics
+from app.domain.entities.embedding import Embedding
+from app.infrastructure.vector_stores.local_adapter import LocalVectorStore
+from benchmarks.rag_benchmark import percentile
+
+
+@dataclass
+class FilteredSearchConfig:
+    rows: int = 100_000
+    documents: int = 2000
+    dimension: int = 384
+    queries: int = 200
+    top_k: int = 10
+    scopes: str = "1,10,100,1000"
+    seed: int = 42
+
+
+def _store(root: str, indexed_fields: Sequence[str]) -> LocalVectorStore:
+    return LocalVectorStore(
+        root=root,
+        memory_budget_bytes=8 * 1024 ** 3,
+        indexed_fields=indexed_fields,
+        metrics=PipelineMetrics(MetricsRegistry(), enabled=False),
+    )
+
+
+async def _load_corpus(root: str, config: FilteredSearchConfig, rng: np.random.Generator) -> None:
+    store = _store(root, ())
+    for start in range(0, config.rows, 2000):
+        vectors = rng.standard_normal((min(2000, config.rows - start), config.dimension), dtype=np.float32)
+        await store.upsert_batch([
+            (f"chunk_{start + i}", Embedding(vector=vector, model="bench", text=""),
+             {"document_id": f"doc_{(start + i) % config.documents}", "chunk_index": start + i})
+            for i, vector in enumerate(vectors)
+        ])
+    await store.close()
+
+
+async def _time(store: LocalVectorStore, embeddings: List[Embedding], top_k: int, filter: Dict) -> Dict:
+    latencies: List[float] = []
+    for embedding in embeddings:
+        start = time.perf_counter()
+        await store.search(embedding, top_k=top_k, filter=filter)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+async def run_filtered_search_benchmark(config: FilteredSearchConfig) -> Dict:
+    rng = np.random.default_rng(config.seed)
+    with tempfile.TemporaryDirectory(prefix="filtered-bench-") as root:
+        await _load_corpus(root, config, rng)
+        embeddings = [
+            Embedding(vector=query, model="bench", text="")
+            for query in rng.standard_normal((config.queries, config.dimension), dtype=np.float32)
+        ]
+        indexed = _store(root, ("document_id",))
+        unindexed = _store(root, ())
+        # Load both partitions before anything is timed
+        for store in (indexed, unindexed):
+            await store.search(embeddings[0], top_k=config.top_k)
+
+        unfiltered = await _time(indexed, embeddings, config.top_k, {})
+        runs = []
+        for scope in (int(scope) for scope in config.scopes.split(",")):
+            filter = {"document_id": {"$in": [f"doc_{i}" for i in range(min(scope, config.documents))]}}
+            run = {"documents": scope, "rows": config.rows * min(scope, config.documents) // config.documents}
+            for name, store in (("indexed", indexed), ("unindexed", unindexed)):
+                run[name] = await _time(store, embeddings, config.top_k, filter)
+            run["speedup"] = round(run["unindexed"]["p50_ms"] / run["indexed"]["p50_ms"], 2)
+            runs.append(run)
+        index_bytes = indexed._resident[next(iter(indexed._resident))].index.nbytes
+        await indexed.close()
+        await unindexed.close()
+    return {"config": asdict(config), "unfiltered": unfiltered, "index_bytes": index_bytes, "runs": runs}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Filtered vector search with and without bitmap indexes")
+    for name, default in asdict(FilteredSearchConfig()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    parser.add_argument("--output", type=Path, help="Write results JSON to this path")
+    args = parser.parse_args(argv)
+    config = FilteredSearchConfig(**{name: getattr(args, name) for name in asdict(FilteredSearchConfig())})
+    report = asyncio.run(run_filtered_search_benchmark(config))
+
+    print(json.dumps({key: report[key] for key in ("unfiltered", "index_bytes", "runs")}, indent=2))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
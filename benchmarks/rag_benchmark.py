@@ -0,0 +1,312 @@
+"""
+End-to-end RAG benchmark
+
+Wires DocumentService and ChatService to the local stand-ins and measures:
+- ingestion throughput (pages/s, chunks/s)
+- query latency percentiles (p50/p95/p99) under concurrency
+- peak memory
+- mean latency per pipeline stage
+
+Usage:
+    python -m benchmarks.rag_benchmark --documents 200 --queries 1000 --concurrency 16 \
+        --output bench_results/baseline.json
+    python -m benchmarks.rag_benchmark --compare bench_results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.application.services.chat_service import ChatService
+from app.application.services.document_service import DocumentService
+from app.core.metrics import PipelineMetrics
+from benchmarks.stand_ins import (
+    FakeEmbeddingService,
+    FakeLLMService,
+    InMemoryDocumentRepository,
+    InMemoryStorageService,
+    InMemoryVectorStore,
+    SimulatedLatency,
+)
+
+
+_VOCABULARY = [
+    "invoice", "contract", "policy", "employee", "revenue", "quarter", "report",
+    "customer", "product", "warranty", "shipment", "payment", "compliance",
+    "security", "incident", "budget", "forecast", "vendor", "audit", "training",
+    "benefit", "schedule", "project", "milestone", "risk", "approval", "meeting",
+    "strategy", "market", "pricing", "support", "release", "feature", "roadmap",
+]
+
+
+@dataclass
+class BenchmarkConfig:
+    documents: int = 50
+    pages_per_document: int = 5
+    words_per_page: int = 400
+    users: int = 5
+    queries: int = 200
+    concurrency: int = 8
+    ingest_concurrency: int = 4
+    embedding_dimension: int = 384
+    # Simulated upstream latency in milliseconds
+    llm_latency_ms: float = 0.0
+    embedding_latency_ms: float = 0.0
+    embedding_per_item_ms: float = 0.0
+    vector_latency_ms: float = 0.0
+    storage_latency_ms: float = 0.0
+    repository_latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    seed: int = 42
+
+
+@dataclass
+class BenchmarkResult:
+    config: Dict
+    environment: Dict
+    ingestion: Dict = field(default_factory=dict)
+    queries: Dict = field(default_factory=dict)
+    memory: Dict = field(default_factory=dict)
+    stages: Dict = field(default_factory=dict)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def _latency(config: BenchmarkConfig, base_ms: float, per_item_ms: float = 0.0, seed_offset: int = 0):
+    return SimulatedLatency(
+        base=base_ms / 1000,
+        per_item=per_item_ms / 1000,
+        jitter=config.jitter_ms / 1000,
+        seed=config.seed + seed_offset,
+    )
+
+
+def _generate_document(rng: random.Random, config: BenchmarkConfig) -> str:
+    """Generate a plain text document, pages separated by form feeds"""
+    pages = []
+    for _ in range(config.pages_per_document):
+        words = rng.choices(_VOCABULARY, k=config.words_per_page)
+        pages.append(" ".join(words))
+    return "\f".join(pages)
+
+
+def _environment() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "git_commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def build_services(config: BenchmarkConfig, metrics: Optional[PipelineMetrics] = None):
+    """Wire the real services to the deterministic stand-ins"""
+    metrics = metrics or PipelineMetrics()
+    llm = FakeLLMService(latency=_latency(config, config.llm_latency_ms, seed_offset=1))
+    embeddings = FakeEmbeddingService(
+        dimension=config.embedding_dimension,
+        latency=_latency(config, config.embedding_latency_ms, config.embedding_per_item_ms, seed_offset=2),
+    )
+    vector_store = InMemoryVectorStore(latency=_latency(config, config.vector_latency_ms, seed_offset=3))
+    storage = InMemoryStorageService(latency=_latency(config, config.storage_latency_ms, seed_offset=4))
+    repository = InMemoryDocumentRepository(latency=_latency(config, config.repository_latency_ms, seed_offset=5))
+
+    document_service = DocumentService(
+        document_repo=repository,
+        embedding_service=embeddings,
+        vector_store=vector_store,
+        storage_service=storage,
+        metrics=metrics,
+    )
+    chat_service = ChatService(
+        llm_service=llm,
+        embedding_service=embeddings,
+        vector_store=vector_store,
+        metrics=metrics,
+    )
+    return document_service, chat_service, vector_store
+
+
+async def _bench_ingestion(document_service: DocumentService, vector_store: InMemoryVectorStore,
+                           config: BenchmarkConfig, rng: random.Random) -> Dict:
+    corpus = [
+        (f"user-{i % config.users}", f"doc-{i}.txt", _generate_document(rng, config).encode())
+        for i in range(config.documents)
+    ]
+    total_bytes = sum(len(content) for _, _, content in corpus)
+    semaphore = asyncio.Semaphore(config.ingest_concurrency)
+
+    async def ingest(user_id: str, filename: str, content: bytes) -> float:
+        async with semaphore:
+            start = time.perf_counter()
+            await document_service.process_document(filename=filename, content=content, user_id=user_id)
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(ingest(*item) for item in corpus))
+    elapsed = time.perf_counter() - start
+
+    pages = config.documents * config.pages_per_document
+    chunks = len(vector_store)
+    return {
+        "documents": config.documents,
+        "pages": pages,
+        "chunks": chunks,
+        "bytes": total_bytes,
+        "seconds": elapsed,
+        "documents_per_second": config.documents / elapsed if elapsed else 0.0,
+        "pages_per_second": pages / elapsed if elapsed else 0.0,
+        "chunks_per_second": chunks / elapsed if elapsed else 0.0,
+        "megabytes_per_second": total_bytes / 1e6 / elapsed if elapsed else 0.0,
+        "document_latency_p50_ms": percentile(latencies, 50) * 1000,
+        "document_latency_p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+async def _bench_queries(chat_service: ChatService, config: BenchmarkConfig, rng: random.Random) -> Dict:
+    questions = [
+        (f"user-{rng.randrange(config.users)}", "What does the " + " ".join(rng.sample(_VOCABULARY, 3)) + " say?")
+        for _ in range(config.queries)
+    ]
+    semaphore = asyncio.Semaphore(config.concurrency)
+    errors = 0
+
+    async def ask(user_id: str, question: str) -> Optional[float]:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await chat_service.ask_question(question=question, user_id=user_id)
+            except Exception:
+                errors += 1
+                return None
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(ask(*item) for item in questions))
+    elapsed = time.perf_counter() - start
+    latencies = [r for r in results if r is not None]
+
+    return {
+        "queries": config.queries,
+        "concurrency": config.concurrency,
+        "errors": errors,
+        "seconds": elapsed,
+        "queries_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p95_ms": percentile(latencies, 95) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+        "latency_max_ms": max(latencies, default=0.0) * 1000,
+        "latency_mean_ms": (sum(latencies) / len(latencies) * 1000) if latencies else 0.0,
+    }
+
+
+def _stage_summary(metrics: PipelineMetrics) -> Dict:
+    """Mean latency and call count per pipeline stage"""
+    summary = {}
+    for (pipeline, stage), child in list(metrics.stage_seconds._children.items()):
+        summary[f"{pipeline}.{stage}"] = {
+            "calls": child.count,
+            "mean_ms": child.sum / child.count * 1000 if child.count else 0.0,
+        }
+    return summary
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def run_benchmark(config: BenchmarkConfig) -> BenchmarkResult:
+    rng = random.Random(config.seed)
+    metrics = PipelineMetrics()
+    document_service, chat_service, vector_store = build_services(config, metrics)
+    result = BenchmarkResult(config=asdict(config), environment=_environment())
+
+    tracemalloc.start()
+    result.ingestion = await _bench_ingestion(document_service, vector_store, config, rng)
+    _, ingestion_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    result.queries = await _bench_queries(chat_service, config, rng)
+    current, query_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result.memory = {
+        "ingestion_peak_python_mb": ingestion_peak / 1e6,
+        "query_peak_python_mb": query_peak / 1e6,
+        "resident_python_mb": current / 1e6,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    result.stages = _stage_summary(metrics)
+    return result
+
+
+def compare(current: Dict, baseline: Dict) -> List[str]:
+    """Human readable diff of the headline numbers between two result files"""
+    lines = []
+    for section in ("ingestion", "queries", "memory"):
+        for key, value in current.get(section, {}).items():
+            old = baseline.get(section, {}).get(key)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            change = ((value - old) / old * 100) if old else 0.0
+            lines.append(f"{section}.{key:<28} {old:>12.3f} -> {value:>12.3f}  ({change:+.1f}%)")
+    return lines
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="RAG pipeline benchmark with local stand-ins")
+    for name, default in asdict(BenchmarkConfig()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    parser.add_argument("--output", type=Path, help="Write results JSON to this path")
+    parser.add_argument("--compare", type=Path, help="Baseline results JSON to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _parse_args(argv)
+    config = BenchmarkConfig(**{
+        name: getattr(args, name) for name in asdict(BenchmarkConfig())
+    })
+    result = asdict(asyncio.run(run_benchmark(config)))
+
+    print(json.dumps({k: result[k] for k in ("ingestion", "queries", "memory", "stages")}, indent=2))
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(result, indent=2))
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        print(f"\nCompared to {args.compare}:")
+        for line in compare(result, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Local vector store search throughput vs. search processes
+
+Loads one large shared partition, then runs the same query workload with
+the search in-process (0) and sharded over 1, 2, 4, ... worker processes.
+Reports queries/s, latency percentiles, speedup over in-process search,
+and the worst event-loop stall seen meanwhile - in-process search blocks
+the loop for the whole matrix product, sharded search only awaits.
+
+Usage:
+    python -m benchmarks.sharded_search_benchmark --rows 200000 --processes 0,1,2,4,8
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.metrics import MetricsRegistry, PipelineMetrics
+from app.domain.entities.embedding import Embedding
+from app.infrastructure.vector_stores.local_adapter import LocalVectorStore
+from benchmarks.rag_benchmark import percentile
+
+
+@dataclass
+class ShardedSearchConfig:
+    rows: int = 100_000
+    dimension: int = 384
+    queries: int = 300
+    concurrency: int = 8
+    top_k: int = 10
+    processes: str = "0,1,2,4"
+    seed: int = 42
+
+
+def _store(root: str, processes: int) -> LocalVectorStore:
+    return LocalVectorStore(
+        root=root,
+        memory_budget_bytes=8 * 1024 ** 3,
+        search_processes=processes,
+        shard_min_rows=0,
+        metrics=PipelineMetrics(MetricsRegistry(), enabled=False),
+    )
+
+
+async def _load_corpus(root: str, config: ShardedSearchConfig, rng: np.random.Generator) -> None:
+    store = _store(root, 0)
+    for start in range(0, config.rows, 2000):
+        vectors = rng.standard_normal((min(2000, config.rows - start), config.dimension), dtype=np.float32)
+        await store.upsert_batch([
+            (f"chunk_{start + i}", Embedding(vector=vector, model="bench", text=""), {"chunk_index": start + i})
+            for i, vector in enumerate(vectors)
+        ])
+    await store.close()
+
+
+async def _watch_loop(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Largest delay of a short sleep - how long the loop was blocked"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def _run(root: str, processes: int, queries: np.ndarray, config: ShardedSearchConfig) -> Dict:
+    store = _store(root, processes)
+    embeddings = [Embedding(vector=query, model="bench", text="") for query in queries]
+    # Warm up: load the partition, move it to shared memory and start the workers
+    for embedding in embeddings[:max(1, processes)]:
+        await store.search(embedding, top_k=config.top_k)
+
+    semaphore = asyncio.Semaphore(config.concurrency)
+    latencies: List[float] = []
+
+    async def one(embedding: Embedding) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await store.search(embedding, top_k=config.top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(_watch_loop(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(embedding) for embedding in embeddings))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    worst_stall = await watcher
+    await store.close()
+    return {
+        "processes": processes,
+        "qps": round(len(embeddings) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_loop_stall_ms": round(worst_stall * 1000, 2),
+    }
+
+
+async def run_sharded_search_benchmark(config: ShardedSearchConfig) -> Dict:
+    rng = np.random.default_rng(config.seed)
+    with tempfile.TemporaryDirectory(prefix="sharded-bench-") as root:
+        await _load_corpus(root, config, rng)
+        queries = rng.standard_normal((config.queries, config.dimension), dtype=np.float32)
+        runs = [
+            await _run(root, int(processes), queries, config)
+            for processes in config.processes.split(",")
+        ]
+    baseline = runs[0]["qps"]
+    for run in runs:
+        run["speedup"] = round(run["qps"] / baseline, 2) if baseline else None
+    return {"config": asdict(config), "runs": runs}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Sharded shared-memory vector search scaling")
+    for name, default in asdict(ShardedSearchConfig()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    parser.add_argument("--output", type=Path, help="Write results JSON to this path")
+    args = parser.parse_args(argv)
+    config = ShardedSearchConfig(**{name: getattr(args, name) for name in asdict(ShardedSearchConfig())})
+    report = asyncio.run(run_sharded_search_benchmark(config))
+
+    print(json.dumps(report["runs"], indent=2))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Deterministic local stand-ins for the RAG interfaces
+Used by the benchmark harness so runs don't depend on OpenAI / Pinecone / S3
+"""
+import asyncio
+import hashlib
+import random
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.application.interfaces.document_repository import IDocumentRepositroy
+from app.application.interfaces.embedding_service import IEmbeddingService
+from app.application.interfaces.llm_services import ILLMService
+from app.application.interfaces.storage_service import IStorageService
+from app.application.interfaces.vector_store import IvectorStore
+from app.domain.entities.chat_message import ChatMessage
+from app.domain.entities.document import Document
+from app.domain.entities.embedding import Embedding
+from app.infrastructure.vector_stores.bitmap_index import compile_filter
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@dataclass
+class SimulatedLatency:
+    """
+    Simulated upstream latency (seconds)
+    total = base + per_item * items + uniform(0, jitter)
+    plus `tail_delay` with probability `tail_probability` (slow outliers)
+    """
+    base: float = 0.0
+    per_item: float = 0.0
+    jitter: float = 0.0
+    seed: int = 0
+    tail_probability: float = 0.0
+    tail_delay: float = 0.0
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+
+    def delay(self, items: int = 1) -> float:
+        jitter = self._rng.uniform(0, self.jitter) if self.jitter else 0.0
+        tail = self.tail_delay if self.tail_probability and self._rng.random() < self.tail_probability else 0.0
+        return self.base + self.per_item * items + jitter + tail
+
+    async def sleep(self, items: int = 1) -> None:
+        delay = self.delay(items)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class SimulatedUpstreamError(Exception):
+    """Transient provider failure (looks like a 503)"""
+    status_code = 503
+
+
+class FakeLLMService(ILLMService):
+    """Returns a deterministic answer derived from the question and context"""
+
+    def __init__(self, latency: Optional[SimulatedLatency] = None):
+        self.latency = latency or SimulatedLatency()
+        self.calls = 0
+
+    async def generate_response(self, messages: List[ChatMessage], context: str) -> str:
+        self.calls += 1
+        # Cost grows with the prompt, like a real model
+        await self.latency.sleep(items=len(context) // 1000 + 1)
+        digest = hashlib.sha1((messages[-1].content + context).encode()).hexdigest()
+        return f"answer-{digest[:12]}"
+
+    async def generate_streaming_response(self, messages: List[ChatMessage], context: str):
+        answer = await self.generate_response(messages, context)
+        for part in answer.split("-"):
+            yield part
+
+
+class FakeEmbeddingService(IEmbeddingService):
+    """
+    Feature-hashing embedder
+    Texts sharing words get similar vectors, so retrieval behaves realistically
+    """
+
+    def __init__(self, dimension: int = 384, latency: Optional[SimulatedLatency] = None,
+                 model_name: str = "fake-hashing-embedder", failure_rate: float = 0.0, seed: int = 0):
+        self.dimension = dimension
+        self.latency = latency or SimulatedLatency()
+        self.model_name = model_name
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.texts_embedded = 0
+
+    def _maybe_fail(self) -> None:
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise SimulatedUpstreamError("simulated upstream failure")
+
+    def _vectorize(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            vector[h % self.dimension] += 1.0 if (h >> 63) else -1.0
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    async def create_embedding(self, text: str) -> Embedding:
+        self.calls += 1
+        self.texts_embedded += 1
+        await self.latency.sleep(items=1)
+        self._maybe_fail()
+        return Embedding(vector=self._vectorize(text), model=self.model_name, text=text)
+
+    async def create_embeddings_batch(self, texts: List[str]) -> List[Embedding]:
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        await self.latency.sleep(items=len(texts))
+        self._maybe_fail()
+        return [
+            Embedding(vector=self._vectorize(text), model=self.model_name, text=text)
+            for text in texts
+        ]
+
+
+class InMemoryVectorStore(IvectorStore):
+    """Brute-force cosine search over a numpy matrix with metadata filters"""
+
+    def __init__(self, latency: Optional[SimulatedLatency] = None):
+        self.latency = latency or SimulatedLatency()
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._metadata: List[Dict] = []
+        self._vectors: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    async def upsert(self, id: str, embedding: Embedding, metadata: Dict) -> None:
+        await self.latency.sleep(items=1)
+        vector = np.asarray(embedding.vector, dtype=np.float32)
+        if id in self._rows:
+            row = self._rows[id]
+            self._vectors[row] = vector
+            self._metadata[row] = metadata
+        else:
+            self._rows[id] = len(self._ids)
+            self._ids.append(id)
+            self._vectors.append(vector)
+            self._metadata.append(metadata)
+        self._matrix = None
+
+    async def search(self, query_embedding: Embedding, top_k: int = 5, filter: Dict = {}) -> List[Dict]:
+        await self.latency.sleep(items=1)
+        if not self._rows:
+            return []
+        if self._matrix is None:
+            self._matrix = np.vstack(self._vectors)
+
+        matches = compile_filter(filter or {})
+        rows = [row for row in self._rows.values() if matches(self._metadata[row])]
+        if not rows:
+            return []
+
+        query = np.asarray(query_embedding.vector, dtype=np.float32)
+        scores = self._matrix[rows] @ query
+        k = min(top_k, len(rows))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            {
+                "id": self._ids[rows[i]],
+                "score": float(scores[i]),
+                "metadata": self._metadata[rows[i]],
+            }
+            for i in best
+        ]
+
+    async def delete(self, id: str) -> None:
+        row = self._rows.pop(id, None)
+        if row is not None:
+            # Keep row numbers stable, just hide the metadata from filters
+            self._metadata[row] = {"__deleted__": True}
+            self._vectors[row] = np.zeros_like(self._vectors[row])
+            self._matrix = None
+
+
+class InMemoryStorageService(IStorageService):
+    """Dict-backed object storage"""
+
+    def __init__(self, latency: Optional[SimulatedLatency] = None):
+        self.latency = latency or SimulatedLatency()
+        self._blobs: Dict[str, bytes] = {}
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(len(blob) for blob in self._blobs.values())
+
+    async def upload(self, key: str, content: bytes) -> str:
+        await self.latency.sleep(items=1)
+        self._blobs[key] = content
+        return await self.get_url(key)
+
+    async def download(self, key: str) -> bytes:
+        await self.latency.sleep(items=1)
+        return self._blobs[key]
+
+    async def delete(self, key: str) -> None:
+        self._blobs.pop(key, None)
+
+    async def exists(self, key: str) -> bool:
+        return key in self._blobs
+
+    async def get_url(self, key: str, expires_in: int = 3600) -> str:
+        return f"memory://{key}"
+
+
+class InMemoryDocumentRepository(IDocumentRepositroy):
+    """Dict-backed document repository"""
+
+    def __init__(self, latency: Optional[SimulatedLatency] = None):
+        self.latency = latency or SimulatedLatency()
+        self._documents: Dict[str, Document] = {}
+
+    async def save(self, document: Document) -> Document:
+        await self.latency.sleep(items=1)
+        self._documents[document.id] = document
+        return document
+
+    async def get_by_id(self, document_id: str) -> Optional[Document]:
+        return self._documents.get(document_id)
+
+    async def get_by_filename(self, filename: str, user_id: str) -> Optional[Document]:
+        for document in self._documents.values():
+            if document.filename == filename and document.user_id == user_id:
+                return document
+        return None
+
+    async def list_by_user(self, user_id: str, limit: int = 50, offset: int = 0) -> List[Document]:
+        return self._sorted_for(user_id)[offset:offset + limit]
+
+    async def list_by_user_after(self, user_id: str, cursor: Optional[str] = None,
+                                 limit: int = 50) -> Tuple[List[Document], Optional[str]]:
+        # Cursor is simply the next offset here
+        offset = int(cursor) if cursor else 0
+        documents = self._sorted_for(user_id)
+        next_cursor = str(offset + limit) if offset + limit < len(documents) else None
+        return documents[offset:offset + limit], next_cursor
+
+    async def list_all_after(self, cursor: Optional[str] = None,
+                             limit: int = 100) -> Tuple[List[Document], Optional[str]]:
+        # Dicts keep insertion order, which is what a full scan needs
+        offset = int(cursor) if cursor else 0
+        documents = list(self._documents.values())
+        next_cursor = str(offset + limit) if offset + limit < len(documents) else None
+        return documents[offset:offset + limit], next_cursor
+
+    async def count_all(self) -> int:
+        return len(self._documents)
+
+    def _sorted_for(self, user_id: str) -> List[Document]:
+        return sorted(
+            (d for d in self._documents.values() if d.user_id == user_id),
+            key=lambda d: (d.created_at, d.id),
+            reverse=True,
+        )
+
+    async def delete(self, document_id) -> None:
+        self._documents.pop(document_id, None)
+
+    async def exists(self, document_id: str) -> bool:
+        return document_id in self._documents
+
+    async def count_by_user(self, user_id: str) -> int:
+        return sum(1 for d in self._documents.values() if d.user_id == user_id)
+
+    async def search_by_user(self, user_id: str, query: str, limit: int = 10) -> List[Document]:
+        query = query.lower()
+        return [
+            d for d in self._documents.values()
+            if d.user_id == user_id and query in d.content.lower()
+        ][:limit]
@@ -0,0 +1,121 @@
+"""
+Tail latency of query embeddings with and without hedging
+
+Runs the same workload - an embedding upstream with heavy-tailed latency
+and occasional transient errors - through ResilientEmbeddingService twice,
+hedging off and on, and reports latency percentiles, failures, and how
+many extra upstream requests hedging cost.
+
+Usage:
+    python -m benchmarks.tail_latency_benchmark --requests 2000 --tail-probability 0.03
+"""
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.metrics import MetricsRegistry, PipelineMetrics
+from app.core.request_context import request_scope
+from app.core.resilience import CircuitBreaker, ResilientCaller, RetryPolicy
+from app.infrastructure.llm.resilient_adapters import ResilientEmbeddingService
+from benchmarks.rag_benchmark import percentile
+from benchmarks.stand_ins import FakeEmbeddingService, SimulatedLatency
+
+
+@dataclass
+class TailLatencyConfig:
+    requests: int = 1000
+    concurrency: int = 16
+    base_ms: float = 20.0
+    jitter_ms: float = 10.0
+    tail_probability: float = 0.02
+    tail_ms: float = 400.0
+    failure_rate: float = 0.01
+    deadline_ms: float = 2000.0
+    hedge_percentile: float = 95.0
+    max_attempts: int = 3
+    seed: int = 42
+
+
+async def _run(config: TailLatencyConfig, hedge: bool) -> Dict:
+    upstream = FakeEmbeddingService(
+        latency=SimulatedLatency(
+            base=config.base_ms / 1000,
+            jitter=config.jitter_ms / 1000,
+            tail_probability=config.tail_probability,
+            tail_delay=config.tail_ms / 1000,
+            seed=config.seed,
+        ),
+        failure_rate=config.failure_rate,
+        seed=config.seed,
+    )
+    caller = ResilientCaller(
+        "embedding",
+        retry=RetryPolicy(max_attempts=config.max_attempts, base_delay=0.02),
+        # Failures here are random, not an outage - keep the breaker out of the measurement
+        breaker=CircuitBreaker(failure_threshold=10 ** 9),
+        hedge_percentile=config.hedge_percentile,
+        metrics=PipelineMetrics(MetricsRegistry(), enabled=False),
+    )
+    service = ResilientEmbeddingService(upstream, caller, hedge=hedge)
+    semaphore = asyncio.Semaphore(config.concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(i: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            with request_scope(timeout=config.deadline_ms / 1000):
+                start = time.perf_counter()
+                try:
+                    await service.create_embedding(f"query {i}")
+                except Exception:
+                    failures += 1
+                    return
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(config.requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "hedging": hedge,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies, default=0.0), 2),
+        "failures": failures,
+        "upstream_requests": upstream.calls,
+        "extra_requests_pct": round((upstream.calls / config.requests - 1) * 100, 2),
+        "throughput_rps": round(config.requests / elapsed, 1),
+    }
+
+
+async def run_tail_latency_benchmark(config: TailLatencyConfig) -> Dict:
+    return {
+        "config": asdict(config),
+        "without_hedging": await _run(config, hedge=False),
+        "with_hedging": await _run(config, hedge=True),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Embedding tail latency with and without hedging")
+    for name, default in asdict(TailLatencyConfig()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    parser.add_argument("--output", type=Path, help="Write results JSON to this path")
+    args = parser.parse_args(argv)
+    config = TailLatencyConfig(**{name: getattr(args, name) for name in asdict(TailLatencyConfig())})
+    report = asyncio.run(run_tail_latency_benchmark(config))
+
+    print(json.dumps({k: report[k] for k in ("without_hedging", "with_hedging")}, indent=2))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Bitmap-indexed filters select exactly the rows the row-by-row filter does"""
+import random
+
+import numpy as np
+import pytest
+
+from app.infrastructure.vector_stores.bitmap_index import Bitmap, MetadataIndex, compile_filter
+
+DOCUMENTS = [f"doc_{i}" for i in range(12)]
+FILENAMES = ["a.pdf", "b.txt", "c.docx"]
+
+
+def _metadata(rng: random.Random, row: int) -> dict:
+    entry = {"document_id": rng.choice(DOCUMENTS), "chunk_index": rng.randrange(6)}
+    if rng.random() < 0.8:
+        entry["filename"] = rng.choice(FILENAMES)
+    if rng.random() < 0.05:
+        entry["tags"] = ["unhashable"]
+    return entry
+
+
+def _condition(rng: random.Random, field: str):
+    values = {"document_id": DOCUMENTS + ["missing"], "filename": FILENAMES,
+              "chunk_index": list(range(7)), "tags": [["unhashable"], "x"]}[field]
+    operator = rng.choice(["plain", "$eq", "$ne", "$in", "$nin"])
+    if operator in ("$in", "$nin"):
+        return {operator: rng.sample(values, rng.randrange(0, min(4, len(values) + 1)))}
+    value = rng.choice(values)
+    return value if operator == "plain" else {operator: value}
+
+
+def _filter(rng: random.Random, depth: int = 0) -> dict:
+    filter = {}
+    for field in rng.sample(["document_id", "filename", "chunk_index", "tags"], rng.randrange(1, 3)):
+        filter[field] = _condition(rng, field)
+    if depth < 2 and rng.random() < 0.4:
+        filter[rng.choice(["$and", "$or"])] = [_filter(rng, depth + 1) for _ in range(rng.randrange(1, 3))]
+    return filter
+
+
+def _expected(filter: dict, metadata: list) -> list:
+    matches = compile_filter(filter)
+    return [row for row, entry in enumerate(metadata) if matches(entry)]
+
+
+@pytest.mark.parametrize("fields", [
+    ("document_id", "filename", "chunk_index"),
+    ("document_id",),
+    (),
+])
+def test_resolve_matches_compile_filter(fields):
+    rng = random.Random(7)
+    metadata = [_metadata(rng, row) for row in range(800)]
+    index = MetadataIndex.build(fields, metadata)
+    for _ in range(150):
+        filter = _filter(rng)
+        assert index.resolve(filter, len(metadata), metadata).tolist() == _expected(filter, metadata), filter
+
+
+def test_incremental_updates_match_a_rebuild():
+    rng = random.Random(11)
+    fields = ("document_id", "filename", "chunk_index")
+    metadata = []
+    index = MetadataIndex(fields)
+    for _ in range(1500):
+        if metadata and rng.random() < 0.3:
+            # Dense rows, as in a partition: the last row moves into the deleted slot
+            row, last = rng.randrange(len(metadata)), len(metadata) - 1
+            index.remove(row, metadata[row])
+            if row != last:
+                index.remove(last, metadata[last])
+                index.add(row, metadata[last])
+                metadata[row] = metadata[last]
+            metadata.pop()
+        else:
+            metadata.append(_metadata(rng, len(metadata)))
+            index.add(len(metadata) - 1, metadata[-1])
+    for _ in range(100):
+        filter = _filter(rng)
+        assert index.resolve(filter, len(metadata), metadata).tolist() == _expected(filter, metadata), filter
+
+
+def test_bitmap_set_operations_across_containers():
+    rng = np.random.default_rng(3)
+    size = 3 * 65536
+    # Dense (bitset) and sparse (array) containers, on both sides of every operation
+    dense = set(rng.choice(size, 60000, replace=False).tolist())
+    sparse = set(rng.choice(size, 2000, replace=False).tolist())
+    a, b = Bitmap.from_rows(dense), Bitmap.from_rows(sparse)
+    assert (a & b).to_array().tolist() == sorted(dense & sparse)
+    assert (a | b).to_array().tolist() == sorted(dense | sparse)
+    assert (a - b).to_array().tolist() == sorted(dense - sparse)
+    assert (b - a).to_array().tolist() == sorted(sparse - dense)
+    assert Bitmap.union([a, b, Bitmap()]).to_array().tolist() == sorted(dense | sparse)
+    assert (Bitmap.full(size) - a).to_array().tolist() == sorted(set(range(size)) - dense)
+    assert len(a) == len(dense)
@@ -0,0 +1,67 @@
+"""Append-only conversation logs round-trip messages exactly"""
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.domain.entities.chat_message import ChatMessage, MessageRole
+from app.domain.entities.conversation import Conversation
+from app.infrastructure.conversations.log_conversation_store import AppendOnlyConversationStore
+
+
+def test_messages_round_trip_with_their_ids(tmp_path):
+    canonical = str(uuid.uuid4())
+    ids = [
+        canonical,
+        canonical.upper(),
+        "{" + canonical + "}",
+        "urn:uuid:" + canonical,
+        canonical.replace("-", ""),
+        "msg-42",
+    ]
+
+    async def scenario():
+        store = AppendOnlyConversationStore(root=str(tmp_path))
+        conversation = Conversation(user_id="u1", title="Ids")
+        await store.save(conversation)
+        sent = [
+            ChatMessage(role=MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT, content=f"message {i}",
+                        id=message_id, created_at=datetime(2024, 1, 1, 12, 0, i),
+                        metadata={"n": i} if i % 3 == 0 else None)
+            for i, message_id in enumerate(ids)
+        ]
+        for message in sent:
+            await store.append(conversation.id, message)
+
+        loaded = await store.load(conversation.id, last_n=len(ids))
+        assert [m.id for m in loaded.messages] == ids
+        assert [(m.role, m.content, m.metadata, m.created_at) for m in loaded.messages] == \
+            [(m.role, m.content, m.metadata, m.created_at) for m in sent]
+        assert await store.load_range(conversation.id, 2, 4) == loaded.messages[2:4]
+        assert store.message_count(conversation.id) == len(ids)
+
+    asyncio.run(scenario())
+
+
+def test_token_budget_loads_a_tail_and_counts_the_rest(tmp_path):
+    async def scenario():
+        store = AppendOnlyConversationStore(root=str(tmp_path))
+        conversation = Conversation(user_id="u1")
+        await store.save(conversation)
+        for i in range(10):
+            await store.append(conversation.id, ChatMessage(role=MessageRole.USER, content="x" * 400 + str(i)))
+
+        loaded = await store.load(conversation.id, last_n=10, max_tokens=250)
+        assert loaded.messages and loaded.messages[-1].content.endswith("9")
+        assert loaded.earlier_message_count + len(loaded.messages) == 10
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("conversation_id", ["../escape", "a/b", "..", "", "c:\\\\x", "id with space"])
+def test_ids_that_are_not_plain_file_names_are_rejected(tmp_path, conversation_id):
+    store = AppendOnlyConversationStore(root=str(tmp_path / "store"))
+    with pytest.raises(ValueError):
+        asyncio.run(store.append(conversation_id, ChatMessage(role=MessageRole.USER, content="hi")))
+    assert not (tmp_path / "escape").exists()
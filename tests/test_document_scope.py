@@ -0,0 +1,72 @@
+"""Scoped chat search sees every chunk of a document, near-duplicates included"""
+import asyncio
+
+from app.application.services.chat_service import ChatService
+from app.application.services.document_service import DocumentService
+from app.core.metrics import MetricsRegistry, PipelineMetrics
+from app.infrastructure.dedup.minhash_deduplicator import MinHashDeduplicator
+from app.infrastructure.vector_stores.local_adapter import LocalVectorStore
+from benchmarks.stand_ins import (
+    FakeEmbeddingService,
+    FakeLLMService,
+    InMemoryDocumentRepository,
+    InMemoryStorageService,
+)
+
+BOILERPLATE = " ".join(f"boiler{i}" for i in range(400))
+
+
+class _CapturingLLM(FakeLLMService):
+    def __init__(self):
+        super().__init__()
+        self.contexts = []
+
+    async def generate_response(self, messages, context):
+        self.contexts.append(context)
+        return await super().generate_response(messages, context)
+
+
+def _services(tmp_path):
+    metrics = PipelineMetrics(MetricsRegistry(), enabled=False)
+    embeddings = FakeEmbeddingService()
+    vectors = LocalVectorStore(root=str(tmp_path / "vectors"), metrics=metrics)
+    dedup = MinHashDeduplicator(path=str(tmp_path / "dedup.db"), metrics=metrics)
+    documents = DocumentService(InMemoryDocumentRepository(), embeddings, vectors, InMemoryStorageService(),
+                                metrics=metrics, deduplicator=dedup)
+    llm = _CapturingLLM()
+    chat = ChatService(llm, embeddings, vectors, metrics=metrics)
+    return documents, chat, llm, vectors, dedup
+
+
+def test_document_ids_scope_includes_deduplicated_chunks(tmp_path):
+    async def scenario():
+        documents, chat, llm, vectors, dedup = _services(tmp_path)
+        await documents.process_document("a.txt", (BOILERPLATE + " alpha" * 300).encode(), "u1", document_id="A")
+        await documents.process_document("b.txt", (BOILERPLATE + " beta" * 300).encode(), "u1", document_id="B")
+        stats = await dedup.stats("u1")
+        assert stats["duplicates"] > 0
+
+        await chat.ask_question(BOILERPLATE[:900], "u1", conversation_history=[], document_ids=["B"])
+        assert "boiler0" in llm.contexts[-1]
+
+        query = await chat.embedding_service.create_embedding(BOILERPLATE[:900])
+        hits = await vectors.search(query, top_k=50, filter={"user_id": "u1", "document_id": {"$in": ["B"]}})
+        assert hits and {hit["metadata"]["document_id"] for hit in hits} == {"B"}
+        await vectors.close()
+
+    asyncio.run(scenario())
+
+
+def test_deleting_the_canonical_document_keeps_the_duplicate(tmp_path):
+    async def scenario():
+        documents, chat, llm, vectors, dedup = _services(tmp_path)
+        await documents.process_document("a.txt", (BOILERPLATE + " alpha" * 300).encode(), "u1", document_id="A")
+        await documents.process_document("b.txt", (BOILERPLATE + " beta" * 300).encode(), "u1", document_id="B")
+
+        await documents.delete_document("A", "u1")
+        query = await chat.embedding_service.create_embedding(BOILERPLATE[:900])
+        hits = await vectors.search(query, top_k=50, filter={"user_id": "u1"})
+        assert hits and {hit["metadata"]["document_id"] for hit in hits} == {"B"}
+        await vectors.close()
+
+    asyncio.run(scenario())
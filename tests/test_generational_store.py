@@ -0,0 +1,89 @@
+"""Reads and writes follow the generation pointer through begin, promote and retire"""
+import asyncio
+
+import pytest
+
+from app.domain.entities.embedding import Embedding
+from app.infrastructure.vector_stores.generational_store import GenerationalVectorStore
+from benchmarks.stand_ins import InMemoryVectorStore
+
+
+def _embedding(model: str) -> Embedding:
+    return Embedding(vector=[1.0, 0.0, 0.0], model=model, text="")
+
+
+class _Generations:
+    def __init__(self, tmp_path):
+        self.stores = {}
+        self.store = GenerationalVectorStore(
+            str(tmp_path / "pointer.json"),
+            lambda generation: self.stores.setdefault(generation.name, InMemoryVectorStore()),
+            reload_interval=0.0,
+        )
+
+    async def write(self, id: str, model: str) -> None:
+        await self.store.upsert(id, _embedding(model), {"user_id": "u1"})
+
+    async def read(self, model: str) -> set:
+        return {hit["id"] for hit in await self.store.search(_embedding(model), top_k=100)}
+
+    def ids(self, generation: str) -> set:
+        return set(self.stores[generation]._rows) if generation in self.stores else set()
+
+
+def test_routing_across_begin_promote_and_retire(tmp_path):
+    async def scenario():
+        g = _Generations(tmp_path)
+        await g.write("before", "old")
+        assert g.ids("g0") == {"before"}
+
+        # Building: old-model writes stay in g0, new-model ones only land in g1, reads never see g1
+        g.store.begin("g1", "new", source_model="old")
+        await g.write("old-during", "old")
+        await g.write("new-during", "new")
+        assert g.ids("g0") == {"before", "old-during"}
+        assert g.ids("g1") == {"new-during"}
+        assert await g.read("old") == {"before", "old-during"}
+        assert await g.read("new") == {"before", "old-during"}
+
+        # Promoted: new-model queries read g1, old-model ones (workers not restarted) still read g0
+        g.store.promote("g1")
+        assert await g.read("new") == {"new-during"}
+        assert await g.read("old") == {"before", "old-during"}
+        await g.write("old-after", "old")
+        assert "old-after" in g.ids("g0") and "old-after" not in g.ids("g1")
+
+        # Deletes reach every generation a document may be in
+        await g.store.delete("old-during")
+        assert "old-during" not in g.ids("g0")
+
+        retired = g.store.retire_previous()
+        assert retired.name == "g0"
+        assert g.store.pointer.previous is None
+        assert await g.read("old") == {"new-during"}
+
+    asyncio.run(scenario())
+
+
+def test_pointer_is_shared_between_instances(tmp_path):
+    first = _Generations(tmp_path)
+    first.store.begin("g1", "new", source_model="old")
+    second = GenerationalVectorStore(str(tmp_path / "pointer.json"), lambda generation: InMemoryVectorStore(),
+                                     reload_interval=0.0)
+    assert second.pointer.building.name == "g1"
+    first.store.promote("g1")
+    assert second.pointer.active.name == "g1"
+    assert second.pointer.previous.model == "old"
+
+
+def test_begin_refuses_conflicting_generations(tmp_path):
+    g = _Generations(tmp_path)
+    g.store.begin("g1", "new", source_model="old")
+    assert g.store.begin("g1", "new").name == "g1"
+    with pytest.raises(ValueError):
+        g.store.begin("g2", "newer")
+    g.store.promote("g1")
+    with pytest.raises(ValueError):
+        g.store.begin("g3", "new")
+    with pytest.raises(ValueError):
+        g.store.promote("g1")
@@ -0,0 +1,149 @@
+"""Ingestion queue: leases, resume after a crash and failure handling"""
+import asyncio
+import time
+
+from app.application.services.document_service import DocumentService
+from app.core.metrics import MetricsRegistry, PipelineMetrics
+from app.domain.entities.ingestion_job import JobStatus
+from app.infrastructure.jobs.ingestion_queue import IngestionJobQueue
+from benchmarks.stand_ins import (
+    FakeEmbeddingService,
+    InMemoryDocumentRepository,
+    InMemoryStorageService,
+    InMemoryVectorStore,
+)
+
+TEXT = " ".join(f"word{i}" for i in range(3000)).encode()
+
+
+def _queue(tmp_path, embeddings=None, storage=None, vectors=None, **kwargs):
+    service = DocumentService(
+        InMemoryDocumentRepository(), embeddings or FakeEmbeddingService(), vectors or InMemoryVectorStore(),
+        storage or InMemoryStorageService(), metrics=PipelineMetrics(MetricsRegistry(), enabled=False),
+        embedding_batch_size=2,
+    )
+    kwargs.setdefault("poll_interval", 0.01)
+    return IngestionJobQueue(service, service.storage_service, path=str(tmp_path / "jobs.db"), **kwargs)
+
+
+async def _wait_for(queue, job_id, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = await queue.get_job(job_id)
+        if job.status == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} is {job.status}, expected {status}")
+
+
+def _set(queue, job_id, **columns):
+    assignments = ", ".join(f"{name} = ?" for name in columns)
+    queue.db.run_sync(lambda conn: conn.execute(
+        f"UPDATE ingestion_jobs SET {assignments} WHERE id = ?", (*columns.values(), job_id)))
+
+
+def test_start_only_requeues_jobs_whose_lease_expired(tmp_path):
+    async def scenario():
+        queue = _queue(tmp_path)
+        live = await queue.enqueue("live.txt", TEXT, "u1")
+        dead = await queue.enqueue("dead.txt", TEXT, "u1")
+        # Another process is running `live`; the one running `dead` crashed
+        _set(queue, live, status=JobStatus.RUNNING.value, claimed_by="other", lease_expires_at=time.time() + 60)
+        _set(queue, dead, status=JobStatus.RUNNING.value, claimed_by="crashed", lease_expires_at=time.time() - 1)
+
+        await queue.start()
+        await _wait_for(queue, dead, JobStatus.DONE)
+        await asyncio.sleep(0.05)
+        assert (await queue.get_job(live)).status == JobStatus.RUNNING
+        await queue.stop()
+        queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_heartbeat_keeps_a_long_job_claimed(tmp_path):
+    async def scenario():
+        class Slow(FakeEmbeddingService):
+            async def create_embeddings_batch(self, texts):
+                await asyncio.sleep(0.05)
+                return await super().create_embeddings_batch(texts)
+
+        queue = _queue(tmp_path, embeddings=Slow(), lease_seconds=0.06)
+        job_id = await queue.enqueue("slow.txt", TEXT, "u1")
+        await queue.start()
+        job = await _wait_for(queue, job_id, JobStatus.DONE)
+        # Never taken over by a second claim, though the job outlived its first lease
+        assert job.attempts == 1
+        await queue.stop()
+        queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_stop_hands_running_jobs_back(tmp_path):
+    async def scenario():
+        class Hanging(FakeEmbeddingService):
+            async def create_embeddings_batch(self, texts):
+                await asyncio.sleep(60)
+
+        storage = InMemoryStorageService()
+        queue = _queue(tmp_path, embeddings=Hanging(), storage=storage)
+        job_id = await queue.enqueue("a.txt", TEXT, "u1")
+        await queue.start()
+        await _wait_for(queue, job_id, JobStatus.RUNNING)
+        await queue.stop()
+        assert (await queue.get_job(job_id)).status == JobStatus.QUEUED
+        queue.close()
+
+        resumed = _queue(tmp_path, storage=storage)
+        await resumed.start()
+        await _wait_for(resumed, job_id, JobStatus.DONE)
+        await resumed.stop()
+        resumed.close()
+
+    asyncio.run(scenario())
+
+
+def test_terminal_failure_removes_the_vectors_of_finished_batches(tmp_path):
+    async def scenario():
+        class FailsHalfway(FakeEmbeddingService):
+            async def create_embeddings_batch(self, texts):
+                if self.calls >= 3:
+                    self.calls += 1
+                    raise RuntimeError("upstream down")
+                return await super().create_embeddings_batch(texts)
+
+        vectors = InMemoryVectorStore()
+        queue = _queue(tmp_path, embeddings=FailsHalfway(), vectors=vectors, max_attempts=1)
+        job_id = await queue.enqueue("a.txt", TEXT, "u1")
+        await queue.start()
+        job = await _wait_for(queue, job_id, JobStatus.FAILED)
+        await queue.stop()
+        queue.close()
+        assert "upstream down" in job.error
+        assert len(vectors) == 0
+
+    asyncio.run(scenario())
+
+
+def test_worker_keeps_running_after_a_queue_error(tmp_path):
+    async def scenario():
+        queue = _queue(tmp_path, max_backoff=0.05)
+        claim = queue.db.run
+        failures = []
+
+        async def flaky_run(fn, *args):
+            if fn.__name__ == "_claim_next" and len(failures) < 2:
+                failures.append(fn)
+                raise RuntimeError("database is locked")
+            return await claim(fn, *args)
+
+        queue.db.run = flaky_run
+        job_id = await queue.enqueue("a.txt", TEXT, "u1")
+        await queue.start()
+        await _wait_for(queue, job_id, JobStatus.DONE)
+        await queue.stop()
+        queue.close()
+        assert len(failures) == 2
+
+    asyncio.run(scenario())
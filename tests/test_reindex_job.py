@@ -0,0 +1,106 @@
+"""Re-embedding into a new generation picks up documents uploaded while it runs"""
+import asyncio
+
+import pytest
+
+from app.application.services.document_service import DocumentService
+from app.core.metrics import MetricsRegistry, PipelineMetrics
+from app.infrastructure.jobs.reindex_job import ReindexJob
+from app.infrastructure.vector_stores.generational_store import GenerationalVectorStore
+from benchmarks.stand_ins import (
+    FakeEmbeddingService,
+    InMemoryDocumentRepository,
+    InMemoryStorageService,
+    InMemoryVectorStore,
+)
+
+
+class _Corpus:
+    def __init__(self, tmp_path):
+        self.metrics = PipelineMetrics(MetricsRegistry(), enabled=False)
+        self.repo = InMemoryDocumentRepository()
+        self.storage = InMemoryStorageService()
+        self.stores = {}
+        self.generations = GenerationalVectorStore(
+            str(tmp_path / "pointer.json"),
+            lambda generation: self.stores.setdefault(generation.name, InMemoryVectorStore()),
+            reload_interval=0.0,
+        )
+        self.old = self._service(FakeEmbeddingService(model_name="old"))
+        self.new = self._service(FakeEmbeddingService(model_name="new"))
+        self.path = str(tmp_path / "reindex.db")
+
+    def _service(self, embeddings):
+        return DocumentService(self.repo, embeddings, self.generations, self.storage, metrics=self.metrics)
+
+    async def upload(self, name):
+        return await self.old.process_document(f"{name}.txt", f"{name} text body".encode(), "u1", document_id=name)
+
+    def job(self):
+        return ReindexJob(self.new, self.generations, self.repo, "g1", path=self.path,
+                          concurrency=2, page_size=2, metrics=self.metrics)
+
+    def ids_in(self, generation):
+        return {vector_id.split("_chunk_")[0] for vector_id in self.stores[generation]._rows}
+
+
+def test_documents_uploaded_during_the_last_page_are_reindexed(tmp_path):
+    async def scenario():
+        corpus = _Corpus(tmp_path)
+        for name in ("a", "b", "c"):
+            await corpus.upload(name)
+        job = corpus.job()
+        reindex_document = corpus.new.reindex_document
+        late = []
+
+        async def uploading_meanwhile(document, checkpoint=None):
+            if document.id == "c" and not late:
+                late.append(await corpus.upload("d"))
+            return await reindex_document(document, checkpoint)
+
+        corpus.new.reindex_document = uploading_meanwhile
+        progress = await job.run()
+        job.close()
+        assert progress.swapped
+        assert corpus.ids_in("g1") == {"a", "b", "c", "d"}
+
+    asyncio.run(scenario())
+
+
+def test_retire_previous_catches_up_on_documents_uploaded_after_the_swap(tmp_path):
+    async def scenario():
+        corpus = _Corpus(tmp_path)
+        await corpus.upload("a")
+        job = corpus.job()
+        await job.run()
+        # A worker still on the old model writes to the previous generation only
+        await corpus.upload("late")
+        assert "late" not in corpus.ids_in("g1")
+
+        retired = await job.retire_previous()
+        job.close()
+        assert retired.name == "g0"
+        assert corpus.ids_in("g1") == {"a", "late"}
+        assert corpus.generations.pointer.previous is None
+
+    asyncio.run(scenario())
+
+
+def test_retire_previous_refuses_while_documents_are_missing(tmp_path):
+    async def scenario():
+        corpus = _Corpus(tmp_path)
+        await corpus.upload("a")
+        job = corpus.job()
+        await job.run()
+        await corpus.upload("broken")
+
+        async def failing(document, checkpoint=None):
+            raise RuntimeError("upstream down")
+
+        corpus.new.reindex_document = failing
+        with pytest.raises(ValueError):
+            await job.retire_previous()
+        job.close()
+        assert corpus.generations.pointer.previous.name == "g0"
+
+    asyncio.run(scenario())